@@ -0,0 +1 @@
+"""Benchmarks of ghcr_badge hot paths."""
@@ -0,0 +1,351 @@
+"""Benchmark hot paths of badge generation and flag regressions against a baseline.
+
+Cases time the CPU work of a request without network: filtering tag lists,
+parsing manifests of each media type, summing image sizes, rendering badges
+and building badge responses. Results are saved as JSON, to be compared with
+another run, e.g. of the main branch:
+
+    python -m benchmarks.bench_generate run --output baseline.json
+    python -m benchmarks.bench_generate run --output current.json
+    python -m benchmarks.bench_generate compare baseline.json current.json --threshold 0.1
+
+`compare` exits with 1 if any case got slower by more than the threshold.
+`run -k manifest` only runs cases whose name contains `manifest`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from benchmarks.bench_tagfilter import make_tags
+from ghcr_badge.generate import (
+    _MEDIA_TYPE_MANIFEST_LIST_V2,
+    _MEDIA_TYPE_MANIFEST_V2,
+    _MEDIA_TYPE_OCI_IMAGE_INDEX_V1,
+    _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1,
+    BaseBadgeGenerator,
+    GHCRBadgeGenerator,
+)
+from ghcr_badge.server import app, return_svg
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping
+
+    from ghcr_badge.generate import ManifestV2
+
+TAG_COUNTS = (100, 1_000, 10_000, 100_000)
+FILTERS = {
+    "default": {},
+    "globs": {"ignore_tag": "latest,dev,nightly-*,sha-*,*-rc*,*-beta*,pr-*,cache-*,test-?,tmp*"},
+    "trim_patch": {"trim_type": "patch"},
+    "trim_major_globs": {"ignore_tag": "latest,sha-*,nightly-*", "trim_type": "major"},
+}
+"""Keyword arguments of `GHCRBadgeGenerator` of each filter case."""
+_PLATFORMS = (("linux", "amd64", ""), ("linux", "arm64", "v8"), ("linux", "arm", "v7"), ("unknown", "unknown", ""))
+_DIGEST = "sha256:" + "0" * 64
+
+
+class Case(NamedTuple):
+    """Benchmarked function."""
+
+    name: str
+    """`group/variant`, e.g. `filter/globs/10000`"""
+    func: Callable[[], object]
+
+
+class Result(NamedTuple):
+    """Timing of a case."""
+
+    seconds: float
+    """best time per call over repeats"""
+    number: int
+    """calls per repeat"""
+
+
+def image_manifest(media_type: str, layers: int) -> ManifestV2:
+    """Make an image manifest.
+
+    Parameters
+    ----------
+    media_type : str
+        Docker manifest v2 or OCI image manifest media type
+    layers : int
+        number of layers
+
+    Returns:
+    -------
+    ManifestV2
+        image manifest
+
+    """
+    return {
+        "schemaVersion": 2,
+        "mediaType": media_type,
+        "config": {"mediaType": "application/json", "size": 7023, "digest": _DIGEST},
+        "layers": [
+            {"mediaType": "application/octet-stream", "size": 32654 * (i + 1), "digest": _DIGEST} for i in range(layers)
+        ],
+    }  # type: ignore[typeddict-item]
+
+
+def index_manifest(media_type: str, child_media_type: str) -> dict[str, Any]:
+    """Make a manifest list or index of some platforms and an attestation.
+
+    Parameters
+    ----------
+    media_type : str
+        Docker manifest list v2 or OCI image index media type
+    child_media_type : str
+        media type of child manifests
+
+    Returns:
+    -------
+    dict[str, Any]
+        manifest list or index
+
+    """
+    manifests = []
+    for os, architecture, variant in _PLATFORMS:
+        platform_ = {"os": os, "architecture": architecture} | ({"variant": variant} if variant else {})
+        manifests.append({"mediaType": child_media_type, "size": 1234, "digest": _DIGEST, "platform": platform_})
+    return {"schemaVersion": 2, "mediaType": media_type, "manifests": manifests}
+
+
+def parse_manifest(body: bytes, platform_: str) -> object:
+    """Parse a manifest response as `fetch_manifest` and `get_platform_manifests` do, without network.
+
+    Parameters
+    ----------
+    body : bytes
+        response body
+    platform_ : str
+        platform to pick from a list or index
+
+    Returns:
+    -------
+    object
+        image manifest, or platform names and digests of children
+
+    """
+    manifest, _ = BaseBadgeGenerator.check_manifest(json.loads(body), {"Docker-Content-Digest": _DIGEST}, "latest")
+    return BaseBadgeGenerator.resolve_platforms(manifest, platform_)
+
+
+def cases() -> Iterator[Case]:
+    """Build benchmark cases.
+
+    Yields:
+    ------
+    Case
+        cases of filtering, manifest parsing, size summation, rendering and responses
+
+    """
+    for count in TAG_COUNTS:
+        tags = make_tags(count)
+        for name, kwargs in FILTERS.items():
+            generator = GHCRBadgeGenerator(**kwargs)
+            yield Case(f"filter/{name}/{count}", lambda g=generator, t=tags: g.filter_tag_list(t))
+        generator = GHCRBadgeGenerator(**FILTERS["globs"])
+        yield Case(f"filter/globs_n=3/{count}", lambda g=generator, t=tags: g.filter_tag_list(t, 3))
+
+    manifests = {
+        "docker_v2": image_manifest(_MEDIA_TYPE_MANIFEST_V2, 8),
+        "oci_v1": image_manifest(_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1, 8),
+        "docker_list_v2": index_manifest(_MEDIA_TYPE_MANIFEST_LIST_V2, _MEDIA_TYPE_MANIFEST_V2),
+        "oci_index_v1": index_manifest(_MEDIA_TYPE_OCI_IMAGE_INDEX_V1, _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1),
+    }
+    for name, manifest in manifests.items():
+        body = json.dumps(manifest).encode()
+        yield Case(f"manifest/{name}", lambda b=body: parse_manifest(b, "all"))
+
+    generator = GHCRBadgeGenerator()
+    for layers in (8, 128):
+        manifest = image_manifest(_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1, layers)
+        yield Case(f"size/sum/{layers}_layers", lambda m=manifest: generator.manifest_size(m))
+    platforms = [(f"linux/arch{i}", image_manifest(_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1, 8)) for i in range(6)]
+    for mode in ("", "max", "all"):
+        yield Case(
+            f"size/platforms/{mode or 'first'}", lambda m=mode: generator.render_platform_sizes(platforms, platform=m)
+        )
+
+    tags = ["v1.9.0", "v1.10.0", "v2.0.0"]
+    yield Case("render/tags", lambda: generator.render_tags(tags))
+    yield Case("render/latest_tag", lambda: generator.render_latest_tag("v2.0.0"))
+    yield Case("render/invalid", lambda: generator.get_invalid_badge("image size"))
+
+    svg = generator.render_tags(tags).encode()
+    yield Case("response/return_svg", lambda: return_svg(svg))
+    yield Case("response/return_svg_etag", lambda: return_svg(svg, "0123456789abcdef"))
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> Result:
+    """Time a function, calling it enough times per repeat to last 0.2 seconds.
+
+    Parameters
+    ----------
+    func : Callable[[], object]
+        benchmarked function
+    repeat : int, optional
+        number of repeats, by default 5
+
+    Returns:
+    -------
+    Result
+        best time per call
+
+    """
+    number, _ = timeit.Timer(func).autorange()
+    return Result(min(timeit.repeat(func, number=number, repeat=repeat)) / number, number)
+
+
+def run(keyword: str = "", repeat: int = 5) -> dict[str, Any]:
+    """Run benchmark cases.
+
+    Parameters
+    ----------
+    keyword : str, optional
+        run only cases whose name contains it, by default "" (all)
+    repeat : int, optional
+        number of repeats of each case, by default 5
+
+    Returns:
+    -------
+    dict[str, Any]
+        environment and results by case name
+
+    """
+    results = {}
+    with app.test_request_context():  # return_svg builds a Flask response
+        for case in cases():
+            if keyword in case.name:
+                results[case.name] = measure(case.func, repeat)._asdict()
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "time": time.time(),
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Mapping[str, Any],
+    current: Mapping[str, Any],
+    threshold: float = 0.1,
+) -> Iterator[tuple[str, float | None, float | None, str]]:
+    """Compare results of two runs.
+
+    Parameters
+    ----------
+    baseline : Mapping[str, Any]
+        saved run, see `run`
+    current : Mapping[str, Any]
+        new run
+    threshold : float, optional
+        relative change of time per call to flag, by default 0.1 (10%)
+
+    Yields:
+    ------
+    tuple[str, float | None, float | None, str]
+        case name, baseline and current seconds (None if missing from a run),
+        and `regression`, `improvement`, `unchanged` or `missing`
+
+    """
+    old, new = baseline["results"], current["results"]
+    for name in [*old, *(name for name in new if name not in old)]:
+        before = old[name]["seconds"] if name in old else None
+        after = new[name]["seconds"] if name in new else None
+        if before is None or after is None:
+            verdict = "missing"
+        elif after > before * (1 + threshold):
+            verdict = "regression"
+        elif after < before * (1 - threshold):
+            verdict = "improvement"
+        else:
+            verdict = "unchanged"
+        yield name, before, after, verdict
+
+
+def _format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command and its options.
+
+    Parameters
+    ----------
+    args : list[str] | None, optional
+        arguments, by default `sys.argv[1:]`
+
+    Returns:
+    -------
+    argparse.Namespace
+        parsed options
+
+    """
+    parser = argparse.ArgumentParser(description="Benchmark hot paths of badge generation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks and save results")
+    run_parser.add_argument("--output", type=Path, help="JSON file to save results to")
+    run_parser.add_argument("-k", dest="keyword", default="", help="run only cases whose name contains it")
+    run_parser.add_argument("--repeat", type=int, default=5, help="repeats of each case (default: %(default)s)")
+    compare_parser = commands.add_parser("compare", help="compare results with a baseline")
+    compare_parser.add_argument("baseline", type=Path, help="JSON file of saved results")
+    compare_parser.add_argument("current", type=Path, help="JSON file of new results")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown flagged as regression (default: %(default)s)",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> int:
+    """Run or compare benchmarks.
+
+    Parameters
+    ----------
+    args : list[str] | None, optional
+        arguments, by default `sys.argv[1:]`
+
+    Returns:
+    -------
+    int
+        exit status, 1 if `compare` found a regression
+
+    """
+    options = parse_args(args)
+    if options.command == "run":
+        data = run(options.keyword, options.repeat)
+        for name, result in data["results"].items():
+            print(f"{name:<36} {_format_seconds(result['seconds']):>10}")  # noqa: T201
+        if options.output is not None:
+            options.output.write_text(json.dumps(data, indent=2) + "\n")
+        return 0
+    baseline = json.loads(options.baseline.read_text())
+    current = json.loads(options.current.read_text())
+    regressions = 0
+    for name, before, after, verdict in compare(baseline, current, options.threshold):
+        change = f"{after / before - 1:+7.1%}" if before and after is not None else ""
+        print(f"{name:<36} {_format_seconds(before):>10} {_format_seconds(after):>10} {change:>8} {verdict}")  # noqa: T201
+        regressions += verdict == "regression"
+    print(f"{regressions} regression(s) over {options.threshold:.0%}")  # noqa: T201
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
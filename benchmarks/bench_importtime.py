@@ -0,0 +1,64 @@
+"""Measure how long entry points take to import.
+
+Run `python -m benchmarks.bench_importtime` from the repository root.
+"""
+
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = {
+    "ghcr-badge --help": (
+        "from ghcr_badge.main import parse_args\ntry:\n    parse_args(['--help'])\nexcept SystemExit:\n    pass"
+    ),
+    "ghcr_badge": "import ghcr_badge",
+    "ghcr_badge.generate": "import ghcr_badge.generate",
+    "ghcr_badge.server": "import ghcr_badge.server",
+    "ghcr_badge.asgi": "import ghcr_badge.asgi",
+}
+TOP = 3
+
+
+def measure(code: str) -> tuple[int, list[tuple[int, str]]]:
+    """Run code in a new interpreter under `-X importtime`.
+
+    Returns:
+    -------
+    tuple[int, list[tuple[int, str]]]
+        total microseconds of imports, and cumulative microseconds of top-level imports
+
+    """
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    total, top = 0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative, name = line.removeprefix("import time:").split("|")
+        if not self_us.strip().isdigit():
+            continue  # header
+        total += int(self_us)
+        if not name.startswith("  "):
+            top.append((int(cumulative), name.strip()))
+    return total, top
+
+
+def main() -> None:
+    """Print median import time of each entry point and its slowest top-level imports."""
+    print(f"{'entry point':>20} {'median':>9}  slowest imports")  # noqa: T201
+    for name, code in ENTRY_POINTS.items():
+        runs = [measure(code) for _ in range(7)]
+        median = statistics.median(total for total, _ in runs)
+        _, top = runs[-1]
+        slowest = ", ".join(f"{module} {us / 1000:.0f}ms" for us, module in sorted(top, reverse=True)[:TOP])
+        print(f"{name:>20} {median / 1000:7.1f}ms  {slowest}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
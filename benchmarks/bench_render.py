@@ -0,0 +1,59 @@
+"""Compare the native badge renderer with `anybadge.Badge`.
+
+Run `python -m benchmarks.bench_render` from the repository root.
+"""
+
+from __future__ import annotations
+
+import timeit
+import tracemalloc
+from typing import TYPE_CHECKING
+
+from anybadge import Badge  # type: ignore[import,unused-ignore]
+
+from ghcr_badge.render import render_badge
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+BADGES = {
+    "tags": ("image tags", " v1.9.0 | v1.10.0 | v2.0.0", "#44cc11"),
+    "latest_tag": ("version", "v2.0.0", "green"),
+    "size": ("image size", "123.45 MiB", "#44cc11"),
+    "invalid": ("image size", "invalid", "#e05d44"),
+}
+
+
+def measure(render: Callable[[], str]) -> tuple[float, int]:
+    """Measure a render function.
+
+    Returns:
+    -------
+    tuple[float, int]
+        seconds and peak of traced allocations in bytes per call
+
+    """
+    number, _ = timeit.Timer(render).autorange()
+    seconds = min(timeit.repeat(render, number=number, repeat=5)) / number
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    """Print time and allocations per badge of both renderers."""
+    print(f"{'badge':>10} {'renderer':>8} {'time':>10} {'peak':>9}")  # noqa: T201
+    for name, (label, value, color) in BADGES.items():
+        renderers = {
+            "anybadge": lambda: str(Badge(label=label, value=value, default_color=color).badge_svg_text),  # noqa: B023
+            "native": lambda: render_badge(label, value, color),  # noqa: B023
+        }
+        for renderer, render in renderers.items():
+            seconds, peak = measure(render)
+            print(f"{name:>10} {renderer:>8} {seconds * 1e6:8.1f}us {peak:7d} B")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare the compiled `TagFilter` with matching each `ignore` glob per tag.
+
+Run `python -m benchmarks.bench_tagfilter` from the repository root.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import re
+import timeit
+
+from ghcr_badge.tagfilter import TRIM_PATTERNS, get_tag_filter
+
+N_TAGS = 10_000
+IGNORE = "latest,dev,nightly-*,sha-*,*-rc*,*-beta*,pr-*,cache-*,test-?,tmp*"
+TRIM = "patch"
+
+
+def make_tags(n: int) -> list[str]:
+    """Make tags mixing releases, nightlies and commit tags."""
+    kinds = ("v{}.{}.{}", "nightly-{}{}{}", "sha-{:x}{:x}{:x}", "{}.{}", "v{}.{}.{}-rc1", "release-{}-{}-{}")
+    return [kinds[i % len(kinds)].format(i // 1000, i // 10 % 100, i % 10) for i in range(n)]
+
+
+def legacy_filter(tags: list[str], ignore_tags: list[str], trim_pattern: str) -> list[str]:
+    """Filter tags as `BaseBadgeGenerator.filter_tag_list` did before `TagFilter`."""
+    filtered = []
+    for tag in tags:
+        if re.match(trim_pattern, tag):
+            continue
+        if not any(fnmatch.fnmatch(tag, ignore_tag) for ignore_tag in ignore_tags):
+            filtered.append(tag)
+    return filtered
+
+
+def main() -> None:
+    """Print time per filtered list of both implementations."""
+    tags = make_tags(N_TAGS)
+    ignore_tags = IGNORE.split(",")
+    trim_pattern = TRIM_PATTERNS[TRIM]
+    assert legacy_filter(tags, ignore_tags, trim_pattern) == get_tag_filter(IGNORE, TRIM).filter(tags)  # noqa: S101
+
+    cases = {
+        "fnmatch loop": lambda: legacy_filter(tags, ignore_tags, trim_pattern),
+        "TagFilter": lambda: get_tag_filter(IGNORE, TRIM).filter(tags),
+        "TagFilter n=3": lambda: get_tag_filter(IGNORE, TRIM).filter(tags, 3),
+    }
+    print(f"{N_TAGS} tags, {len(ignore_tags)} ignore globs, trim={TRIM}")  # noqa: T201
+    baseline = None
+    for name, case in cases.items():
+        number, _ = timeit.Timer(case).autorange()
+        best = min(timeit.repeat(case, number=number, repeat=5)) / number
+        baseline = baseline or best
+        print(f"{name:>14}: {best * 1e3:8.3f} ms  ({baseline / best:6.1f}x)")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Load-test the server against a stub registry, without network.
+
+It starts `benchmarks.stub_registry`, runs the Flask app under waitress
+(`ghcr-badge-server`) and/or gunicorn (`gunicorn.conf.py`) pointed at it with
+`REGISTRY_URL`, and sends badge requests from concurrent keep-alive clients.
+Throughput, p50/p95/p99 latency and upstream calls per server are printed:
+
+    python -m benchmarks.loadtest --server waitress gunicorn --requests 2000 --concurrency 16
+
+Server settings are passed as environment variables with `--env`, e.g.
+`--env BADGE_CACHE_TTL=0` to render every request again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from benchmarks.stub_registry import StubRegistry, add_registry_arguments
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping, Sequence
+
+SERVERS = ("waitress", "gunicorn")
+_ROOT = Path(__file__).parents[1]
+_READY_TIMEOUT = 30
+
+
+def badge_paths(packages: int, platforms: int) -> list[str]:
+    """Get paths of badges requested in turn.
+
+    Parameters
+    ----------
+    packages : int
+        number of packages
+    platforms : int
+        number of platforms of images, to also request sizes of all of them if more than 1
+
+    Returns:
+    -------
+    list[str]
+        paths of all badge kinds of each package
+
+    """
+    kinds = ["tags", "latest_tag?sort=semver", "size"] + (["size?platform=all"] if platforms > 1 else [])
+    return [f"/load/package-{i}/{kind}" for i in range(packages) for kind in kinds]
+
+
+def server_command(server: str, *, port: int, workers: int, threads: int) -> list[str]:
+    """Get the command running a server.
+
+    Parameters
+    ----------
+    server : str
+        `waitress` or `gunicorn`
+    port : int
+        local port to listen
+    workers : int
+        gunicorn worker processes
+    threads : int
+        threads per gunicorn worker
+
+    Returns:
+    -------
+    list[str]
+        command line
+
+    """
+    if server == "waitress":
+        return [sys.executable, "-m", "ghcr_badge.server"]  # reads HOST and PORT
+    return [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--config",
+        str(_ROOT / "gunicorn.conf.py"),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+        "--threads",
+        str(threads),
+    ]
+
+
+def free_port() -> int:
+    """Get a free local port.
+
+    Returns:
+    -------
+    int
+        port number
+
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def wait_ready(port: int, process: subprocess.Popen[bytes]) -> None:
+    """Wait for `/health` of a server.
+
+    Parameters
+    ----------
+    port : int
+        port of the server
+    process : subprocess.Popen[bytes]
+        server process
+
+    Raises:
+    ------
+    RuntimeError
+        raise if the server exits or is not ready in 30 seconds
+
+    """
+    deadline = time.monotonic() + _READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            msg = f"server exited with {process.returncode}."
+            raise RuntimeError(msg)
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == http.client.OK:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    msg = f"server is not ready in {_READY_TIMEOUT} seconds."
+    raise RuntimeError(msg)
+
+
+def drive(port: int, paths: Sequence[str], *, requests: int, concurrency: int) -> list[tuple[float, int]]:
+    """Send requests from concurrent keep-alive clients.
+
+    Parameters
+    ----------
+    port : int
+        port of the server
+    paths : Sequence[str]
+        paths requested in turn
+    requests : int
+        number of requests
+    concurrency : int
+        number of clients
+
+    Returns:
+    -------
+    list[tuple[float, int]]
+        seconds and status of each request, status 0 if the connection failed
+
+    """
+    counter = itertools.count()  # `next` is atomic, so clients share it without a lock
+    results: list[tuple[float, int]] = []
+
+    def client() -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", paths[i % len(paths)])
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                status = 0
+            results.append((time.perf_counter() - start, status))
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results: Sequence[tuple[float, int]], seconds: float, upstream: Mapping[str, int]) -> dict[str, Any]:
+    """Summarize a run.
+
+    Parameters
+    ----------
+    results : Sequence[tuple[float, int]]
+        seconds and status of each request
+    seconds : float
+        wall-clock seconds of the run
+    upstream : Mapping[str, int]
+        requests received by the stub registry, see `StubRegistry.stats`
+
+    Returns:
+    -------
+    dict[str, Any]
+        requests, errors (non-2xx/304), throughput, latency percentiles in milliseconds and upstream calls
+
+    """
+    latencies = sorted(latency for latency, _ in results)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    calls = sum(count for key, count in upstream.items() if key != "errors")
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, status in results if not (200 <= status < 300 or status == 304)),  # noqa: PLR2004
+        "rps": len(results) / seconds if seconds > 0 else 0.0,
+        "p50_ms": cuts[49] * 1000 if cuts else 0.0,
+        "p95_ms": cuts[94] * 1000 if cuts else 0.0,
+        "p99_ms": cuts[98] * 1000 if cuts else 0.0,
+        "upstream_calls": calls,
+        "upstream_per_request": calls / len(results) if results else 0.0,
+        "upstream": dict(sorted(upstream.items())),
+    }
+
+
+def run(server: str, registry: StubRegistry, args: argparse.Namespace) -> dict[str, Any]:
+    """Load-test a server.
+
+    Parameters
+    ----------
+    server : str
+        `waitress` or `gunicorn`
+    registry : StubRegistry
+        running stub registry
+    args : argparse.Namespace
+        options of the load test
+
+    Returns:
+    -------
+    dict[str, Any]
+        summary of the measured requests, see `summarize`
+
+    """
+    port = free_port()
+    env = {**os.environ, **dict(args.env), "REGISTRY_URL": registry.url, "HOST": "127.0.0.1", "PORT": str(port)}
+    paths = badge_paths(args.packages, args.platforms)
+    process = subprocess.Popen(  # noqa: S603
+        server_command(server, port=port, workers=args.workers, threads=args.threads),
+        env=env,
+        cwd=_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port, process)
+        drive(port, paths, requests=args.warmup, concurrency=args.concurrency)
+        registry.reset()
+        start = time.perf_counter()
+        results = drive(port, paths, requests=args.requests, concurrency=args.concurrency)
+        seconds = time.perf_counter() - start
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {"server": server, **summarize(results, seconds, registry.stats())}
+
+
+def _key_value(text: str) -> tuple[str, str]:
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        msg = f"{text!r} should be KEY=VALUE."
+        raise argparse.ArgumentTypeError(msg)
+    return key, value
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Parse options of the load test.
+
+    Parameters
+    ----------
+    args : list[str] | None, optional
+        arguments, by default `sys.argv[1:]`
+
+    Returns:
+    -------
+    argparse.Namespace
+        parsed options
+
+    """
+    parser = argparse.ArgumentParser(description="Load-test ghcr-badge servers against a stub registry.")
+    parser.add_argument("--server", nargs="+", choices=SERVERS, default=list(SERVERS), help="servers to test")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=0, help="requests before measuring (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (default: %(default)s)")
+    parser.add_argument("--packages", type=int, default=20, help="distinct packages (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=1, help="threads per gunicorn worker (default: %(default)s)")
+    parser.add_argument("--env", type=_key_value, action="append", default=[], help="KEY=VALUE for servers")
+    parser.add_argument("--json", type=Path, help="file to write summaries to")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    add_registry_arguments(parser)
+    return parser.parse_args(args)
+
+
+def report(summaries: Sequence[Mapping[str, Any]]) -> Iterator[str]:
+    """Format summaries as a table.
+
+    Parameters
+    ----------
+    summaries : Sequence[Mapping[str, Any]]
+        summaries of servers
+
+    Yields:
+    ------
+    str
+        header, then a line per server
+
+    """
+    yield (
+        f"{'server':>9} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+        f" {'upstream':>8} {'per req':>7}"
+    )
+    for s in summaries:
+        yield (
+            f"{s['server']:>9} {s['requests']:8d} {s['errors']:6d} {s['rps']:8.1f} {s['p50_ms']:6.1f}ms"
+            f" {s['p95_ms']:6.1f}ms {s['p99_ms']:6.1f}ms {s['upstream_calls']:8d} {s['upstream_per_request']:7.2f}"
+        )
+
+
+def main() -> None:
+    """Load-test the chosen servers and print their summaries."""
+    args = parse_args()
+    summaries = []
+    for server in args.server:
+        with StubRegistry(
+            tags=args.tags,
+            platforms=args.platforms,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+        ) as registry:
+            summaries.append(run(server, registry, args))
+    for line in report(summaries):
+        print(line)  # noqa: T201
+    for summary in summaries:
+        print(f"{summary['server']:>9} upstream: {json.dumps(summary['upstream'])}")  # noqa: T201
+    if args.json is not None:
+        args.json.write_text(json.dumps(summaries, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""Serve a stub OCI registry, so that the server can be load-tested without ghcr.io.
+
+Every package has the same generated tags and images. It serves the endpoints
+`GHCRBadgeGenerator` uses:
+
+- `GET /v2/<name>/tags/list?n=...&last=...`, paginated with `Link` and revalidated with `ETag`
+- `GET` and `HEAD /v2/<name>/manifests/<reference>`, a tag being an image index when
+  there are several platforms, and a digest one of its image manifests
+
+Latency, errors, tag count and platforms are configurable. Point servers at it
+with `REGISTRY_URL`. Run `python -m benchmarks.stub_registry --help` from the
+repository root to serve it alone.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+_PATH = re.compile(r"^/v2/(?P<name>.+)/(?:(?P<tags>tags/list)|manifests/(?P<reference>[^/]+))$")
+_PLATFORMS = (
+    ("linux", "amd64", ""),
+    ("linux", "arm64", "v8"),
+    ("linux", "arm", "v7"),
+    ("linux", "ppc64le", ""),
+    ("linux", "s390x", ""),
+    ("linux", "386", ""),
+)
+_INDEX = "application/vnd.oci.image.index.v1+json"
+_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+_LAYER_SIZE = 8 * 1024 * 1024
+
+
+def make_tags(count: int) -> list[str]:
+    """Generate tags like a project releasing versions.
+
+    Parameters
+    ----------
+    count : int
+        number of version tags
+
+    Returns:
+    -------
+    list[str]
+        version tags in lexical order, then `latest`
+
+    """
+    return [*sorted(f"v{i // 100}.{i // 10 % 10}.{i % 10}" for i in range(count)), "latest"]
+
+
+def _dump(data: dict[str, Any]) -> tuple[bytes, str]:
+    body = json.dumps(data, separators=(",", ":")).encode()
+    return body, "sha256:" + hashlib.sha256(body).hexdigest()
+
+
+class Image(NamedTuple):
+    """Manifests of the image every tag of a package points to."""
+
+    body: bytes
+    """image index, or the image manifest of a single platform"""
+    digest: str
+    manifests: dict[str, bytes]
+    """all manifests by digest, including children of the index"""
+
+    @classmethod
+    def of(cls: type[Image], name: str, platforms: int) -> Image:
+        """Generate an image whose digests are unique to a package.
+
+        Parameters
+        ----------
+        name : str
+            package name, e.g. `owner/package`
+        platforms : int
+            number of platforms, an image index if more than 1
+
+        Returns:
+        -------
+        Image
+            generated image
+
+        """
+        manifests, children = {}, []
+        for i, (os, architecture, variant) in enumerate(_PLATFORMS[:platforms]):
+            body, digest = _dump(
+                {
+                    "schemaVersion": 2,
+                    "mediaType": _MANIFEST,
+                    "config": {
+                        "mediaType": "application/vnd.oci.image.config.v1+json",
+                        "size": 1024,
+                        "digest": digest_of(f"{name}/config/{i}"),
+                    },
+                    "layers": [
+                        {
+                            "mediaType": "application/vnd.oci.image.layer.v1.tar+gzip",
+                            "size": _LAYER_SIZE * (i + 1),
+                            "digest": digest_of(f"{name}/layer/{i}/{j}"),
+                        }
+                        for j in range(3)
+                    ],
+                },
+            )
+            manifests[digest] = body
+            platform = {"os": os, "architecture": architecture} | ({"variant": variant} if variant else {})
+            children.append({"mediaType": _MANIFEST, "size": len(body), "digest": digest, "platform": platform})
+        if platforms > 1:
+            body, digest = _dump({"schemaVersion": 2, "mediaType": _INDEX, "manifests": children})
+            manifests[digest] = body
+        return cls(body, digest, manifests)
+
+
+class StubRegistry:
+    """OCI registry serving generated tags and manifests from a background thread."""
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tags: int = 100,
+        platforms: int = 1,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        error_status: int = 503,
+        seed: int = 0,
+    ) -> None:
+        """Create a registry, not serving yet.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        host : str, optional
+            address to listen, by default "127.0.0.1"
+        port : int, optional
+            port to listen, by default 0 (any free port)
+        tags : int, optional
+            number of version tags of each package, by default 100
+        platforms : int, optional
+            number of platforms of each image, an image index if more than 1, by default 1
+        latency : float, optional
+            seconds to wait before each response, by default 0
+        jitter : float, optional
+            random seconds up to this added to latency, by default 0
+        error_rate : float, optional
+            fraction of requests answered with `error_status`, by default 0
+        error_status : int, optional
+            status code of failed requests, by default 503
+        seed : int, optional
+            seed of random jitter and errors, by default 0
+
+        Raises:
+        ------
+        ValueError
+            raise if platforms is not between 1 and 6
+
+        """
+        if not 1 <= platforms <= len(_PLATFORMS):
+            msg = f"platforms should be between 1 and {len(_PLATFORMS)}."
+            raise ValueError(msg)
+        self.tags = make_tags(tags)
+        self.platforms = platforms
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)  # noqa: S311
+        self._lock = threading.Lock()
+        self._requests: Counter[str] = Counter()
+        self._images: dict[str, Image] = {}
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self: Self) -> str:
+        """Base URL, e.g. for `REGISTRY_URL`."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self: Self) -> Self:
+        """Serve in a background thread.
+
+        Returns:
+        -------
+        Self
+            this registry
+
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-registry", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self: Self) -> None:
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self: Self) -> Self:
+        """Start serving."""
+        return self.start()
+
+    def __exit__(self: Self, *_: object) -> None:
+        """Stop serving."""
+        self.stop()
+
+    def stats(self: Self) -> dict[str, int]:
+        """Get numbers of requests received.
+
+        Returns:
+        -------
+        dict[str, int]
+            requests by `METHOD endpoint`, e.g. `GET tags/list`, and `errors` answered with `error_status`
+
+        """
+        with self._lock:
+            return dict(self._requests)
+
+    def reset(self: Self) -> None:
+        """Forget numbers of requests."""
+        with self._lock:
+            self._requests.clear()
+
+    def respond(self: Self, method: str, target: str, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        """Answer a request.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        method : str
+            `GET` or `HEAD`
+        target : str
+            request path with query
+        headers : dict[str, str]
+            request headers with lower-cased names
+
+        Returns:
+        -------
+        tuple[int, dict[str, str], bytes]
+            status, headers and body
+
+        """
+        url = urlsplit(target)
+        m = _PATH.match(url.path)
+        endpoint = "other" if m is None else "tags/list" if m["tags"] else "manifests"
+        with self._lock:
+            self._requests[f"{method} {endpoint}"] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self._requests["errors"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return self.error_status, {"Content-Type": "application/json", "Retry-After": "1"}, _error("UNAVAILABLE")
+        if m is None:
+            return 404, {"Content-Type": "application/json"}, _error("NOT_FOUND")
+        if m["tags"]:
+            return self._tags(m["name"], dict(parse_qsl(url.query)), headers.get("if-none-match", ""))
+        return self._manifest(m["name"], m["reference"])
+
+    def _tags(self: Self, name: str, query: dict[str, str], if_none_match: str) -> tuple[int, dict[str, str], bytes]:
+        n = int(query.get("n", "100"))
+        start = self.tags.index(query["last"]) + 1 if query.get("last") in self.tags else 0
+        page = self.tags[start : start + n]
+        body = json.dumps({"name": name, "tags": page}).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        headers = {"Content-Type": "application/json", "ETag": etag}
+        if start + n < len(self.tags):
+            headers["Link"] = f'</v2/{name}/tags/list?{urlencode({"n": n, "last": page[-1]})}>; rel="next"'
+        if if_none_match == etag:
+            return 304, headers, b""
+        return 200, headers, body
+
+    def _manifest(self: Self, name: str, reference: str) -> tuple[int, dict[str, str], bytes]:
+        with self._lock:
+            image = self._images.get(name)
+            if image is None:
+                image = self._images[name] = Image.of(name, self.platforms)
+        if reference.startswith("sha256:"):
+            body, digest = image.manifests.get(reference), reference
+        elif reference in self.tags:
+            body, digest = image.body, image.digest
+        else:
+            body = None
+        if body is None:
+            return 404, {"Content-Type": "application/json"}, _error("MANIFEST_UNKNOWN")
+        media_type = json.loads(body)["mediaType"]
+        return 200, {"Content-Type": media_type, "Docker-Content-Digest": digest}, body
+
+
+def digest_of(blob: str) -> str:
+    """Get a fake blob digest.
+
+    Parameters
+    ----------
+    blob : str
+        blob name
+
+    Returns:
+    -------
+    str
+        digest of the blob
+
+    """
+    return "sha256:" + hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _error(code: str) -> bytes:
+    return json.dumps({"errors": [{"code": code, "message": code.lower().replace("_", " ")}]}).encode()
+
+
+def _handler(registry: StubRegistry) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            self._send("GET")
+
+        def do_HEAD(self) -> None:
+            self._send("HEAD")
+
+        def _send(self, method: str) -> None:
+            headers = {k.lower(): v for k, v in self.headers.items()}
+            status, response_headers, body = registry.respond(method, self.path, headers)
+            self.send_response(status)
+            for name, value in response_headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if method == "GET":
+                self.wfile.write(body)
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    return Handler
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Parse options of the registry.
+
+    Parameters
+    ----------
+    args : list[str] | None, optional
+        arguments, by default `sys.argv[1:]`
+
+    Returns:
+    -------
+    argparse.Namespace
+        parsed options
+
+    """
+    parser = argparse.ArgumentParser(description="Serve a stub OCI registry for load tests.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=5001, help="port to listen (default: %(default)s)")
+    add_registry_arguments(parser)
+    return parser.parse_args(args)
+
+
+def add_registry_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add options shaping the registry's responses.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add options to
+
+    """
+    parser.add_argument("--tags", type=int, default=100, help="version tags per package (default: %(default)s)")
+    parser.add_argument("--platforms", type=int, default=1, help="platforms per image, 1-6 (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per response (default: %(default)s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failures (default: %(default)s)")
+    parser.add_argument("--error-status", type=int, default=503, help="status of failures (default: %(default)s)")
+
+
+def main() -> None:
+    """Serve the registry until interrupted, then print numbers of requests."""
+    args = parse_args()
+    registry = StubRegistry(
+        host=args.host,
+        port=args.port,
+        tags=args.tags,
+        platforms=args.platforms,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    print(f"serving on {registry.url}, e.g. REGISTRY_URL={registry.url} ghcr-badge-server")  # noqa: T201
+    with registry:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps(registry.stats(), indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,49 @@
 """.. include:: ../README.md"""  # noqa: D415
 
-import importlib.metadata
+from __future__ import annotations
 
-from .generate import GHCRBadgeGenerator
+from typing import TYPE_CHECKING, Any
 
-try:
-    __version__ = importlib.metadata.version(__name__)
-except importlib.metadata.PackageNotFoundError:
-    __version__ = "0.0.0"
+if TYPE_CHECKING:
+    from .generate import GHCRBadgeGenerator
+
+    __version__: str
 
 __all__ = ["GHCRBadgeGenerator"]
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import attributes at first use, so that `ghcr-badge --help` loads no HTTP client.
+
+    Parameters
+    ----------
+    name : str
+        attribute name
+
+    Returns:
+    -------
+    Any
+        attribute value
+
+    Raises:
+    ------
+    AttributeError
+        raise if the attribute does not exist
+
+    """
+    if name == "GHCRBadgeGenerator":
+        from .generate import GHCRBadgeGenerator  # noqa: PLC0415
+
+        value: Any = GHCRBadgeGenerator
+    elif name == "__version__":
+        import importlib.metadata  # noqa: PLC0415
+
+        try:
+            value = importlib.metadata.version(__name__)
+        except importlib.metadata.PackageNotFoundError:
+            value = "0.0.0"
+    else:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    globals()[name] = value
+    return value
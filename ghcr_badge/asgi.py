@@ -0,0 +1,265 @@
+"""Serve Badge API Server over ASGI.
+
+It serves the same routes as `ghcr_badge.server` with `AsyncGHCRBadgeGenerator`,
+so one worker can wait on many slow upstream calls at once. Run it with any
+ASGI server, e.g. `uvicorn ghcr_badge.asgi:app`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import mimetypes
+import re
+import time
+from os import environ
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.parse import parse_qsl
+
+from jinja2 import Environment, PackageLoader, select_autoescape
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags
+
+from . import __version__
+from .async_generate import AsyncGHCRBadgeGenerator
+from .metrics import CONTENT_TYPE, registry, request_seconds
+from .routes import (
+    REPO_LINK,
+    BatchLimits,
+    badge_cache,
+    badge_request,
+    batch_data,
+    batch_multipart,
+    configure_from_environ,
+    encode_svg,
+    index_data,
+    parse_batch,
+    prefetcher,
+    svg_cache_headers,
+)
+from .tracing import start_trace, trace_log
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Mapping, MutableMapping
+
+    Scope = MutableMapping[str, Any]
+    Message = MutableMapping[str, Any]
+    Receive = Callable[[], Awaitable[Message]]
+    Send = Callable[[Message], Awaitable[None]]
+
+
+_BADGE_PATH = re.compile(r"^/(?P<owner>[^/]+)/(?P<name>.+)/(?P<kind>tags|latest_tag|size)$")
+_STATIC_DIR = Path(__file__).parent / "static"
+_PATHS = frozenset({"/", "/index", "/index.html", "/index.json", "/health", "/metrics", "/batch"})
+_PREFETCH_TIMEOUT = 60
+
+_templates = Environment(loader=PackageLoader("ghcr_badge", "templates"), autoescape=select_autoescape(["j2"]))
+
+
+class _Response(NamedTuple):
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    """Handle an ASGI connection.
+
+    Parameters
+    ----------
+    scope : Scope
+        connection scope
+    receive : Receive
+        function to receive events
+    send : Send
+        function to send events
+
+    """
+    if scope["type"] == "lifespan":
+        await __lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    started_at = time.perf_counter()
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+    with start_trace() as trace:
+        if scope["path"] == "/batch":
+            if scope["method"] != "POST":
+                res = _Response(405, {"Allow": "POST", "Content-Type": "text/plain"}, b"Method Not Allowed")
+            else:
+                res = await __batch(await __read_body(receive), headers.get("accept", ""))
+        elif scope["method"] not in ("GET", "HEAD"):
+            res = _Response(405, {"Allow": "GET, HEAD", "Content-Type": "text/plain"}, b"Method Not Allowed")
+        else:
+            query = dict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+            res = await handle(scope["path"], query, headers)
+    request_seconds.observe(time.perf_counter() - started_at, __route(scope["path"]), str(res.status))
+    res.headers["Server-Timing"] = trace.server_timing()
+    query_string = scope["query_string"].decode("latin-1")
+    path = f"{scope['path']}?{query_string}" if query_string else scope["path"]
+    trace_log.write(trace, method=scope["method"], path=path, status=res.status)
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": res.status,
+            "headers": [
+                (b"content-length", str(len(res.body)).encode()),
+                *((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in res.headers.items()),
+            ],
+        },
+    )
+    await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else res.body})
+
+
+async def handle(path: str, query: dict[str, str], headers: dict[str, str]) -> _Response:  # noqa: PLR0911
+    """Route a GET request.
+
+    Parameters
+    ----------
+    path : str
+        decoded request path
+    query : dict[str, str]
+        query parameters
+    headers : dict[str, str]
+        request headers with lower-cased names
+
+    Returns:
+    -------
+    _Response
+        status, headers and body
+
+    """
+    if path in ("/", "/index", "/index.html"):
+        html = _templates.get_template("index.j2").render(version=__version__, repo_link=REPO_LINK)
+        return _Response(200, {"Content-Type": "text/html; charset=utf-8"}, html.encode())
+    if path == "/index.json":
+        return __json(index_data())
+    if path == "/health":
+        return _Response(200, {"Content-Type": "text/plain; charset=utf-8"}, b"OK")
+    if path == "/metrics":
+        return _Response(200, {"Content-Type": CONTENT_TYPE}, registry.render().encode())
+    if path.startswith("/static/"):
+        return __static(path.removeprefix("/static/"))
+    if (m := _BADGE_PATH.match(path)) is not None:
+        return await __badge(m["kind"], m["owner"], m["name"], query, headers.get("if-none-match", ""))
+    return _Response(404, {"Content-Type": "text/plain"}, b"Not Found")
+
+
+def __route(path: str) -> str:
+    # the same route names as `ghcr_badge.server`, so that metrics of both servers can be compared
+    if path in _PATHS:
+        return path
+    if path.startswith("/static/"):
+        return "/static/<path:filename>"
+    if (m := _BADGE_PATH.match(path)) is not None:
+        return f"/<package_owner>/<path:package_name>/{m['kind']}"
+    return "unmatched"
+
+
+async def __badge(
+    kind: str,
+    package_owner: str,
+    package_name: str,
+    query: dict[str, str],
+    if_none_match: str,
+) -> _Response:
+    try:
+        svg, etag = await __cached_badge(*__badge_loader(kind, package_owner, package_name, query))
+    except Exception as err:  # noqa: BLE001
+        if kind == "tags":
+            return __json({"exception": type(err).__name__, "message": str(err)})
+        return __json({"exception": type(err).__name__})
+
+    headers = {"Content-Type": "image/svg+xml; charset=utf-8", "ETag": f'"{etag}"', **svg_cache_headers()}
+    if parse_etags(if_none_match).contains_weak(etag):
+        return _Response(304, headers, b"")
+    return _Response(200, headers, svg)
+
+
+async def __batch(body: bytes, accept: str) -> _Response:
+    try:
+        items = parse_batch(json.loads(body or b"null"))
+    except ValueError as err:
+        return __json({"exception": type(err).__name__, "message": str(err)})._replace(status=400)
+
+    keys, loaders = [], {}
+    for item in items:
+        key, load = __badge_loader(item.kind, item.package_owner, item.package_name, item.params)
+        keys.append(key)
+        loaders.setdefault(key, load)
+    semaphore = asyncio.Semaphore(max(BatchLimits.workers, 1))
+
+    async def load_one(key: tuple[str, ...]) -> tuple[bytes, str] | Exception:
+        async with semaphore:
+            try:
+                return await __cached_badge(key, loaders[key])
+            except Exception as err:  # noqa: BLE001
+                return err
+
+    loaded = dict(zip(loaders, await asyncio.gather(*map(load_one, loaders)), strict=True))
+    results = [loaded[key] for key in keys]
+
+    if parse_accept_header(accept, MIMEAccept).best_match(["application/json", "multipart/mixed"]) == "multipart/mixed":
+        body, content_type = batch_multipart(items, results)
+        return _Response(200, {"Content-Type": content_type}, body)
+    return __json(batch_data(items, results))
+
+
+def __badge_loader(
+    kind: str,
+    package_owner: str,
+    package_name: str,
+    query: Mapping[str, str],
+) -> tuple[tuple[str, ...], Callable[[], Awaitable[tuple[bytes, str]]]]:
+    badge = badge_request(kind, package_owner, package_name, query)
+
+    async def load() -> tuple[bytes, str]:
+        return encode_svg(await badge.render(AsyncGHCRBadgeGenerator))
+
+    return badge.key, load
+
+
+async def __cached_badge(
+    key: tuple[str, ...],
+    load: Callable[[], Awaitable[tuple[bytes, str]]],
+) -> tuple[bytes, str]:
+    loop = asyncio.get_running_loop()
+    # the prefetch thread renders again on this loop, where the async upstream client lives
+    prefetcher.record(key, lambda: asyncio.run_coroutine_threadsafe(load(), loop).result(_PREFETCH_TIMEOUT))
+    return await badge_cache.aget(key, load)
+
+
+def __json(data: dict[str, Any]) -> _Response:
+    body = json.dumps(data, indent=2).encode()
+    return _Response(200, {"Content-Type": "application/json"}, body)
+
+
+def __static(filename: str) -> _Response:
+    path = _STATIC_DIR / filename
+    if "/" in filename or filename.startswith(".") or not path.is_file():
+        return _Response(404, {"Content-Type": "text/plain"}, b"Not Found")
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return _Response(200, {"Content-Type": content_type}, path.read_bytes())
+
+
+async def __read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def __lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            configure_from_environ(environ)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
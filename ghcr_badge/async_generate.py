@@ -0,0 +1,575 @@
+"""Generate badge without blocking the event loop.
+
+It shares `tag_cache` and `manifest_store` with the sync `GHCRBadgeGenerator`
+and requires the optional `httpx` dependency (`pip install ghcr-badge[async]`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+
+from .generate import (
+    BaseBadgeGenerator,
+    InvalidManifestError,
+    InvalidMediaTypeError,
+    InvalidTagListError,
+    TagList,
+    TagListNotModifiedError,
+    manifest_store,
+    revalidations,
+    tag_cache,
+    tag_digests,
+)
+from .ratelimit import UpstreamThrottledError
+from .singleflight import AsyncSingleFlight
+from .tracing import span
+from .upstream import get_async_client
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from typing_extensions import Self
+
+    from .dicts import ManifestV2, OCIImageManifestV1
+    from .upstream import AsyncUpstreamClient
+
+async_single_flight: AsyncSingleFlight[tuple[str, ...], Any] = AsyncSingleFlight()
+"""In-flight upstream fetches shared by concurrent tasks."""
+
+
+class AsyncGHCRBadgeGenerator(BaseBadgeGenerator):
+    """Async generator for GHCR Badge."""
+
+    def __init__(
+        self: Self,
+        *,
+        color: str = "#44cc11",
+        ignore_tag: str = "latest",
+        trim_type: str = "",
+        sort: str = "lexical",
+        client: AsyncUpstreamClient | None = None,
+    ) -> None:
+        """_summary_.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        color : str, optional
+            badge color, by default "#44cc11"
+        ignore_tag : str, optional
+            tag name to hide, by default "latest"
+        trim_type : str, optional
+            type to hide tags
+        sort : str, optional
+            order of tags, `lexical` (registry order) or `semver`, by default "lexical"
+        client : AsyncUpstreamClient | None, optional
+            upstream client, by default the one shared on the running event loop
+
+        """
+        super().__init__(color=color, ignore_tag=ignore_tag, trim_type=trim_type, sort=sort)
+        self._client = client
+
+    @property
+    def client(self: Self) -> AsyncUpstreamClient:
+        """Upstream client."""
+        return self._client if self._client is not None else get_async_client()
+
+    async def generate_tags(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        n: int = 10,
+        label: str = "image tags",
+    ) -> str:
+        """Generate badge of package tags.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package_name
+        n : int, optional
+            number of displayed tags, by default 10
+        label : str, optional
+            label text, by default "image tags"
+
+        Returns:
+        -------
+        str
+            svg string of generated badge of package tags
+
+        Raises:
+        ------
+        ValueError
+            raise if number of displayed tags is invalid
+
+        """
+        if n < 0:
+            msg = f"{n} should be positive."
+            raise ValueError(msg)
+        with span("auth"):
+            self.auth(package_owner, package_name)
+        try:
+            tags = (await self.filter_tags(package_owner, package_name, n=n))[::-1][:n][::-1]
+        except InvalidTagListError:
+            return self.get_invalid_badge(label)
+        return self.render_tags(tags, label=label)
+
+    async def generate_latest_tag(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        label: str = "version",
+    ) -> str:
+        """Generate latest tag badge.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        label : str, optional
+            label text, by default "version"
+
+        Returns:
+        -------
+        str
+            svg string of generated badge of latest tag
+
+        """
+        with span("auth"):
+            self.auth(package_owner, package_name)
+        try:
+            latest_tag = (await self.filter_tags(package_owner, package_name, n=1))[-1]
+        except InvalidTagListError:
+            return self.get_invalid_badge(label)
+        return self.render_latest_tag(latest_tag, label=label)
+
+    async def generate_size(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        tag: str = "latest",
+        label: str = "image size",
+        platform: str = "",
+    ) -> str:
+        """Generate image size badge.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+        label : str, optional
+            label text, by default "image size"
+        platform : str, optional
+            `os/architecture[/variant]` of a multi-arch image, or `min`, `max` or `all`
+            to aggregate sizes of its platforms, by default the first platform
+
+        Returns:
+        -------
+        str
+            svg string of generated badge of size
+
+        """
+        with span("auth"):
+            self.check_platform(platform)
+            self.check_tag(tag)
+            self.auth(package_owner, package_name)
+        try:
+            if platform == "":
+                manifests = [("", await self.get_manifest(package_owner, package_name, tag=tag))]
+            else:
+                manifests = await self.get_platform_manifests(package_owner, package_name, tag=tag, platform=platform)
+        except (InvalidManifestError, InvalidMediaTypeError):
+            return self.get_invalid_badge(label)
+        return self.render_platform_sizes(manifests, platform=platform, label=label)
+
+    async def get_manifest(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+        phase: str = "manifest",
+    ) -> ManifestV2 | OCIImageManifestV1:
+        """Get manifest from ghcr api, reading `manifest_store` for digests.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+        phase : str, optional
+            span name of the lookup, by default "manifest";
+            lookups of children of a manifest list or index are `manifest_child`
+
+        Returns:
+        -------
+        ManifestV2 | OCIImageManifestV1
+            dict containing returned manifest information
+
+        """
+        with span(phase):
+            manifest = await self.load_manifest(package_owner, package_name, tag=tag)
+        resolved = self.resolve_manifest(manifest)
+        if isinstance(resolved, str):
+            return await self.get_manifest(package_owner, package_name, tag=resolved, phase="manifest_child")
+        return resolved
+
+    async def load_manifest(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+    ) -> dict[str, Any]:
+        """Get a manifest of any media type, reading `manifest_store` for digests.
+
+        A mutable tag whose manifest was seen before is checked with HEAD first,
+        and its stored manifest is reused if upstream throttles.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name or digest, by default "latest"
+
+        Returns:
+        -------
+        dict[str, Any]
+            manifest, manifest list or index
+
+        """
+        self.check_tag(tag)
+        self.auth(package_owner, package_name)
+        known = tag if tag.startswith("sha256:") else await tag_digests.arecall((package_owner, package_name, tag))
+        if known is not None and (manifest := await manifest_store.aget(known)) is not None:
+            if known == tag:
+                return manifest
+            try:
+                digest = await async_single_flight.do(
+                    ("digests", package_owner, package_name, tag),
+                    lambda: self.fetch_digest(package_owner, package_name, tag=tag),
+                )
+            except UpstreamThrottledError:
+                return manifest  # the last seen manifest of the tag, rather than none
+            if revalidations.count(known, digest):
+                return manifest
+        return await async_single_flight.do(
+            ("manifests", package_owner, package_name, tag),
+            lambda: self.fetch_manifest(package_owner, package_name, tag=tag),
+        )
+
+    async def get_platform_manifests(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+        platform: str = "",
+    ) -> list[tuple[str, ManifestV2 | OCIImageManifestV1]]:
+        """Get image manifests of platforms of a multi-arch image, fetching children concurrently.
+
+        At most `max_manifest_fetches` children are fetched at a time, as by
+        the sync generator.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+        platform : str, optional
+            platform to pick, see `select_manifests`, by default the first one
+
+        Returns:
+        -------
+        list[tuple[str, ManifestV2 | OCIImageManifestV1]]
+            platform name and image manifest of each picked platform,
+            a single one with empty name if the image is not multi-arch
+
+        """
+        with span("manifest"):
+            manifest = await self.load_manifest(package_owner, package_name, tag=tag)
+        children = self.resolve_platforms(manifest, platform)
+        if not isinstance(children, list):
+            return [("", children)]
+        fetches = asyncio.Semaphore(self.max_manifest_fetches)
+
+        async def get(digest: str) -> ManifestV2 | OCIImageManifestV1:
+            async with fetches:
+                return await self.get_manifest(package_owner, package_name, tag=digest, phase="manifest_child")
+
+        manifests = await asyncio.gather(*(get(digest) for _, digest in children))
+        return [(name, manifest) for (name, _), manifest in zip(children, manifests, strict=True)]
+
+    async def fetch_manifest(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+    ) -> dict[str, Any]:
+        """Fetch a manifest of any media type from ghcr api, bypassing cache.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name or digest, by default "latest"
+
+        Returns:
+        -------
+        dict[str, Any]
+            returned manifest, manifest list or index
+
+        """
+        url, headers = self.manifest_request(package_owner, package_name, tag)
+        response = await self.client.get(url, headers=headers)
+        manifest, digest = self.check_manifest(response.json(), response.headers, tag)
+        if digest is not None:
+            await manifest_store.aset(digest, manifest, weight=len(response.content))
+            if digest != tag:
+                await tag_digests.aset((package_owner, package_name, tag), digest)
+        return manifest
+
+    async def fetch_digest(self: Self, package_owner: str, package_name: str, *, tag: str = "latest") -> str | None:
+        """Fetch the digest of a manifest from ghcr api with HEAD, without downloading it.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+
+        Returns:
+        -------
+        str | None
+            `Docker-Content-Digest` of the manifest, None if the registry does not tell it
+
+        """
+        self.check_tag(tag)
+        url, headers = self.manifest_request(package_owner, package_name, tag)
+        response = await self.client.head(url, headers=headers)
+        digest = response.headers.get("Docker-Content-Digest")
+        return digest if response.is_success and digest else None
+
+    async def get_tags(self: Self, package_owner: str, package_name: str) -> list[str]:
+        """Get tags of the given package through `tag_cache`, in the order of `sort`.
+
+        A stale tag list is refreshed with only the tags after its last one,
+        unless it is read by version, see `needs_sync`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+
+        Returns:
+        -------
+        list[str]
+            tags, e.g. '1.0.0'
+
+        """
+        with span("tags"):
+            tag_list = await tag_cache.aget(
+                (package_owner, package_name),
+                lambda: self.load_tags(package_owner, package_name),
+            )
+            if self.needs_sync(tag_list):
+                tag_list = await self.load_tags(package_owner, package_name)
+                await tag_cache.aset((package_owner, package_name), tag_list)
+        with span("filter"):
+            return self.order_tags(tag_list)
+
+    async def load_tags(self: Self, package_owner: str, package_name: str) -> TagList:
+        """Load a fresh tag list of the given package, without storing it to `tag_cache`.
+
+        A cached tag list is extended with only the tags after its last one,
+        unless it is due to be synced whole.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+
+        Returns:
+        -------
+        TagList
+            tag list to cache
+
+        """
+        cached, now = tag_cache.peek((package_owner, package_name)), time.time()
+        cursor = self.tags_cursor(cached, now)
+        try:
+            tags = await self.fetch_tags(
+                package_owner,
+                package_name,
+                last=cursor,
+                conditional=self.is_single_page(cached, cursor),
+            )
+        except TagListNotModifiedError:
+            if cached is None:  # validators outlived the cached list
+                tags = await self.fetch_tags(package_owner, package_name, last=cursor)
+            else:
+                return self.unmodified_tags(cached, cursor, now)
+        return self.merge_tags(cached, tags, cursor, now)
+
+    async def fetch_tags(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        last: str | None = None,
+        conditional: bool = False,
+    ) -> list[str]:
+        """Fetch tags of the given package from ghcr api, bypassing cache.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        last : str | None, optional
+            fetch only tags after this one, by default None
+        conditional : bool, optional
+            request the first page with validators of the last response, by default False
+
+        Returns:
+        -------
+        list[str]
+            tags, e.g. '1.0.0'
+
+        """
+        self.auth(package_owner, package_name)
+
+        async def request() -> list[str]:
+            tags = self.iter_tags(package_owner, package_name, last=last, conditional=conditional)
+            return [tag async for tag in tags]
+
+        key = ("tags", package_owner, package_name, last or "", "conditional" if conditional else "")
+        return list(await async_single_flight.do(key, request))
+
+    async def iter_tags(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        last: str | None = None,
+        conditional: bool = False,
+    ) -> AsyncIterator[str]:
+        """Iterate tags of the given package, fetching pages lazily.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        last : str | None, optional
+            iterate only tags after this one, by default None
+        conditional : bool, optional
+            request the first page with validators of the last response, by default False
+
+        Yields:
+        ------
+        str
+            tag, e.g. '1.0.0'
+
+        Raises:
+        ------
+        TagListTruncatedError
+            raise if there are more than `max_tag_pages` pages
+        TagListNotModifiedError
+            raise if a conditional request was answered `304 Not Modified`
+
+        """
+        url, headers, params = self.tags_request(package_owner, package_name, last=last)
+        query: dict[str, str | int] | None = params
+        for page in range(self.max_tag_pages):
+            response = await self.client.get(url, headers=headers, params=query, conditional=conditional and page == 0)
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                raise TagListNotModifiedError
+            for tag in self.check_tags(response.json(), allow_empty=page > 0 or last is not None):
+                yield tag
+            if (next_url := self.next_page_url(url, response.headers)) is None:
+                return
+            url, query = next_url, None  # the next URL carries its own query
+        raise self.truncated_error(package_owner, package_name)
+
+    async def filter_tags(self: Self, package_owner: str, package_name: str, n: int | None = None) -> list[str]:
+        """Filter tags by regex pattern.
+
+        Parameters
+        ----------
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        n : int | None, optional
+            keep only the last n filtered tags, by default None (keep all)
+
+        Returns:
+        -------
+        list[str]
+            Filtered tags
+
+        """
+        tags = await self.get_tags(package_owner, package_name)
+        with span("filter"):
+            return self.filter_tag_list(tags, n)
@@ -0,0 +1,409 @@
+"""Shared storage behind the in-process caches.
+
+Each `TTLCache` and `DigestStore` keeps its hot entries in memory. A backend
+set with `use_backend` adds a second level that all workers can read, so a
+tag list fetched by one gunicorn worker, or kept over its recycling, is not
+fetched again by the others.
+
+Backends store serialized entries and never raise on I/O errors; failed
+reads are misses and failed writes are dropped, counted in `errors`.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, NamedTuple
+from urllib.parse import unquote, urlsplit
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+    from typing_extensions import Self
+
+
+class Codec(NamedTuple):
+    """Functions to serialize values of a cache."""
+
+    dump: Callable[[Any], bytes]
+    load: Callable[[bytes], Any]
+
+
+class CacheBackend(ABC):
+    """Storage of serialized entries, keyed by namespace and key."""
+
+    def __init__(self: Self) -> None:
+        """Create a backend."""
+        self.errors = 0
+
+    @abstractmethod
+    def get(self: Self, namespace: str, key: str) -> tuple[bytes, float] | None:
+        """Get a stored entry.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        namespace : str
+            name of the cache
+        key : str
+            serialized key
+
+        Returns:
+        -------
+        tuple[bytes, float] | None
+            serialized value and its `time.time()` when stored, if exists
+
+        """
+
+    @abstractmethod
+    def set(self: Self, namespace: str, key: str, value: bytes, stored_at: float, expire: float | None) -> None:
+        """Store an entry.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        namespace : str
+            name of the cache
+        key : str
+            serialized key
+        value : bytes
+            serialized value
+        stored_at : float
+            `time.time()` when the value was loaded
+        expire : float | None
+            second to keep the entry, None to keep it until evicted
+
+        """
+
+    @abstractmethod
+    def clear(self: Self, namespace: str) -> None:
+        """Drop all entries of a namespace.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        namespace : str
+            name of the cache
+
+        """
+
+    def close(self: Self) -> None:  # noqa: B027
+        """Release connections."""
+
+
+class SQLiteBackend(CacheBackend):
+    """Backend on a local SQLite database shared by all processes on a host."""
+
+    def __init__(self: Self, path: str | Path, *, maxsize: int = 100_000, mmap_size: int = 64 * 1024 * 1024) -> None:
+        """Create a backend.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        path : str | Path
+            database file, created if missing
+        maxsize : int, optional
+            number of entries to keep over all namespaces, by default 100000
+        mmap_size : int, optional
+            bytes of the database to memory-map for reads, by default 64 MiB
+
+        """
+        super().__init__()
+        self.path = str(path)
+        self.maxsize = maxsize
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL, PRIMARY KEY (namespace, key))",
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+
+    def get(self: Self, namespace: str, key: str) -> tuple[bytes, float] | None:  # noqa: D102
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, stored_at FROM entries "
+                    "WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        return None if row is None else (bytes(row[0]), float(row[1]))
+
+    def set(self: Self, namespace: str, key: str, value: bytes, stored_at: float, expire: float | None) -> None:  # noqa: D102
+        expires_at = None if expire is None else time.time() + expire
+        with self._lock:
+            self._writes += 1
+            trim = self._writes % 256 == 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (namespace, key, value, stored_at, expires_at),
+                )
+                if trim:
+                    self._trim(conn)
+        except sqlite3.Error:
+            self.errors += 1
+
+    def clear(self: Self, namespace: str) -> None:  # noqa: D102
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error:
+            self.errors += 1
+
+    def close(self: Self) -> None:  # noqa: D102
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self: Self) -> sqlite3.Connection:
+        # one connection per thread, reopened in forked children
+        if getattr(self._local, "pid", None) != os.getpid() or self._local.conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn  # type: ignore[no-any-return]
+
+    def _trim(self: Self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+
+class RedisBackend(CacheBackend):
+    """Backend on a server speaking the Redis protocol (RESP), e.g. Redis or Valkey.
+
+    Each thread has its own connection, so that requests of a worker's threads
+    do not queue behind each other. After the server cannot be reached, it is
+    not tried again for `backoff` seconds, and calls are misses meanwhile.
+
+    Entries without expiry are evicted by the server's `maxmemory-policy`.
+    """
+
+    def __init__(
+        self: Self,
+        url: str = "redis://localhost:6379/0",
+        *,
+        prefix: str = "ghcr-badge",
+        timeout: float = 1,
+        backoff: float = 5,
+    ) -> None:
+        """Create a backend.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        url : str, optional
+            `redis://[:password@]host[:port][/db]` URL, by default "redis://localhost:6379/0"
+        prefix : str, optional
+            prefix of keys, by default "ghcr-badge"
+        timeout : float, optional
+            second to wait for the server, by default 1
+        backoff : float, optional
+            second to skip the server after it could not be reached, by default 5
+
+        Raises:
+        ------
+        ValueError
+            raise if url is not a `redis://` URL
+
+        """
+        super().__init__()
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            msg = f"{url} should be a redis:// URL."
+            raise ValueError(msg)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.backoff = backoff
+        self._local = threading.local()
+        self._retry_at = 0.0
+
+    def get(self: Self, namespace: str, key: str) -> tuple[bytes, float] | None:  # noqa: D102
+        reply = self._call(b"GET", self._key(namespace, key))
+        if not isinstance(reply, bytes):
+            return None
+        stored_at, _, value = reply.partition(b"\n")
+        try:
+            return value, float(stored_at)
+        except ValueError:
+            self.errors += 1  # e.g. written by another client under the prefix
+            return None
+
+    def set(self: Self, namespace: str, key: str, value: bytes, stored_at: float, expire: float | None) -> None:  # noqa: D102
+        args = [b"SET", self._key(namespace, key), repr(stored_at).encode() + b"\n" + value]
+        if expire is not None:
+            args += [b"PX", str(max(int(expire * 1000), 1)).encode()]
+        self._call(*args)
+
+    def clear(self: Self, namespace: str) -> None:  # noqa: D102
+        cursor = b"0"
+        pattern = self._key(namespace, "*")
+        while True:
+            reply = self._call(b"SCAN", cursor, b"MATCH", pattern, b"COUNT", b"1000")
+            if not isinstance(reply, list):
+                return
+            cursor, keys = reply
+            if keys:
+                self._call(b"DEL", *keys)
+            if cursor == b"0":
+                return
+
+    def close(self: Self) -> None:  # noqa: D102
+        self._disconnect()
+
+    def _key(self: Self, namespace: str, key: str) -> bytes:
+        return f"{self.prefix}:{namespace}:{key}".encode()
+
+    def _call(self: Self, *args: bytes) -> Any:  # noqa: ANN401
+        if time.monotonic() < self._retry_at:
+            self.errors += 1
+            return None
+        try:
+            sock, reader = self._connect()
+        except (OSError, ValueError):
+            self.errors += 1
+            self._retry_at = time.monotonic() + self.backoff
+            return None
+        try:
+            sock.sendall(_command(*args))
+            reply = _read_reply(reader)
+        except (OSError, ValueError):
+            self.errors += 1
+            self._disconnect()
+            return None
+        if isinstance(reply, _RedisError):
+            self.errors += 1
+            return None
+        return reply
+
+    def _connect(self: Self) -> tuple[socket.socket, BinaryIO]:
+        # one connection per thread, reopened in forked children
+        if getattr(self._local, "pid", None) == os.getpid() and self._local.sock is not None:
+            return self._local.sock, self._local.reader
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        reader = sock.makefile("rb")
+        try:
+            self._handshake(sock, reader)
+        except (OSError, ValueError):
+            sock.close()
+            raise
+        self._local.sock, self._local.reader, self._local.pid = sock, reader, os.getpid()
+        return sock, reader
+
+    def _handshake(self: Self, sock: socket.socket, reader: BinaryIO) -> None:
+        if self.password is not None:
+            sock.sendall(_command(b"AUTH", self.password.encode()))
+            if isinstance(_read_reply(reader), _RedisError):
+                msg = "AUTH failed"
+                raise OSError(msg)
+        if self.db:
+            sock.sendall(_command(b"SELECT", b"%d" % self.db))
+            if isinstance(_read_reply(reader), _RedisError):
+                msg = "SELECT failed"
+                raise OSError(msg)
+
+    def _disconnect(self: Self) -> None:
+        # the parent's socket of a forked child is left to the parent
+        if getattr(self._local, "pid", None) == os.getpid() and self._local.sock is not None:
+            self._local.sock.close()
+        self._local.sock = self._local.reader = None
+
+
+class _RedisError(str):
+    __slots__ = ()
+
+
+def _command(*args: bytes) -> bytes:
+    return b"*%d\r\n" % len(args) + b"".join(b"$%d\r\n%s\r\n" % (len(arg), arg) for arg in args)
+
+
+def _read_reply(reader: BinaryIO) -> Any:  # noqa: ANN401
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        msg = "connection closed"
+        raise OSError(msg)
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        return _RedisError(rest.decode(errors="replace"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        if int(rest) < 0:
+            return None
+        data = reader.read(int(rest) + 2)
+        if len(data) != int(rest) + 2:
+            msg = "connection closed"
+            raise OSError(msg)
+        return data[:-2]
+    if kind == b"*":
+        return None if int(rest) < 0 else [_read_reply(reader) for _ in range(int(rest))]
+    msg = f"unexpected reply: {line!r}"
+    raise ValueError(msg)
+
+
+def open_backend(environ: Mapping[str, str]) -> CacheBackend | None:
+    """Open the backend selected by environment variables.
+
+    Parameters
+    ----------
+    environ : Mapping[str, str]
+        environment variables, e.g. `os.environ`
+
+    Returns:
+    -------
+    CacheBackend | None
+        backend, or None to keep caches in memory only
+
+    Raises:
+    ------
+    ValueError
+        raise if `CACHE_BACKEND` is unknown
+
+    """
+    name = environ.get("CACHE_BACKEND", "memory")
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        default_path = Path(tempfile.gettempdir()) / "ghcr-badge-cache.sqlite3"
+        return SQLiteBackend(
+            environ.get("CACHE_SQLITE_PATH", str(default_path)),
+            maxsize=int(environ.get("CACHE_SQLITE_SIZE", "100000")),
+        )
+    if name == "redis":
+        return RedisBackend(environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    msg = f"{name} should be one of memory, sqlite, redis."
+    raise ValueError(msg)
@@ -0,0 +1,731 @@
+"""In-process caches for upstream data, optionally backed by shared storage."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Generic, TypedDict, TypeVar
+
+from .ratelimit import background
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Awaitable, Callable, Hashable
+
+    from typing_extensions import Self
+
+    from .backends import CacheBackend, Codec
+
+_K = TypeVar("_K", bound="Hashable")
+_V = TypeVar("_V")
+
+
+class CacheStats(TypedDict):
+    """Statistics of a cache."""
+
+    size: int
+    hits: int
+    misses: int
+    stale: int
+
+
+class TTLCache(Generic[_K, _V]):
+    """Thread-safe LRU cache whose entries expire, with stale-while-revalidate.
+
+    An entry younger than `ttl` is fresh. An entry older than `ttl` but younger
+    than `ttl + stale_ttl` is served as is while one background thread reloads
+    it. Older entries are reloaded before returning.
+
+    With a backend, entries are also written to it, and read from it when the
+    in-process one is missing or not fresh.
+
+    Background refreshes send upstream requests at low priority, see
+    `ratelimit.background`. If loading raises one of the `fallback`
+    exceptions, e.g. as upstream throttles, an expired entry still in the
+    cache is returned instead.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        *,
+        maxsize: int = 1024,
+        ttl: float = 300,
+        stale_ttl: float = 86400,
+        clock: Callable[[], float] = time.time,
+        namespace: str = "",
+        codec: Codec | None = None,
+        fallback: tuple[type[Exception], ...] = (),
+    ) -> None:
+        """Create a cache.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        maxsize : int, optional
+            number of entries to keep, by default 1024
+        ttl : float, optional
+            second while an entry is fresh, by default 300
+        stale_ttl : float, optional
+            second while an expired entry can be served, by default 86400
+        clock : Callable[[], float], optional
+            wall clock, comparable between processes sharing a backend, by default `time.time`
+        namespace : str, optional
+            name of the cache in a backend, by default ""
+        codec : Codec | None, optional
+            functions to serialize values for a backend, by default None
+        fallback : tuple[type[Exception], ...], optional
+            exceptions of loaders on which an expired entry is returned, by default () (none)
+
+        """
+        self._clock = clock
+        self.fallback = fallback
+        self.namespace = namespace
+        self._codec = codec
+        self._backend: CacheBackend | None = None
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[_K, tuple[_V, float]] = OrderedDict()
+        self._refreshing: set[_K] = set()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self.configure(maxsize=maxsize, ttl=ttl, stale_ttl=stale_ttl)
+
+    def configure(self: Self, *, maxsize: int, ttl: float, stale_ttl: float) -> None:
+        """Change the bounds of the cache in place.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        maxsize : int
+            number of entries to keep
+        ttl : float
+            second while an entry is fresh
+        stale_ttl : float
+            second while an expired entry can be served
+
+        Raises:
+        ------
+        ValueError
+            raise if a bound is negative
+
+        """
+        if maxsize < 0 or ttl < 0 or stale_ttl < 0:
+            msg = f"bounds should be positive: {maxsize=}, {ttl=}, {stale_ttl=}"
+            raise ValueError(msg)
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.stale_ttl = stale_ttl
+            self._evict()
+
+    def use_backend(self: Self, backend: CacheBackend | None) -> None:
+        """Share entries through a backend.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        backend : CacheBackend | None
+            backend, None to keep entries in this process only
+
+        Raises:
+        ------
+        ValueError
+            raise if the cache has no codec
+
+        """
+        if backend is not None and self._codec is None:
+            msg = f"cache {self.namespace!r} has no codec to serialize values."
+            raise ValueError(msg)
+        self._backend = backend
+
+    def get(self: Self, key: _K, loader: Callable[[], _V]) -> _V:
+        """Get a cached value, calling `loader` on miss.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+        loader : Callable[[], _V]
+            function to fetch a fresh value; exceptions are not cached
+
+        Returns:
+        -------
+        _V
+            cached or loaded value, or an expired one if `loader` raised a `fallback` exception
+
+        """
+        found, value, refresh = self._lookup(key)
+        if refresh:
+            threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+        if found:
+            return value  # type: ignore[return-value]
+        try:
+            value = loader()
+        except self.fallback:
+            if (expired := self.peek(key)) is None:
+                raise
+            return expired
+        self.set(key, value)
+        return value
+
+    async def aget(self: Self, key: _K, loader: Callable[[], Awaitable[_V]]) -> _V:
+        """Get a cached value, awaiting `loader` on miss.
+
+        Stale entries are refreshed by a task on the running event loop. The
+        backend is read and written in a worker thread, not to block the loop.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+        loader : Callable[[], Awaitable[_V]]
+            coroutine function to fetch a fresh value; exceptions are not cached
+
+        Returns:
+        -------
+        _V
+            cached or loaded value, or an expired one if `loader` raised a `fallback` exception
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        now = self._clock()
+        found, value, refresh = self._lookup_local(key, now)
+        if not found:
+            shared = await asyncio.to_thread(self._load_shared, key) if self._backend is not None else None
+            found, value, refresh = self._lookup_shared(key, now, shared)
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._arefresh(key, loader))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if found:
+            return value  # type: ignore[return-value]
+        try:
+            value = await loader()
+        except self.fallback:
+            if (expired := self.peek(key)) is None:
+                raise
+            return expired
+        await self.aset(key, value)
+        return value
+
+    def peek(self: Self, key: _K) -> _V | None:
+        """Get a cached value regardless of its age, without loading.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+
+        Returns:
+        -------
+        _V | None
+            cached value if exists
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def recall(self: Self, key: _K) -> _V | None:
+        """Get a cached value regardless of its age, reading the backend unless it is fresh in this process.
+
+        Unlike `peek`, a value stored by another process sharing the backend
+        (e.g. another gunicorn worker, or this one before it was recycled) is
+        found and kept in this process.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+
+        Returns:
+        -------
+        _V | None
+            newest cached value if exists
+
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        if self._backend is None or (entry is not None and now - entry[1] < self.ttl):
+            return None if entry is None else entry[0]
+        return self._keep_newer(key, self._load_shared(key))
+
+    async def arecall(self: Self, key: _K) -> _V | None:
+        """Get a cached value regardless of its age, see `recall`, reading the backend in a worker thread.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+
+        Returns:
+        -------
+        _V | None
+            newest cached value if exists
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        if self._backend is None or (entry is not None and now - entry[1] < self.ttl):
+            return None if entry is None else entry[0]
+        return self._keep_newer(key, await asyncio.to_thread(self._load_shared, key))
+
+    def expires_in(self: Self, key: _K) -> float | None:
+        """Get seconds until a cached value stops being fresh.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+
+        Returns:
+        -------
+        float | None
+            seconds, negative if already stale, None if not cached
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[1] + self.ttl - self._clock()
+
+    def set(self: Self, key: _K, value: _V) -> None:
+        """Store a value as fresh.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+        value : _V
+            value to store
+
+        """
+        self._save_shared(key, value, self._put(key, value))
+
+    async def aset(self: Self, key: _K, value: _V) -> None:
+        """Store a value as fresh, writing the backend in a worker thread.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            cache key
+        value : _V
+            value to store
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        stored_at = self._put(key, value)
+        if self._backend is not None:
+            await asyncio.to_thread(self._save_shared, key, value, stored_at)
+
+    def clear(self: Self) -> None:
+        """Drop all entries, including ones in the backend, and statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._stale = 0
+        if self._backend is not None:
+            self._backend.clear(self.namespace)
+
+    def stats(self: Self) -> CacheStats:
+        """Get statistics of the cache.
+
+        Returns:
+        -------
+        CacheStats
+            number of entries and lookups by result
+
+        """
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses, "stale": self._stale}
+
+    def __len__(self: Self) -> int:
+        """Get number of entries."""
+        return len(self._entries)
+
+    def _lookup(self: Self, key: _K) -> tuple[bool, _V | None, bool]:
+        # returns (found, value, whether the caller should start a refresh)
+        now = self._clock()
+        found, value, refresh = self._lookup_local(key, now)
+        if found:
+            return found, value, refresh
+        return self._lookup_shared(key, now, self._load_shared(key) if self._backend is not None else None)
+
+    def _lookup_local(self: Self, key: _K, now: float) -> tuple[bool, _V | None, bool]:
+        # only fresh entries in this process, so that the backend is read for others
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, entry[0], False
+        return False, None, False
+
+    def _lookup_shared(
+        self: Self,
+        key: _K,
+        now: float,
+        shared: tuple[_V, float] | None,
+    ) -> tuple[bool, _V | None, bool]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                entry = shared
+                self._entries[key] = entry
+                self._evict()
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, value, False
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stale += 1
+                    refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                    return True, value, refresh
+            self._misses += 1
+        return False, None, False
+
+    def _keep_newer(self: Self, key: _K, shared: tuple[_V, float] | None) -> _V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                entry = self._entries[key] = shared
+                self._evict()
+        return None if entry is None else entry[0]
+
+    def _put(self: Self, key: _K, value: _V) -> float:
+        stored_at = self._clock()
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            self._evict()
+        return stored_at
+
+    def _save_shared(self: Self, key: _K, value: _V, stored_at: float) -> None:
+        backend, codec = self._backend, self._codec
+        if backend is not None and codec is not None:
+            backend.set(self.namespace, _dump_key(key), codec.dump(value), stored_at, self.ttl + self.stale_ttl)
+
+    def _load_shared(self: Self, key: _K) -> tuple[_V, float] | None:
+        backend, codec = self._backend, self._codec
+        if backend is None or codec is None:
+            return None
+        stored = backend.get(self.namespace, _dump_key(key))
+        if stored is None:
+            return None
+        try:
+            return codec.load(stored[0]), stored[1]
+        except Exception:  # noqa: BLE001
+            backend.errors += 1  # e.g. written by another version
+            return None
+
+    async def _arefresh(self: Self, key: _K, loader: Callable[[], Awaitable[_V]]) -> None:
+        try:
+            with background():  # the task has its own copy of the context
+                value = await loader()
+        except Exception:  # noqa: BLE001
+            return  # keep serving the stale value
+        else:
+            await self.aset(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self: Self, key: _K, loader: Callable[[], _V]) -> None:
+        try:
+            with background():
+                value = loader()
+        except Exception:  # noqa: BLE001
+            return  # keep serving the stale value
+        else:
+            self.set(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _evict(self: Self) -> None:
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class DigestStore(Generic[_V]):
+    """Thread-safe LRU store of immutable content addressed by digest.
+
+    Entries never expire by time; the least recently used ones are evicted
+    only when the number of entries or their total weight exceeds the bounds.
+    """
+
+    def __init__(
+        self: Self,
+        *,
+        maxsize: int = 4096,
+        maxweight: int = 64 * 1024 * 1024,
+        namespace: str = "",
+        codec: Codec | None = None,
+    ) -> None:
+        """Create a store.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        maxsize : int, optional
+            number of entries to keep, by default 4096
+        maxweight : int, optional
+            total weight (e.g. bytes) of entries to keep, by default 64 MiB
+        namespace : str, optional
+            name of the store in a backend, by default ""
+        codec : Codec | None, optional
+            functions to serialize values for a backend, by default None
+
+        """
+        self.namespace = namespace
+        self._codec = codec
+        self._backend: CacheBackend | None = None
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[_V, int]] = OrderedDict()
+        self.weight = 0
+        self._hits = 0
+        self._misses = 0
+        self.configure(maxsize=maxsize, maxweight=maxweight)
+
+    def configure(self: Self, *, maxsize: int, maxweight: int) -> None:
+        """Change the bounds of the store in place.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        maxsize : int
+            number of entries to keep
+        maxweight : int
+            total weight of entries to keep
+
+        Raises:
+        ------
+        ValueError
+            raise if a bound is negative
+
+        """
+        if maxsize < 0 or maxweight < 0:
+            msg = f"bounds should be positive: {maxsize=}, {maxweight=}"
+            raise ValueError(msg)
+        with self._lock:
+            self.maxsize = maxsize
+            self.maxweight = maxweight
+            self._evict()
+
+    def use_backend(self: Self, backend: CacheBackend | None) -> None:
+        """Share entries through a backend.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        backend : CacheBackend | None
+            backend, None to keep entries in this process only
+
+        Raises:
+        ------
+        ValueError
+            raise if the store has no codec
+
+        """
+        if backend is not None and self._codec is None:
+            msg = f"store {self.namespace!r} has no codec to serialize values."
+            raise ValueError(msg)
+        self._backend = backend
+
+    def get(self: Self, digest: str) -> _V | None:
+        """Get a stored value.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        digest : str
+            content digest, e.g. 'sha256:...'
+
+        Returns:
+        -------
+        _V | None
+            stored value if exists
+
+        """
+        if (value := self._get_local(digest)) is not None:
+            return value
+        return self._put_shared(digest, self._load_shared(digest))
+
+    async def aget(self: Self, digest: str) -> _V | None:
+        """Get a stored value, reading the backend in a worker thread.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        digest : str
+            content digest, e.g. 'sha256:...'
+
+        Returns:
+        -------
+        _V | None
+            stored value if exists
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        if (value := self._get_local(digest)) is not None:
+            return value
+        shared = await asyncio.to_thread(self._load_shared, digest) if self._backend is not None else None
+        return self._put_shared(digest, shared)
+
+    def set(self: Self, digest: str, value: _V, weight: int) -> None:
+        """Store a value.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        digest : str
+            content digest, e.g. 'sha256:...'
+        value : _V
+            value to store
+        weight : int
+            weight of the value, e.g. size of its serialized body
+
+        """
+        self._put(digest, value, weight)
+        self._save_shared(digest, value)
+
+    async def aset(self: Self, digest: str, value: _V, weight: int) -> None:
+        """Store a value, writing the backend in a worker thread.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        digest : str
+            content digest, e.g. 'sha256:...'
+        value : _V
+            value to store
+        weight : int
+            weight of the value, e.g. size of its serialized body
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        self._put(digest, value, weight)
+        if self._backend is not None:
+            await asyncio.to_thread(self._save_shared, digest, value)
+
+    def clear(self: Self) -> None:
+        """Drop all entries, including ones in the backend, and statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.weight = self._hits = self._misses = 0
+        if self._backend is not None:
+            self._backend.clear(self.namespace)
+
+    def stats(self: Self) -> CacheStats:
+        """Get statistics of the store.
+
+        Returns:
+        -------
+        CacheStats
+            number of entries and lookups by result
+
+        """
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses, "stale": 0}
+
+    def __len__(self: Self) -> int:
+        """Get number of entries."""
+        return len(self._entries)
+
+    def __contains__(self: Self, digest: object) -> bool:
+        """Check if a digest is stored."""
+        return digest in self._entries
+
+    def _put(self: Self, digest: str, value: _V, weight: int) -> None:
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self.weight -= old[1]
+            self._entries[digest] = (value, weight)
+            self.weight += weight
+            self._evict()
+
+    def _get_local(self: Self, digest: str) -> _V | None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            self._hits += 1
+            return entry[0]
+
+    def _put_shared(self: Self, digest: str, shared: tuple[_V, int] | None) -> _V | None:
+        with self._lock:
+            if shared is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._put(digest, *shared)
+        return shared[0]
+
+    def _save_shared(self: Self, digest: str, value: _V) -> None:
+        backend, codec = self._backend, self._codec
+        if backend is not None and codec is not None:
+            backend.set(self.namespace, digest, codec.dump(value), time.time(), None)
+
+    def _load_shared(self: Self, digest: str) -> tuple[_V, int] | None:
+        backend, codec = self._backend, self._codec
+        if backend is None or codec is None:
+            return None
+        stored = backend.get(self.namespace, digest)
+        if stored is None:
+            return None
+        try:
+            return codec.load(stored[0]), len(stored[0])
+        except Exception:  # noqa: BLE001
+            backend.errors += 1  # e.g. written by another version
+            return None
+
+    def _evict(self: Self) -> None:
+        while self._entries and (len(self._entries) > self.maxsize or self.weight > self.maxweight):
+            _, (_, weight) = self._entries.popitem(last=False)
+            self.weight -= weight
+
+
+def _dump_key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"))
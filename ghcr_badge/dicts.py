@@ -25,12 +25,24 @@ class ManifestV2(TypedDict):
     layers: list[_ManifestV2Layer]
 
 
+class Platform(TypedDict, total=False):
+    """Platform of a child manifest in a manifest list or index."""
+
+    architecture: str
+    os: str
+    variant: str
+
+
+class _ManifestListV2Entry(_ManifestV2Layer, total=False):
+    platform: Platform
+
+
 class ManifestListV2(TypedDict):
     """Manifest List V2."""
 
     mediaType: str
     schemaVersion: int
-    manifests: list[_ManifestV2Layer]
+    manifests: list[_ManifestListV2Entry]
 
 
 class _OCIImageManifestV1Config(TypedDict):
@@ -61,9 +73,13 @@ class _OCIImageIndexV1Descriptor(TypedDict):
     digest: str
 
 
+class _OCIImageIndexV1Entry(_OCIImageIndexV1Descriptor, total=False):
+    platform: Platform
+
+
 class OCIImageIndexV1(TypedDict):
     """Index V1 for OCI Image."""
 
     schemaVersion: int
     mediaType: str
-    manifests: list[_OCIImageIndexV1Descriptor]
+    manifests: list[_OCIImageIndexV1Entry]
@@ -3,61 +3,944 @@
 from __future__ import annotations
 
 import base64
-import fnmatch
+import contextvars
+import json
 import re
-from typing import TYPE_CHECKING, cast
-
-import requests
-from anybadge import Badge  # type: ignore[import,unused-ignore]
-from humanfriendly import format_size, parse_size
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any, NamedTuple, TypedDict, cast
+from urllib.parse import urljoin
+
+from .backends import Codec
+from .cache import DigestStore, TTLCache
+from .metrics import render_seconds
+from .ratelimit import UpstreamThrottledError
+from .render import render_badge
+from .singleflight import SingleFlight
+from .tagfilter import get_tag_filter
+from .tracing import span
+from .upstream import get_client
+from .versions import sort_by_version
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
     from typing_extensions import Self
 
-    from .dicts import ManifestListV2, ManifestV2, OCIImageIndexV1, OCIImageManifestV1
+    from .dicts import ManifestListV2, ManifestV2, OCIImageIndexV1, OCIImageManifestV1, Platform
+    from .upstream import UpstreamClient
+
+
+class InvalidTokenError(Exception):
+    """Exception for invalid token."""
+
+
+class InvalidTagError(Exception):
+    """Exception for invalid tag."""
+
+
+class InvalidTagListError(Exception):
+    """Exception for invalid tag list."""
+
+
+class TagListTruncatedError(InvalidTagListError):
+    """Exception for a tag list with more pages than `max_tag_pages`."""
+
+
+class TagListNotModifiedError(Exception):
+    """Exception for a tag list not modified since it was fetched last time."""
+
+
+class InvalidManifestError(Exception):
+    """Exception for invalid manifest."""
+
+
+class InvalidImageError(Exception):
+    """Exception for invalid image."""
+
+
+class InvalidMediaTypeError(Exception):
+    """Exception for invalid media type."""
+
+
+_GITHUB_USER_PATTERN = r"^[a-zA-Z0-9]([a-zA-Z0-9]?|[-]?([a-zA-Z0-9])){0,38}$"
+_GITHUB_REPO_PATTERN = r"^[-a-zA-Z0-9]{1,100}$"
+_IMAGE_TAG_PATTERN = r"^([a-zA-Z0-9_][a-zA-Z0-9_.-]{0,127}|sha256:[a-z0-9]{64})$"
+_PLATFORM_PATTERN = re.compile(r"^[a-z0-9_.-]+/[a-z0-9_.-]+(/[a-z0-9_.-]+)?$")
+_USER_AGENT = "Docker-Client/20.10.2 (linux)"
+_TAGS_PAGE_SIZE = 300
+_LINK_NEXT_PATTERN = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+_MEDIA_TYPE_MANIFEST = "application/vnd.docker.distribution.manifest"
+_MEDIA_TYPE_MANIFEST_V2 = f"{_MEDIA_TYPE_MANIFEST}.v2+json"
+_MEDIA_TYPE_MANIFEST_LIST_V2 = f"{_MEDIA_TYPE_MANIFEST}.list.v2+json"
+
+_MEDIA_TYPE_OCI_IMAGE_MANIFEST = "application/vnd.oci.image.manifest"
+_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1 = f"{_MEDIA_TYPE_OCI_IMAGE_MANIFEST}.v1+json"
+_MEDIA_TYPE_OCI_IMAGE_INDEX_V1 = "application/vnd.oci.image.index.v1+json"
+_MEDIA_TYPES = frozenset(
+    {
+        _MEDIA_TYPE_MANIFEST_V2,
+        _MEDIA_TYPE_MANIFEST_LIST_V2,
+        _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1,
+        _MEDIA_TYPE_OCI_IMAGE_INDEX_V1,
+    },
+)
+_INDEX_MEDIA_TYPES = frozenset({_MEDIA_TYPE_MANIFEST_LIST_V2, _MEDIA_TYPE_OCI_IMAGE_INDEX_V1})
+
+
+class TagList(NamedTuple):
+    """Cached tag list of a package."""
+
+    tags: tuple[str, ...]
+    """tags in registry order"""
+    synced_at: float
+    """`time.time()` when the whole list was last fetched"""
+    by_version: tuple[str, ...]
+    """tags from the oldest version to the newest one"""
+    partial: bool = False
+    """whether it was refreshed with only the tags after its last one since the whole
+    list was fetched, so that new tags sorting before it may be missing"""
+
+    @classmethod
+    def of(cls: type[TagList], tags: tuple[str, ...], synced_at: float, *, partial: bool = False) -> TagList:
+        """Index tags to cache, sorting them by version once.
+
+        Parameters
+        ----------
+        tags : tuple[str, ...]
+            tags in registry order
+        synced_at : float
+            `time.time()` when the whole list was last fetched
+        partial : bool, optional
+            whether it was refreshed after its last tag since then, by default False
+
+        Returns:
+        -------
+        TagList
+            indexed tag list
+
+        """
+        return cls(tags, synced_at, sort_by_version(tags), partial)
+
+
+def _platform_name(platform: Platform) -> str:
+    return "/".join(v for v in (platform.get("os"), platform.get("architecture"), platform.get("variant")) if v)
+
+
+def _format_size(size: int) -> str:
+    from humanfriendly import format_size  # noqa: PLC0415  # only size badges need it
+
+    return format_size(size, binary=True)
+
+
+def _load_tag_list(data: bytes) -> TagList:
+    tags, synced_at, by_version, partial = json.loads(data)
+    return TagList(tuple(tags), synced_at, tuple(by_version), partial)
+
+
+tag_cache: TTLCache[tuple[str, str], TagList] = TTLCache(
+    maxsize=1024,
+    ttl=300,
+    namespace="tags:v2",
+    codec=Codec(lambda tag_list: json.dumps(tag_list).encode(), _load_tag_list),
+    fallback=(UpstreamThrottledError,),
+)
+"""Tag lists shared by all generators, keyed by `(package_owner, package_name)`."""
+manifest_store: DigestStore[dict[str, Any]] = DigestStore(
+    namespace="manifests:v1",
+    codec=Codec(lambda manifest: json.dumps(manifest).encode(), json.loads),
+)
+"""Immutable manifests shared by all generators, keyed by `sha256:` digest."""
+single_flight: SingleFlight[tuple[str, ...], Any] = SingleFlight()
+"""In-flight upstream fetches shared by concurrent callers."""
+tag_digests: TTLCache[tuple[str, str, str], str] = TTLCache(
+    maxsize=4096,
+    namespace="digests:v1",
+    codec=Codec(str.encode, bytes.decode),
+)
+"""Last seen digests of manifests of mutable tags, keyed by `(package_owner, package_name, tag)`."""
+
+
+class RevalidationStats(TypedDict):
+    """Outcomes of checking manifests of mutable tags with HEAD."""
+
+    unchanged: int
+    """the digest was the known one, so the stored manifest was reused"""
+    changed: int
+    """the digest was another one, so the manifest was fetched"""
+    fallback: int
+    """the registry told no digest, so the manifest was fetched"""
+
+
+class Revalidations:
+    """Counters of revalidated manifests."""
+
+    def __init__(self: Self) -> None:
+        """Create counters."""
+        self._lock = threading.Lock()
+        self._stats = RevalidationStats(unchanged=0, changed=0, fallback=0)
+
+    def count(self: Self, known: str, digest: str | None) -> bool:
+        """Count the outcome of a revalidation.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        known : str
+            digest of the stored manifest
+        digest : str | None
+            digest told by the registry, if any
+
+        Returns:
+        -------
+        bool
+            True if the stored manifest is still the one of the tag
+
+        """
+        outcome = "fallback" if digest is None else "unchanged" if digest == known else "changed"
+        with self._lock:
+            self._stats[outcome] += 1  # type: ignore[literal-required]
+        return outcome == "unchanged"
+
+    def stats(self: Self) -> RevalidationStats:
+        """Get counters.
+
+        Returns:
+        -------
+        RevalidationStats
+            number of each outcome
+
+        """
+        with self._lock:
+            return self._stats.copy()
+
+
+revalidations = Revalidations()
+"""Outcomes of HEAD requests checking manifests of mutable tags."""
+
+
+class BaseBadgeGenerator:
+    """Options, filtering and rendering shared by sync and async generators."""
+
+    registry_url = "https://ghcr.io"
+    """Base URL of the registry, e.g. of a stub registry for load tests."""
+    max_tag_pages = 1000
+    """Maximum number of tag list pages to follow for a package, i.e. 300,000 tags."""
+    tag_resync_interval: float = 3600
+    """Second after which a cached tag list is fetched whole instead of incrementally."""
+    sort_types = ("lexical", "semver")
+    """Available orders of tags."""
+    platform_modes = ("min", "max", "all")
+    """Aggregates of sizes over the platforms of a multi-arch image."""
+    max_manifest_fetches = 8
+    """Maximum number of child manifests of a multi-arch image fetched concurrently."""
+
+    def __init__(
+        self: Self,
+        *,
+        color: str = "#44cc11",
+        ignore_tag: str = "latest",
+        trim_type: str = "",
+        sort: str = "lexical",
+    ) -> None:
+        """_summary_.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        color : str, optional
+            badge color, by default "#44cc11"
+        ignore_tag : str, optional
+            tag name to hide, by default "latest"
+        trim_type : str, optional
+            type to hide tags
+        sort : str, optional
+            order of tags, `lexical` (registry order) or `semver`, by default "lexical"
+
+        Raises:
+        ------
+        ValueError
+            raise if sort is unknown
+
+        """
+        if sort not in self.sort_types:
+            msg = f"{sort} should be one of {', '.join(self.sort_types)}."
+            raise ValueError(msg)
+        self.color = color
+        self.sort = sort
+        self.tag_filter = get_tag_filter(ignore_tag, trim_type)
+        self.ignore_tags: list[str] = list(self.tag_filter.ignore_tags)
+        self.trim_pattern = self.tag_filter.trim_pattern
+
+    def filter_tag_list(self: Self, tags: list[str], n: int | None = None) -> list[str]:
+        """Filter given tags with the compiled `tag_filter`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tags : list[str]
+            tags to filter
+        n : int | None, optional
+            keep only the last n filtered tags, scanning from the end and
+            stopping once found, by default None (keep all)
+
+        Returns:
+        -------
+        list[str]
+            Filtered tags
+
+        """
+        return self.tag_filter.filter(tags, n)
+
+    def render_tags(self: Self, tags: list[str], *, label: str = "image tags") -> str:
+        """Render badge of given tags.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tags : list[str]
+            tags to display
+        label : str, optional
+            label text, by default "image tags"
+
+        Returns:
+        -------
+        str
+            svg string
+
+        """
+        badge_value = " " + " | ".join(tags)
+        with span("render"), render_seconds.time("tags"):
+            return render_badge(label, badge_value, self.color)
+
+    def render_latest_tag(self: Self, latest_tag: str, *, label: str = "version") -> str:
+        """Render badge of given latest tag.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        latest_tag : str
+            tag to display
+        label : str, optional
+            label text, by default "version"
+
+        Returns:
+        -------
+        str
+            svg string
+
+        """
+        badge_value = str(latest_tag)
+        with span("render"), render_seconds.time("latest_tag"):
+            return render_badge(label, badge_value, self.color)
+
+    def render_size(self: Self, manifest: ManifestV2 | OCIImageManifestV1, *, label: str = "image size") -> str:
+        """Render badge of image size summed from given manifest.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        manifest : ManifestV2 | OCIImageManifestV1
+            image manifest
+        label : str, optional
+            label text, by default "image size"
+
+        Returns:
+        -------
+        str
+            svg string
+
+        """
+        value = _format_size(self.manifest_size(manifest))
+        with span("render"), render_seconds.time("size"):
+            return render_badge(label, value, self.color)
+
+    def render_platform_sizes(
+        self: Self,
+        manifests: list[tuple[str, ManifestV2 | OCIImageManifestV1]],
+        *,
+        platform: str = "",
+        label: str = "image size",
+    ) -> str:
+        """Render badge of image sizes of platforms, aggregated as asked.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        manifests : list[tuple[str, ManifestV2 | OCIImageManifestV1]]
+            platform name (empty for a single-platform image) and image manifest of each platform
+        platform : str, optional
+            `min`, `max` or `all` to aggregate sizes, otherwise the size of the first manifest is shown
+        label : str, optional
+            label text, by default "image size"
+
+        Returns:
+        -------
+        str
+            svg string
+
+        """
+        sizes = [(name, self.manifest_size(manifest)) for name, manifest in manifests]
+        if platform == "all":
+            value = " | ".join(f"{name} {_format_size(size)}".strip() for name, size in sizes)
+        elif platform in ("min", "max"):
+            value = _format_size((min if platform == "min" else max)(size for _, size in sizes))
+        else:
+            value = _format_size(sizes[0][1])
+        with span("render"), render_seconds.time("size"):
+            return render_badge(label, value, self.color)
+
+    @staticmethod
+    def manifest_size(manifest: ManifestV2 | OCIImageManifestV1) -> int:
+        """Sum sizes of the config and the layers of an image manifest.
+
+        Parameters
+        ----------
+        manifest : ManifestV2 | OCIImageManifestV1
+            image manifest
+
+        Returns:
+        -------
+        int
+            image size in bytes
+
+        """
+        config_size = int(manifest.get("config", {"size": 0}).get("size", 0))
+        return config_size + sum(int(layer.get("size", 0)) for layer in manifest.get("layers", []))
+
+    @staticmethod
+    def get_invalid_badge(label: str) -> str:
+        """Generate and Get invalid badge.
+
+        Parameters
+        ----------
+        label : str
+            badge label
+
+        Returns:
+        -------
+        str
+            svg string
+
+        """
+        with span("render"), render_seconds.time("invalid"):
+            return render_badge(label, "invalid", "#e05d44")
+
+    @staticmethod
+    def resolve_manifest(manifest: dict[str, Any]) -> ManifestV2 | OCIImageManifestV1 | str:
+        """Check media type of a manifest and pick the one to follow.
+
+        Parameters
+        ----------
+        manifest : dict[str, Any]
+            returned manifest, manifest list or index
+
+        Returns:
+        -------
+        ManifestV2 | OCIImageManifestV1 | str
+            image manifest itself, or digest of the first child manifest of a list or index
+
+        Raises:
+        ------
+        InvalidManifestError
+            raise if list or index is empty
+        InvalidMediaTypeError
+            raise if response is invalid media type
+
+        """
+        media_type = manifest.get("mediaType")
+
+        if media_type == _MEDIA_TYPE_MANIFEST_V2:
+            return cast("ManifestV2", manifest)
+
+        if media_type == _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1:
+            return cast("OCIImageManifestV1", manifest)
+
+        if media_type in (_MEDIA_TYPE_MANIFEST_LIST_V2, _MEDIA_TYPE_OCI_IMAGE_INDEX_V1):
+            index = cast("ManifestListV2 | OCIImageIndexV1", manifest)
+            manifests = index.get("manifests")
+            if not isinstance(manifests, list) or len(manifests) == 0:
+                msg = "Returned list of manifest is empty."
+                raise InvalidManifestError(msg)
+            if (digest := manifests[0].get("digest")) is None:
+                msg = f"Digest of a manifest is empty:\n{manifests[0]}"
+                raise InvalidManifestError(msg)
+            return str(digest)
+
+        raise InvalidMediaTypeError(media_type)
+
+    @staticmethod
+    def resolve_platforms(
+        manifest: dict[str, Any],
+        platform: str,
+    ) -> ManifestV2 | OCIImageManifestV1 | list[tuple[str, str]]:
+        """Check media type of a manifest and pick the platforms to follow.
+
+        Parameters
+        ----------
+        manifest : dict[str, Any]
+            returned manifest, manifest list or index
+        platform : str
+            platform to pick from a list or index, see `select_manifests`
+
+        Returns:
+        -------
+        ManifestV2 | OCIImageManifestV1 | list[tuple[str, str]]
+            image manifest itself, or platform names and digests of child manifests of a list or index
+
+        """
+        if manifest.get("mediaType") in _INDEX_MEDIA_TYPES:
+            return BaseBadgeGenerator.select_manifests(cast("ManifestListV2 | OCIImageIndexV1", manifest), platform)
+        return cast("ManifestV2 | OCIImageManifestV1", BaseBadgeGenerator.resolve_manifest(manifest))
+
+    @staticmethod
+    def select_manifests(index: ManifestListV2 | OCIImageIndexV1, platform: str) -> list[tuple[str, str]]:
+        """Pick child manifests of a manifest list or index to get sizes of.
+
+        Parameters
+        ----------
+        index : ManifestListV2 | OCIImageIndexV1
+            manifest list or index
+        platform : str
+            `os/architecture[/variant]` to pick its manifest, `min`, `max` or `all` to pick
+            manifests of all platforms, or empty to pick the first manifest
+
+        Returns:
+        -------
+        list[tuple[str, str]]
+            platform name and digest of each picked manifest
+
+        Raises:
+        ------
+        InvalidManifestError
+            raise if no manifest is for the platform, or a picked one has no digest
+
+        """
+        manifests = index.get("manifests")
+        if not isinstance(manifests, list) or len(manifests) == 0:
+            msg = "Returned list of manifest is empty."
+            raise InvalidManifestError(msg)
+        if platform == "":
+            picked = manifests[:1]
+        elif platform in BaseBadgeGenerator.platform_modes:
+            # attestations of buildx are listed as platform unknown/unknown
+            picked = [m for m in manifests if m.get("platform", {}).get("os", "unknown") != "unknown"]
+        else:
+            picked = [m for m in manifests if f"{_platform_name(m.get('platform', {}))}/".startswith(f"{platform}/")]
+            picked = picked[:1]
+        if not picked:
+            msg = f"No manifest is for platform {platform}."
+            raise InvalidManifestError(msg)
+        children = []
+        for manifest in picked:
+            if (digest := manifest.get("digest")) is None:
+                msg = f"Digest of a manifest is empty:\n{manifest}"
+                raise InvalidManifestError(msg)
+            children.append((_platform_name(manifest.get("platform", {})), str(digest)))
+        return children
+
+    @staticmethod
+    def check_platform(platform: str) -> None:
+        """Check if a platform or an aggregate of platforms is valid.
+
+        Parameters
+        ----------
+        platform : str
+            empty, `os/architecture[/variant]`, `min`, `max` or `all`
+
+        Raises:
+        ------
+        ValueError
+            raise if platform is invalid
+
+        """
+        modes = BaseBadgeGenerator.platform_modes
+        if platform and platform not in modes and not _PLATFORM_PATTERN.match(platform):
+            msg = f"{platform} should be os/architecture[/variant] or one of {', '.join(modes)}."
+            raise ValueError(msg)
+
+    @staticmethod
+    def check_manifest(manifest: Any, headers: Mapping[str, str], tag: str) -> tuple[dict[str, Any], str | None]:  # noqa: ANN401
+        """Validate a returned manifest body and find its digest.
+
+        Parameters
+        ----------
+        manifest : Any
+            decoded JSON body
+        headers : Mapping[str, str]
+            response headers
+        tag : str
+            requested tag name or digest
+
+        Returns:
+        -------
+        tuple[dict[str, Any], str | None]
+            manifest, and its digest if known and storable
+
+        Raises:
+        ------
+        InvalidManifestError
+            raise if response is invalid manifest
+
+        """
+        if manifest is None:
+            msg = "manifest is empty."
+            raise InvalidManifestError(msg)
+
+        if "errors" in manifest:
+            msg = f"manifest contains some error: {manifest.get('errors')}"
+            raise InvalidManifestError(msg)
+
+        digest = tag if tag.startswith("sha256:") else headers.get("Docker-Content-Digest", "")
+        if digest.startswith("sha256:") and manifest.get("mediaType") in _MEDIA_TYPES:
+            return manifest, digest
+        return manifest, None
+
+    @staticmethod
+    def check_tags(body: Any, *, allow_empty: bool = False) -> list[str]:  # noqa: ANN401
+        """Validate a returned tag list body.
+
+        Parameters
+        ----------
+        body : Any
+            decoded JSON body
+        allow_empty : bool, optional
+            accept a page without tags, e.g. after the first page, by default False
+
+        Returns:
+        -------
+        list[str]
+            tags, e.g. '1.0.0'
+
+        Raises:
+        ------
+        InvalidTagListError
+            raise if response is invalid
+
+        """
+        tags = body.get("tags") if isinstance(body, dict) else None
+        if allow_empty and tags is None:
+            return []
+        if not isinstance(tags, list) or (len(tags) == 0 and not allow_empty):
+            raise InvalidTagListError
+        return [str(tag) for tag in tags]
+
+    def truncated_error(self: Self, package_owner: str, package_name: str) -> TagListTruncatedError:
+        """Make the error of a tag list cut at `max_tag_pages` pages.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+
+        Returns:
+        -------
+        TagListTruncatedError
+            error to raise instead of returning the tags of the first pages
+
+        """
+        msg = (
+            f"tag list of {package_owner}/{package_name} has more than {self.max_tag_pages} pages, "
+            "raise TAG_MAX_PAGES to read it whole."
+        )
+        return TagListTruncatedError(msg)
+
+    @staticmethod
+    def next_page_url(url: str, headers: Mapping[str, str]) -> str | None:
+        """Find URL of the next tag list page from a `Link` header.
+
+        Parameters
+        ----------
+        url : str
+            URL of the current page
+        headers : Mapping[str, str]
+            response headers
+
+        Returns:
+        -------
+        str | None
+            absolute URL of the next page, if any
+
+        """
+        link = headers.get("Link")
+        if not link or (m := _LINK_NEXT_PATTERN.search(link)) is None:
+            return None
+        next_url = urljoin(url, m.group(1))
+        return None if next_url == url else next_url
+
+    def manifest_request(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        tag: str,
+    ) -> tuple[str, dict[str, str]]:
+        """Build URL and headers to get a manifest.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str
+            tag name or digest
+
+        Returns:
+        -------
+        tuple[str, dict[str, str]]
+            URL and headers
+
+        """
+        token = self.auth(package_owner, package_name)
+        url = f"{self.registry_url}/v2/{package_owner}/{package_name}/manifests/{tag}"
+        return url, {
+            "User-Agent": _USER_AGENT,
+            "Authorization": f"Bearer {token}",
+            "Accept": f"{_MEDIA_TYPE_OCI_IMAGE_INDEX_V1}, {_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1}",
+        }
+
+    def tags_request(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        last: str | None = None,
+    ) -> tuple[str, dict[str, str], dict[str, str | int]]:
+        """Build URL, headers and query parameters to get the first page of a tag list.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        last : str | None, optional
+            list only tags after this one, by default None
+
+        Returns:
+        -------
+        tuple[str, dict[str, str], dict[str, str | int]]
+            URL, headers and query parameters
+
+        """
+        token = self.auth(package_owner, package_name)
+        url = f"{self.registry_url}/v2/{package_owner}/{package_name}/tags/list"
+        params: dict[str, str | int] = {
+            "n": _TAGS_PAGE_SIZE,
+        }
+        if last is not None:
+            params["last"] = last
+        return url, {"User-Agent": _USER_AGENT, "Authorization": f"Bearer {token}"}, params
+
+    def order_tags(self: Self, tag_list: TagList) -> list[str]:
+        """Get tags of a cached tag list in the order of `sort`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tag_list : TagList
+            cached tag list
+
+        Returns:
+        -------
+        list[str]
+            ordered tags
+
+        """
+        return list(tag_list.by_version if self.sort == "semver" else tag_list.tags)
+
+    def tags_cursor(self: Self, cached: TagList | None, now: float) -> str | None:
+        """Get the tag to continue a cached tag list from on refresh.
+
+        The registry lists tags after `last` in lexical order, so tags sorting
+        before it (e.g. `v1.10.0` after `v1.9.0`) and deleted tags are only
+        picked up by a whole fetch every `tag_resync_interval` second. With
+        `sort="semver"` such a new tag is the latest version, so the whole
+        list is fetched, conditionally if it fits in one page, and a list
+        refreshed after a cursor by other generators is synced on read, see
+        `needs_sync`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        cached : TagList | None
+            cached tag list if exists
+        now : float
+            current `time.time()`
+
+        Returns:
+        -------
+        str | None
+            last cached tag, or None if the whole list should be fetched
+
+        """
+        if cached is None or not cached.tags or now - cached.synced_at >= self.tag_resync_interval:
+            return None
+        if self.sort == "semver":
+            return None
+        return cached.tags[-1]
+
+    def needs_sync(self: Self, tag_list: TagList) -> bool:
+        """Check if a cached tag list should be fetched whole before it is read.
+
+        `tag_cache` is shared by all sort orders, so a list read by version may
+        have been refreshed after a lexical cursor by another generator, the
+        prefetcher or a stale-while-revalidate refresh.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tag_list : TagList
+            cached tag list
+
+        Returns:
+        -------
+        bool
+            True if it is read by version and new versions may be missing
+
+        """
+        return self.sort == "semver" and tag_list.partial
+
+    @staticmethod
+    def is_single_page(cached: TagList | None, cursor: str | None) -> bool:
+        """Check if tags to fetch are expected in one page, so that a conditional request can tell they are the same.
+
+        `304 Not Modified` only tells the first page did not change, so tag
+        lists of more pages are always fetched whole.
+
+        Parameters
+        ----------
+        cached : TagList | None
+            cached tag list if exists
+        cursor : str | None
+            `last` the tags are fetched after, None to fetch the whole list
+
+        Returns:
+        -------
+        bool
+            True if tags after the cursor, or the whole cached list, fit in one page
+
+        """
+        return cursor is not None or cached is None or len(cached.tags) < _TAGS_PAGE_SIZE
 
-_TIMEOUT = 10
+    @staticmethod
+    def unmodified_tags(cached: TagList, cursor: str | None, now: float) -> TagList:
+        """Get the tag list to cache when the fetched page was not modified.
 
+        Parameters
+        ----------
+        cached : TagList
+            cached tag list
+        cursor : str | None
+            `last` the tags were fetched after, None if they are the whole list
+        now : float
+            `time.time()` when the tags were fetched
 
-class InvalidTokenError(Exception):
-    """Exception for invalid token."""
+        Returns:
+        -------
+        TagList
+            cached tag list, synced now if it was fetched whole, else partial
 
+        """
+        return cached._replace(partial=True) if cursor is not None else cached._replace(synced_at=now, partial=False)
 
-class InvalidTagError(Exception):
-    """Exception for invalid tag."""
+    @staticmethod
+    def merge_tags(cached: TagList | None, tags: list[str], cursor: str | None, now: float) -> TagList:
+        """Merge fetched tags into a cached tag list.
 
+        Parameters
+        ----------
+        cached : TagList | None
+            cached tag list if exists
+        tags : list[str]
+            fetched tags
+        cursor : str | None
+            `last` the tags were fetched after, None if they are the whole list
+        now : float
+            `time.time()` when the tags were fetched
 
-class InvalidTagListError(Exception):
-    """Exception for invalid tag list."""
+        Returns:
+        -------
+        TagList
+            tag list to cache
 
+        """
+        if cursor is None or cached is None:
+            return TagList.of(tuple(tags), now)
+        if not tags:
+            return cached._replace(partial=True)
+        return TagList.of(tuple(dict.fromkeys((*cached.tags, *tags))), cached.synced_at, partial=True)
 
-class InvalidManifestError(Exception):
-    """Exception for invalid manifest."""
+    @staticmethod
+    def auth(package_owner: str, package_name: str) -> str:
+        """Validate package and make an anonymous token for it.
 
+        Parameters
+        ----------
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
 
-class InvalidImageError(Exception):
-    """Exception for invalid image."""
+        Returns:
+        -------
+        str
+            bearer token
 
+        Raises:
+        ------
+        InvalidImageError
+            raise if owner or name is invalid
 
-class InvalidMediaTypeError(Exception):
-    """Exception for invalid media type."""
+        """
+        m_user = re.match(_GITHUB_USER_PATTERN, package_owner)
+        m_repo = re.match(_GITHUB_REPO_PATTERN, package_name)
+        if m_user is None or m_repo is None:
+            raise InvalidImageError
+        token = base64.b64encode(f"v1:{package_owner}/{package_name}:0".encode())
+        return token.decode("utf-8")
 
+    @staticmethod
+    def check_tag(tag: str) -> None:
+        """Validate a tag name or digest.
 
-_GITHUB_USER_PATTERN = r"^[a-zA-Z0-9]([a-zA-Z0-9]?|[-]?([a-zA-Z0-9])){0,38}$"
-_GITHUB_REPO_PATTERN = r"^[-a-zA-Z0-9]{1,100}$"
-_IMAGE_TAG_PATTERN = r"^([a-zA-Z0-9_][a-zA-Z0-9_.-]{0,127}|sha256:[a-z0-9]{64})$"
-_USER_AGENT = "Docker-Client/20.10.2 (linux)"
+        Parameters
+        ----------
+        tag : str
+            tag name or digest
 
-_MEDIA_TYPE_MANIFEST = "application/vnd.docker.distribution.manifest"
-_MEDIA_TYPE_MANIFEST_V2 = f"{_MEDIA_TYPE_MANIFEST}.v2+json"
-_MEDIA_TYPE_MANIFEST_LIST_V2 = f"{_MEDIA_TYPE_MANIFEST}.list.v2+json"
+        Raises:
+        ------
+        InvalidTagError
+            raise if tag is invalid
 
-_MEDIA_TYPE_OCI_IMAGE_MANIFEST = "application/vnd.oci.image.manifest"
-_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1 = f"{_MEDIA_TYPE_OCI_IMAGE_MANIFEST}.v1+json"
-_MEDIA_TYPE_OCI_IMAGE_INDEX_V1 = "application/vnd.oci.image.index.v1+json"
+        """
+        if re.match(_IMAGE_TAG_PATTERN, tag) is None:
+            raise InvalidTagError(tag)
 
 
-class GHCRBadgeGenerator:
+class GHCRBadgeGenerator(BaseBadgeGenerator):
     """Generator for GHCR Badge."""
 
     def __init__(
@@ -66,6 +949,8 @@ class GHCRBadgeGenerator:
         color: str = "#44cc11",
         ignore_tag: str = "latest",
         trim_type: str = "",
+        sort: str = "lexical",
+        client: UpstreamClient | None = None,
     ) -> None:
         """_summary_.
 
@@ -79,14 +964,14 @@ class GHCRBadgeGenerator:
             tag name to hide, by default "latest"
         trim_type : str, optional
             type to hide tags
+        sort : str, optional
+            order of tags, `lexical` (registry order) or `semver`, by default "lexical"
+        client : UpstreamClient | None, optional
+            upstream client, by default the process-wide shared one
 
         """
-        self.color = color
-        self.ignore_tags: list[str] = ignore_tag.split(",")
-        self.trim_pattern = {
-            "patch": r"^v?\d+\.\d+\.\d+[^.]*$",
-            "major": r"^v?\d+\.\d+[^.]*$",
-        }.get(trim_type, "^$")
+        super().__init__(color=color, ignore_tag=ignore_tag, trim_type=trim_type, sort=sort)
+        self.client = client if client is not None else get_client()
 
     def generate_tags(
         self: Self,
@@ -125,17 +1010,13 @@ class GHCRBadgeGenerator:
         if n < 0:
             msg = f"{n} should be positive."
             raise ValueError(msg)
+        with span("auth"):
+            self.auth(package_owner, package_name)
         try:
-            tags = self.filter_tags(package_owner, package_name)[::-1][:n][::-1]
+            tags = self.filter_tags(package_owner, package_name, n=n)[::-1][:n][::-1]
         except InvalidTagListError:
             return self.get_invalid_badge(label)
-        badge_value = " " + " | ".join(tags)
-        badge = Badge(
-            label=label,
-            value=str(badge_value),
-            default_color=self.color,
-        )
-        return str(badge.badge_svg_text)
+        return self.render_tags(tags, label=label)
 
     def generate_latest_tag(
         self: Self,
@@ -163,17 +1044,13 @@ class GHCRBadgeGenerator:
             svg string of generated badge of latest tag
 
         """
+        with span("auth"):
+            self.auth(package_owner, package_name)
         try:
-            latest_tag = self.filter_tags(package_owner, package_name)[-1]
+            latest_tag = self.filter_tags(package_owner, package_name, n=1)[-1]
         except InvalidTagListError:
             return self.get_invalid_badge(label)
-        badge_value = str(latest_tag)
-        badge = Badge(
-            label=label,
-            value=str(badge_value),
-            default_color=self.color,
-        )
-        return str(badge.badge_svg_text)
+        return self.render_latest_tag(latest_tag, label=label)
 
     def generate_size(
         self: Self,
@@ -181,6 +1058,7 @@ class GHCRBadgeGenerator:
         package_name: str,
         tag: str = "latest",
         label: str = "image size",
+        platform: str = "",
     ) -> str:
         """Generate image size badge.
 
@@ -196,6 +1074,9 @@ class GHCRBadgeGenerator:
             tag name, by default "latest"
         label : str, optional
             label text, by default "image size"
+        platform : str, optional
+            `os/architecture[/variant]` of a multi-arch image, or `min`, `max` or `all`
+            to aggregate sizes of its platforms, by default the first platform
 
         Returns:
         -------
@@ -203,20 +1084,18 @@ class GHCRBadgeGenerator:
             svg string of generated badge of size
 
         """
+        with span("auth"):
+            self.check_platform(platform)
+            self.check_tag(tag)
+            self.auth(package_owner, package_name)
         try:
-            manifest = self.get_manifest(package_owner, package_name, tag=tag)
+            if platform == "":
+                manifests = [("", self.get_manifest(package_owner, package_name, tag=tag))]
+            else:
+                manifests = self.get_platform_manifests(package_owner, package_name, tag=tag, platform=platform)
         except (InvalidManifestError, InvalidMediaTypeError):
             return self.get_invalid_badge(label)
-        config_size = int(manifest.get("config", {"size": 0}).get("size", 0))
-        layers = [int(layer.get("size", 0)) for layer in manifest.get("layers", [])]
-        layer_size = sum(layers)
-        size = f"{config_size + layer_size}B"
-        badge = Badge(
-            label=label,
-            value=str(format_size(parse_size(size), binary=True)),
-            default_color=self.color,
-        )
-        return str(badge.badge_svg_text)
+        return self.render_platform_sizes(manifests, platform=platform, label=label)
 
     def get_manifest(
         self: Self,
@@ -224,8 +1103,12 @@ class GHCRBadgeGenerator:
         package_name: str,
         *,
         tag: str = "latest",
+        phase: str = "manifest",
     ) -> ManifestV2 | OCIImageManifestV1:
-        """Get manifest from ghcr api.
+        """Get manifest from ghcr api, following the first child of a manifest list or index.
+
+        Manifests addressed by digest are immutable, so they are read from
+        `manifest_store` when possible instead of being fetched again.
 
         Parameters
         ----------
@@ -237,6 +1120,9 @@ class GHCRBadgeGenerator:
             package name
         tag : str, optional
             tag name, by default "latest"
+        phase : str, optional
+            span name of the lookup, by default "manifest";
+            lookups of children of a manifest list or index are `manifest_child`
 
         Returns:
         -------
@@ -253,63 +1139,120 @@ class GHCRBadgeGenerator:
             raise if response is invalid media type
 
         """
-        if re.match(_IMAGE_TAG_PATTERN, tag) is None:
-            raise InvalidTagError(tag)
+        with span(phase):
+            manifest = self.load_manifest(package_owner, package_name, tag=tag)
+        resolved = self.resolve_manifest(manifest)
+        if isinstance(resolved, str):
+            return self.get_manifest(package_owner, package_name, tag=resolved, phase="manifest_child")
+        return resolved
 
-        token = self.__auth(package_owner, package_name)
-        url = f"https://ghcr.io/v2/{package_owner}/{package_name}/manifests/{tag}"
-        manifest = requests.get(
-            url,
-            headers={
-                "User-Agent": _USER_AGENT,
-                "Authorization": f"Bearer {token}",
-                "Accept": f"{_MEDIA_TYPE_OCI_IMAGE_INDEX_V1}, {_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1}",
-            },
-            timeout=_TIMEOUT,
-        ).json()
+    def load_manifest(self: Self, package_owner: str, package_name: str, *, tag: str = "latest") -> dict[str, Any]:
+        """Get a manifest of any media type, reading `manifest_store` for digests.
 
-        if manifest is None:
-            msg = "manifest is empty."
-            raise InvalidManifestError(msg)
+        A mutable tag whose manifest was seen before is checked with HEAD,
+        and its stored manifest is reused if `Docker-Content-Digest` is still
+        the same, without downloading it again, or if upstream throttles.
+        Concurrent calls for the same tag share one request.
 
-        if "errors" in manifest:
-            msg = f"manifest contains some error: {manifest.get('errors')}"
-            raise InvalidManifestError(msg)
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name or digest, by default "latest"
 
-        media_type = manifest.get("mediaType")
+        Returns:
+        -------
+        dict[str, Any]
+            manifest, manifest list or index
 
-        if media_type == _MEDIA_TYPE_MANIFEST_V2:
-            return cast("ManifestV2", manifest)
+        """
+        self.check_tag(tag)
+        self.auth(package_owner, package_name)
+        known = tag if tag.startswith("sha256:") else tag_digests.recall((package_owner, package_name, tag))
+        if known is not None and (manifest := manifest_store.get(known)) is not None:
+            if known == tag:
+                return manifest
+            try:
+                digest = single_flight.do(
+                    ("digests", package_owner, package_name, tag),
+                    lambda: self.fetch_digest(package_owner, package_name, tag=tag),
+                )
+            except UpstreamThrottledError:
+                return manifest  # the last seen manifest of the tag, rather than none
+            if revalidations.count(known, digest):
+                return manifest
+        return single_flight.do(
+            ("manifests", package_owner, package_name, tag),
+            lambda: self.fetch_manifest(package_owner, package_name, tag=tag),
+        )
 
-        if media_type == _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1:
-            return cast("OCIImageManifestV1", manifest)
+    def get_platform_manifests(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+        platform: str = "",
+    ) -> list[tuple[str, ManifestV2 | OCIImageManifestV1]]:
+        """Get image manifests of platforms of a multi-arch image from ghcr api.
 
-        if media_type == _MEDIA_TYPE_MANIFEST_LIST_V2:
-            manifest = cast("ManifestListV2", manifest)
-            manifests = manifest.get("manifests")
-            if not isinstance(manifests, list) or len(manifests) == 0:
-                msg = "Returned list of manifest is empty."
-                raise InvalidManifestError(msg)
-            if (digest := manifests[0].get("digest")) is None:
-                msg = f"Digest of a manifest is empty:\n{manifests[0]}"
-                raise InvalidManifestError(msg)
-            return self.get_manifest(package_owner, package_name, tag=digest)
+        Child manifests are fetched by digest concurrently, so that all
+        platforms cost about one round trip.
 
-        if media_type == _MEDIA_TYPE_OCI_IMAGE_INDEX_V1:
-            manifest = cast("OCIImageIndexV1", manifest)
-            manifests = manifest.get("manifests")
-            if not isinstance(manifests, list) or len(manifests) == 0:
-                msg = "Returned list of manifest is empty."
-                raise InvalidManifestError(msg)
-            if (digest := manifests[0].get("digest")) is None:
-                msg = f"Digest of a manifest is empty:\n{manifests[0]}"
-                raise InvalidManifestError(msg)
-            return self.get_manifest(package_owner, package_name, tag=digest)
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+        platform : str, optional
+            platform to pick, see `select_manifests`, by default the first one
 
-        raise InvalidMediaTypeError(media_type)
+        Returns:
+        -------
+        list[tuple[str, ManifestV2 | OCIImageManifestV1]]
+            platform name and image manifest of each picked platform,
+            a single one with empty name if the image is not multi-arch
 
-    def get_tags(self: Self, package_owner: str, package_name: str) -> list[str]:
-        """Get tags of the given package.
+        """
+        with span("manifest"):
+            manifest = self.load_manifest(package_owner, package_name, tag=tag)
+        children = self.resolve_platforms(manifest, platform)
+        if not isinstance(children, list):
+            return [("", children)]
+
+        def get(digest: str) -> ManifestV2 | OCIImageManifestV1:
+            return self.get_manifest(package_owner, package_name, tag=digest, phase="manifest_child")
+
+        if len(children) == 1:
+            return [(children[0][0], get(children[0][1]))]
+        with ThreadPoolExecutor(max_workers=min(len(children), self.max_manifest_fetches)) as pool:
+            # each fetch runs in a copy of this context, so that its spans join the request's trace
+            futures = [pool.submit(contextvars.copy_context().run, get, digest) for _, digest in children]
+            manifests = [future.result() for future in futures]
+        return [(name, manifest) for (name, _), manifest in zip(children, manifests, strict=True)]
+
+    def fetch_manifest(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        tag: str = "latest",
+    ) -> dict[str, Any]:
+        """Fetch a manifest of any media type from ghcr api, bypassing cache.
+
+        The manifest is stored to `manifest_store` if its digest is known, and
+        the digest to `tag_digests` for a tag. Concurrent calls from
+        `load_manifest` for the same tag share one request.
 
         Parameters
         ----------
@@ -319,42 +1262,65 @@ class GHCRBadgeGenerator:
             package owner name
         package_name : str
             package name
+        tag : str, optional
+            tag name or digest, by default "latest"
 
         Returns:
         -------
-        list[str]
-            tags, e.g. '1.0.0'
+        dict[str, Any]
+            returned manifest, manifest list or index
 
         Raises:
         ------
-        InvalidTagListError
-            raise if response is invalid
+        InvalidManifestError
+            raise if response is invalid manifest
 
         """
-        token = self.__auth(package_owner, package_name)
-        url = f"https://ghcr.io/v2/{package_owner}/{package_name}/tags/list"
-        params = {
-            "n": 300,
-        }
-        tags = (
-            requests.get(
-                url,
-                headers={"User-Agent": _USER_AGENT, "Authorization": f"Bearer {token}"},
-                timeout=10,
-                params=params,
-            )
-            .json()
-            .get("tags")
-        )
-        if not isinstance(tags, list) or len(tags) == 0:
-            raise InvalidTagListError
-        return [str(tag) for tag in tags]
+        url, headers = self.manifest_request(package_owner, package_name, tag)
+        response = self.client.get(url, headers=headers)
+        manifest, digest = self.check_manifest(response.json(), response.headers, tag)
+        if digest is not None:
+            manifest_store.set(digest, manifest, weight=len(response.content))
+            if digest != tag:
+                tag_digests.set((package_owner, package_name, tag), digest)
+        return manifest
+
+    def fetch_digest(self: Self, package_owner: str, package_name: str, *, tag: str = "latest") -> str | None:
+        """Fetch the digest of a manifest from ghcr api with HEAD, without downloading it.
 
-    def filter_tags(self: Self, package_owner: str, package_name: str) -> list[str]:
-        """Filter tags by regex pattern.
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        tag : str, optional
+            tag name, by default "latest"
+
+        Returns:
+        -------
+        str | None
+            `Docker-Content-Digest` of the manifest, None if the registry does not tell it
+
+        """
+        self.check_tag(tag)
+        url, headers = self.manifest_request(package_owner, package_name, tag)
+        response = self.client.head(url, headers=headers)
+        digest = response.headers.get("Docker-Content-Digest")
+        return digest if response.ok and digest else None
+
+    def get_tags(self: Self, package_owner: str, package_name: str) -> list[str]:
+        """Get tags of the given package through `tag_cache`, in the order of `sort`.
+
+        A stale tag list is refreshed with only the tags after its last one,
+        unless it is read by version, see `needs_sync`.
 
         Parameters
         ----------
+        self : Self
+            class instance
         package_owner : str
             package owner name
         package_name : str
@@ -363,44 +1329,167 @@ class GHCRBadgeGenerator:
         Returns:
         -------
         list[str]
-            Filtered tags
+            tags, e.g. '1.0.0'
 
         """
-        tags: list[str] = []
-        target_tags = [t for t in self.get_tags(package_owner, package_name) if not re.match(self.trim_pattern, t)]
-        for tag in target_tags:
-            matched = False
-            for ignore_tag in self.ignore_tags:
-                if fnmatch.fnmatch(tag, ignore_tag):
-                    matched = True
-                    break
-            if not matched:
-                tags.append(tag)
-        return tags
+        with span("tags"):
+            tag_list = tag_cache.get((package_owner, package_name), lambda: self.load_tags(package_owner, package_name))
+            if self.needs_sync(tag_list):
+                tag_list = self.load_tags(package_owner, package_name)
+                tag_cache.set((package_owner, package_name), tag_list)
+        with span("filter"):
+            return self.order_tags(tag_list)
 
-    @staticmethod
-    def get_invalid_badge(label: str) -> str:
-        """Generate and Get invalid badge.
+    def load_tags(self: Self, package_owner: str, package_name: str) -> TagList:
+        """Load a fresh tag list of the given package, without storing it to `tag_cache`.
+
+        A cached tag list is extended with only the tags after its last one,
+        unless it is due to be synced whole.
 
         Parameters
         ----------
-        label : str
-            badge label
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+
+        Returns:
+        -------
+        TagList
+            tag list to cache
+
+        """
+        cached, now = tag_cache.peek((package_owner, package_name)), time.time()
+        cursor = self.tags_cursor(cached, now)
+        conditional = self.is_single_page(cached, cursor)
+        try:
+            tags = self.fetch_tags(package_owner, package_name, last=cursor, conditional=conditional)
+        except TagListNotModifiedError:
+            if cached is None:  # validators outlived the cached list
+                tags = self.fetch_tags(package_owner, package_name, last=cursor)
+            else:
+                return self.unmodified_tags(cached, cursor, now)
+        return self.merge_tags(cached, tags, cursor, now)
+
+    def fetch_tags(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        last: str | None = None,
+        conditional: bool = False,
+    ) -> list[str]:
+        """Fetch tags of the given package from ghcr api, bypassing cache.
+
+        Concurrent calls for the same package share one request.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        last : str | None, optional
+            fetch only tags after this one, by default None
+        conditional : bool, optional
+            request the first page with validators of the last response, by default False
 
         Returns:
         -------
+        list[str]
+            tags, e.g. '1.0.0'
+
+        Raises:
+        ------
+        InvalidTagListError
+            raise if response is invalid
+        TagListNotModifiedError
+            raise if a conditional request was answered `304 Not Modified`
+
+        """
+        return list(
+            single_flight.do(
+                ("tags", package_owner, package_name, last or "", "conditional" if conditional else ""),
+                lambda: list(self.iter_tags(package_owner, package_name, last=last, conditional=conditional)),
+            ),
+        )
+
+    def iter_tags(
+        self: Self,
+        package_owner: str,
+        package_name: str,
+        *,
+        last: str | None = None,
+        conditional: bool = False,
+    ) -> Iterator[str]:
+        """Iterate tags of the given package, fetching pages lazily.
+
+        It follows `Link` headers up to `max_tag_pages` pages, and stops
+        fetching as soon as the caller stops iterating. A list with more
+        pages raises rather than ending early, as its last tags are missing.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        last : str | None, optional
+            iterate only tags after this one, by default None
+        conditional : bool, optional
+            request the first page with validators of the last response, by default False
+
+        Yields:
+        ------
         str
-            svg string
+            tag, e.g. '1.0.0'
+
+        Raises:
+        ------
+        InvalidTagListError
+            raise if the first page is invalid
+        TagListTruncatedError
+            raise if there are more than `max_tag_pages` pages
+        TagListNotModifiedError
+            raise if a conditional request was answered `304 Not Modified`
 
         """
-        badge = Badge(label=label, value=str("invalid"), default_color="#e05d44")
-        return str(badge.badge_svg_text)
+        url, headers, params = self.tags_request(package_owner, package_name, last=last)
+        query: dict[str, str | int] | None = params
+        for page in range(self.max_tag_pages):
+            response = self.client.get(url, headers=headers, params=query, conditional=conditional and page == 0)
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                raise TagListNotModifiedError
+            yield from self.check_tags(response.json(), allow_empty=page > 0 or last is not None)
+            if (next_url := self.next_page_url(url, response.headers)) is None:
+                return
+            url, query = next_url, None  # the next URL carries its own query
+        raise self.truncated_error(package_owner, package_name)
+
+    def filter_tags(self: Self, package_owner: str, package_name: str, n: int | None = None) -> list[str]:
+        """Filter tags by regex pattern.
 
-    @staticmethod
-    def __auth(package_owner: str, package_name: str) -> str:
-        m_user = re.match(_GITHUB_USER_PATTERN, package_owner)
-        m_repo = re.match(_GITHUB_REPO_PATTERN, package_name)
-        if m_user is None or m_repo is None:
-            raise InvalidImageError
-        token = base64.b64encode(f"v1:{package_owner}/{package_name}:0".encode())
-        return token.decode("utf-8")
+        Parameters
+        ----------
+        package_owner : str
+            package owner name
+        package_name : str
+            package name
+        n : int | None, optional
+            keep only the last n filtered tags, by default None (keep all)
+
+        Returns:
+        -------
+        list[str]
+            Filtered tags
+
+        """
+        tags = self.get_tags(package_owner, package_name)
+        with span("filter"):
+            return self.filter_tag_list(tags, n)
@@ -2,18 +2,31 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import sys
+import time
 from argparse import (
+    SUPPRESS,
+    Action,
     ArgumentDefaultsHelpFormatter,
     ArgumentParser,
     ArgumentTypeError,
     Namespace,
     RawDescriptionHelpFormatter,
 )
-from http.client import CannotSendRequest, HTTPConnection
 from pathlib import Path
 from shutil import get_terminal_size
+from typing import TYPE_CHECKING, Any, NamedTuple, NoReturn
 
-from . import GHCRBadgeGenerator, __version__
+# HTTP clients, badge rendering and thread pools are imported where they are
+# used, so that `--help`, `--version` and argument errors answer right away.
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+BADGE_KINDS = ("tags", "latest_tag", "size")
+_STATE_VERSION = 2
 
 
 class HttpConnectionNotFountError(Exception):
@@ -24,6 +37,78 @@ class HelpFormatter(ArgumentDefaultsHelpFormatter, RawDescriptionHelpFormatter):
     """Help formatter for argparse."""
 
 
+class VersionAction(Action):
+    """Print the version, read from package metadata only when asked."""
+
+    def __init__(
+        self: VersionAction,
+        option_strings: Sequence[str],
+        dest: str = SUPPRESS,
+        default: str = SUPPRESS,
+        help: str = "show program's version number and exit",  # noqa: A002
+    ) -> None:
+        """Create the action of `-V`."""
+        super().__init__(option_strings, dest, nargs=0, default=default, help=help)
+
+    def __call__(
+        self: VersionAction,
+        parser: ArgumentParser,
+        namespace: Namespace,  # noqa: ARG002
+        values: str | Sequence[Any] | None,  # noqa: ARG002
+        option_string: str | None = None,  # noqa: ARG002
+    ) -> NoReturn:
+        """Print the version and exit."""
+        from . import __version__  # noqa: PLC0415
+
+        parser.exit(message=f"{__version__}\n")
+
+
+class BadgeJob(NamedTuple):
+    """Badge to generate in bulk mode."""
+
+    user: str
+    name: str
+    kind: str
+    params: dict[str, str]
+
+    @property
+    def path(self: BadgeJob) -> Path:
+        """Get the path of the badge relative to the output directory."""
+        return Path(self.user, self.name, f"{self.kind}.svg")
+
+
+class BadgeResult(NamedTuple):
+    """Outcome of a badge generated in bulk mode."""
+
+    job: BadgeJob
+    seconds: float
+    error: Exception | None
+    written: bool = False
+    """Whether the file was created or its content changed."""
+    inputs: str | None = None
+    """Fingerprint of upstream inputs of the badge, if checked."""
+    tag_list: TagListState | None = None
+    """Tag list of the package, if checked."""
+
+
+class TagListState(NamedTuple):
+    """Tag list of a package remembered between `--batch` runs."""
+
+    digest: str
+    """hex digest of the tags"""
+    validators: dict[str, str]
+    """`If-None-Match` and `If-Modified-Since` to check it is unchanged, empty if it has several pages"""
+
+
+class BatchState(NamedTuple):
+    """Upstream inputs remembered between `--batch` runs."""
+
+    inputs: dict[str, str]
+    """fingerprints of badge inputs by badge path"""
+    tag_lists: dict[str, TagListState]
+    """tag lists by `OWNER/NAME`"""
+
+
 def check_connectivity(url: str = "www.google.com", timeout: int = 3) -> bool:
     """Check connectivity.
 
@@ -40,6 +125,8 @@ def check_connectivity(url: str = "www.google.com", timeout: int = 3) -> bool:
         True if online.
 
     """
+    from http.client import CannotSendRequest, HTTPConnection  # noqa: PLC0415
+
     conn = HTTPConnection(url, timeout=timeout)
     try:
         conn.request("HEAD", "/")
@@ -67,17 +154,15 @@ def parse_args(test: list[str] | None = None) -> Namespace:
     parser.add_argument(
         "-u",
         "--user",
-        required=True,
         metavar="ID",
-        help="container owner",
+        help="container owner (required unless --batch)",
     )
     parser.add_argument(
         "-n",
         "--name",
         type=str,
         metavar="NAME",
-        required=True,
-        help="container name",
+        help="container name (required unless --batch)",
     )
     parser.add_argument(
         "-c",
@@ -94,8 +179,431 @@ def parse_args(test: list[str] | None = None) -> Namespace:
         metavar="PATH",
         help="save path",
     )
-    parser.add_argument("-V", "--version", action="version", version=__version__)
-    return parser.parse_args(args=test)
+    parser.add_argument(
+        "-b",
+        "--batch",
+        type=str,
+        metavar="FILE",
+        help="generate badges listed in FILE ('-' for stdin), one 'OWNER/NAME [KIND...] [KEY=VALUE...]' per line",
+    )
+    parser.add_argument(
+        "-d",
+        "--out-dir",
+        type=str,
+        metavar="DIR",
+        default=".",
+        help="directory to save badges of --batch as DIR/OWNER/NAME/KIND.svg",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        default=8,
+        help="number of badges of --batch generated concurrently",
+    )
+    parser.add_argument(
+        "-s",
+        "--state",
+        type=str,
+        metavar="FILE",
+        help="remember upstream inputs of --batch badges in FILE, and regenerate only badges whose inputs changed",
+    )
+    parser.add_argument("-V", "--version", action=VersionAction)
+    args = parser.parse_args(args=test)
+    if args.batch is None and (args.user is None or args.name is None):
+        parser.error("the following arguments are required: -u/--user, -n/--name")
+    if args.jobs < 1:
+        parser.error(f"argument -j/--jobs: {args.jobs} should be positive")
+    return args
+
+
+def parse_badge_list(lines: Iterable[str], *, color: str = "lime") -> list[BadgeJob]:
+    """Parse a list of badges to generate in bulk.
+
+    Each line is `OWNER/NAME [KIND...] [KEY=VALUE...]`. Kinds are `tags`
+    (default), `latest_tag` and `size`; parameters are the ones of the server's
+    paths, e.g. `n=5` or `tag=v1`. Blank lines and `#` comments are skipped.
+    A badge is saved as `OWNER/NAME/KIND.svg`, so a package has one badge of
+    each kind.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        lines of the list
+    color : str, optional
+        badge color unless given by `color=`, by default "lime"
+
+    Returns:
+    -------
+    list[BadgeJob]
+        badges in order
+
+    Raises:
+    ------
+    ValueError
+        raise if a line is malformed, or a badge is saved to the path of an earlier line
+
+    """
+    jobs = []
+    seen: dict[Path, int] = {}
+    for lineno, line in enumerate(lines, 1):
+        words = line.split("#", 1)[0].split()
+        if not words:
+            continue
+        user, _, name = words[0].partition("/")
+        if not user or not name:
+            msg = f"line {lineno}: {words[0]!r} should be OWNER/NAME."
+            raise ValueError(msg)
+        kinds = [word for word in words[1:] if "=" not in word]
+        if unknown := set(kinds) - set(BADGE_KINDS):
+            msg = f"line {lineno}: kind should be one of {', '.join(BADGE_KINDS)}, not {', '.join(sorted(unknown))}."
+            raise ValueError(msg)
+        params = {"color": color} | dict(word.split("=", 1) for word in words[1:] if "=" in word)
+        for kind in dict.fromkeys(kinds or ["tags"]):
+            job = BadgeJob(user, name, kind, params)
+            if (first := seen.setdefault(job.path, lineno)) != lineno:
+                msg = f"line {lineno}: {user}/{name} {kind} is already saved to {job.path} by line {first}."
+                raise ValueError(msg)
+            jobs.append(job)
+    return jobs
+
+
+def generate_badge(job: BadgeJob) -> str:
+    """Generate a badge of a job.
+
+    Parameters
+    ----------
+    job : BadgeJob
+        badge to generate
+
+    Returns:
+    -------
+    str
+        svg string
+
+    """
+    from .generate import GHCRBadgeGenerator  # noqa: PLC0415
+
+    params = job.params
+    generator = GHCRBadgeGenerator(
+        color=params.get("color", "lime"),
+        ignore_tag=params.get("ignore", "latest"),
+        trim_type=params.get("trim", ""),
+        sort=params.get("sort", "lexical"),
+    )
+    label = {"label": params["label"]} if "label" in params else {}
+    if job.kind == "size":
+        platform = {"platform": params["platform"]} if "platform" in params else {}
+        return generator.generate_size(job.user, job.name, tag=params.get("tag", "latest"), **label, **platform)
+    if job.kind == "latest_tag":
+        return generator.generate_latest_tag(job.user, job.name, **label)
+    return generator.generate_tags(job.user, job.name, **({"n": int(params["n"])} if "n" in params else {}), **label)
+
+
+def check_tag_list(user: str, name: str, previous: TagListState | None = None) -> TagListState:
+    """Check the tag list of a package, downloading it only if it changed.
+
+    A list which fitted in one page is requested with the validators of the
+    previous run, so that an unchanged one costs a single `304 Not Modified`.
+    A changed one-page list is put in `tag_cache` for generating badges.
+
+    Parameters
+    ----------
+    user : str
+        package owner name
+    name : str
+        package name
+    previous : TagListState | None, optional
+        tag list of the previous run, by default None
+
+    Returns:
+    -------
+    TagListState
+        digest of the tags, and validators if they fit in one page
+
+    """
+    from http import HTTPStatus  # noqa: PLC0415
+
+    from .generate import GHCRBadgeGenerator, TagList, tag_cache  # noqa: PLC0415
+    from .upstream import conditional_headers  # noqa: PLC0415
+
+    generator = GHCRBadgeGenerator()
+    url, headers, params = generator.tags_request(user, name)
+    validators = previous.validators if previous is not None else {}
+    response = generator.client.get(url, headers={**headers, **validators}, params=params)
+    if previous is not None and validators and response.status_code == HTTPStatus.NOT_MODIFIED:
+        return previous
+    if response.status_code == HTTPStatus.OK and generator.next_page_url(url, response.headers) is None:
+        tags = generator.check_tags(response.json())
+        tag_cache.set((user, name), TagList.of(tuple(tags), time.time()))
+        return TagListState(_tags_digest(tags), conditional_headers(response.headers))
+    # several pages: only the first one could be checked with validators
+    return TagListState(_tags_digest(generator.get_tags(user, name)), {})
+
+
+def _tags_digest(tags: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(tags)).encode()).hexdigest()
+
+
+def badge_inputs(job: BadgeJob, tag_list: TagListState | None = None) -> str | None:
+    """Fingerprint upstream inputs of a badge without generating it.
+
+    Tag badges depend on the tag list of the package, checked once for all
+    its badges by `check_tag_list`. Size badges depend on the manifest
+    digest, which is fetched with HEAD.
+
+    Parameters
+    ----------
+    job : BadgeJob
+        badge to check
+    tag_list : TagListState | None, optional
+        checked tag list of the package of a tag badge, by default None (fetch it)
+
+    Returns:
+    -------
+    str | None
+        hex digest of the inputs, None if unknown without generating the badge
+
+    """
+    from . import __version__  # noqa: PLC0415
+    from .generate import GHCRBadgeGenerator  # noqa: PLC0415
+
+    generator = GHCRBadgeGenerator()
+    try:
+        if job.kind == "size":
+            source = generator.fetch_digest(job.user, job.name, tag=job.params.get("tag", "latest"))
+        elif tag_list is not None:
+            source = tag_list.digest
+        else:
+            source = _tags_digest(generator.get_tags(job.user, job.name))
+    except Exception:  # noqa: BLE001
+        return None  # generating the badge tells what is wrong
+    if source is None:
+        return None
+    # the version covers changes of rendering between releases
+    data = json.dumps([__version__, job.kind, job.params, source], sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def write_if_changed(path: Path, svg: str) -> bool:
+    """Write a badge unless the file already has the same content.
+
+    Parameters
+    ----------
+    path : Path
+        file to write
+    svg : str
+        svg string
+
+    Returns:
+    -------
+    bool
+        True if the file was written
+
+    """
+    data = svg.encode()
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def generate_bulk(
+    jobs: Iterable[BadgeJob],
+    out_dir: Path,
+    *,
+    workers: int = 8,
+    state: BatchState | None = None,
+) -> list[BadgeResult]:
+    """Generate badges concurrently and save them under a directory.
+
+    Badges of the same package share one tag list or manifest lookup. Files
+    whose content would not change are left untouched.
+
+    Parameters
+    ----------
+    jobs : Iterable[BadgeJob]
+        badges to generate
+    out_dir : Path
+        directory to save badges to
+    workers : int, optional
+        number of badges generated concurrently, by default 8
+    state : BatchState | None, optional
+        inputs from a previous run, to skip generating unchanged badges;
+        by default None (generate all)
+
+    Returns:
+    -------
+    list[BadgeResult]
+        outcome of each badge in order
+
+    """
+    jobs = list(jobs)
+    checked: dict[tuple[str, str], TagListState | None] = {}
+
+    def check(package: tuple[str, str]) -> TagListState | None:
+        previous = state.tag_lists.get("/".join(package)) if state is not None else None
+        try:
+            return check_tag_list(*package, previous)
+        except Exception:  # noqa: BLE001
+            return None  # generating the badge tells what is wrong
+
+    def run(job: BadgeJob) -> BadgeResult:
+        start = time.perf_counter()
+        path = out_dir / job.path
+        inputs = None
+        tag_list = checked.get((job.user, job.name)) if job.kind != "size" else None
+        try:
+            if state is not None:
+                inputs = badge_inputs(job, tag_list)
+                if inputs is not None and state.inputs.get(job.path.as_posix()) == inputs and path.is_file():
+                    return BadgeResult(job, time.perf_counter() - start, None, False, inputs, tag_list)  # noqa: FBT003
+            written = write_if_changed(path, generate_badge(job))
+        except Exception as err:  # noqa: BLE001
+            return BadgeResult(job, time.perf_counter() - start, err, tag_list=tag_list)
+        return BadgeResult(job, time.perf_counter() - start, None, written, inputs, tag_list)
+
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if state is not None:
+            # each tag list is checked once, before the badges of its package
+            packages = list(dict.fromkeys((job.user, job.name) for job in jobs if job.kind != "size"))
+            checked = dict(zip(packages, pool.map(check, packages), strict=True))
+        return list(pool.map(run, jobs))
+
+
+def load_state(path: Path) -> BatchState:
+    """Load upstream inputs saved by `save_state`.
+
+    Parameters
+    ----------
+    path : Path
+        state file
+
+    Returns:
+    -------
+    BatchState
+        fingerprints by badge path and tag lists by package, empty if the file is missing, unreadable or outdated
+
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return BatchState({}, {})
+    if not isinstance(data, dict) or data.get("version") != _STATE_VERSION:
+        return BatchState({}, {})
+    inputs, tag_lists = data.get("inputs"), data.get("tag_lists")
+    return BatchState(
+        {k: v for k, v in inputs.items() if isinstance(v, str)} if isinstance(inputs, dict) else {},
+        {
+            k: TagListState(v["digest"], {name: str(value) for name, value in v.get("validators", {}).items()})
+            for k, v in tag_lists.items()
+            if isinstance(v, dict) and isinstance(v.get("digest"), str) and isinstance(v.get("validators", {}), dict)
+        }
+        if isinstance(tag_lists, dict)
+        else {},
+    )
+
+
+def save_state(path: Path, state: BatchState, results: Iterable[BadgeResult]) -> None:
+    """Save upstream inputs for the next run.
+
+    Badges and packages not listed anymore are dropped; failed badges keep their previous fingerprint.
+
+    Parameters
+    ----------
+    path : Path
+        state file, replaced atomically
+    state : BatchState
+        inputs loaded before the run
+    results : Iterable[BadgeResult]
+        outcome of each badge of the run
+
+    """
+    inputs, tag_lists = {}, {}
+    for result in results:
+        key = result.job.path.as_posix()
+        if result.error is None and result.inputs is not None:
+            inputs[key] = result.inputs
+        elif result.error is not None and key in state.inputs:
+            inputs[key] = state.inputs[key]
+        package = f"{result.job.user}/{result.job.name}"
+        if result.tag_list is not None:
+            tag_lists[package] = {"digest": result.tag_list.digest, "validators": result.tag_list.validators}
+    data = {"version": _STATE_VERSION, "inputs": inputs, "tag_lists": tag_lists}
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True))
+    tmp.replace(path)
+
+
+def format_summary(results: list[BadgeResult], seconds: float) -> str:
+    """Format a summary of badges generated in bulk.
+
+    Parameters
+    ----------
+    results : list[BadgeResult]
+        outcome of each badge
+    seconds : float
+        total time
+
+    Returns:
+    -------
+    str
+        failures, one per line, then counts and timings
+
+    """
+    lines = [
+        f"failed: {r.job.user}/{r.job.name} {r.job.kind}: {type(r.error).__name__}: {r.error}"
+        for r in results
+        if r.error is not None
+    ]
+    failed = len(lines)
+    written = sum(r.written for r in results)
+    summary = (
+        f"{len(results)} badges in {seconds:.2f}s: "
+        f"{written} written, {len(results) - written - failed} unchanged, {failed} failed"
+    )
+    if results:
+        slowest = max(results, key=lambda r: r.seconds)
+        summary += f" (slowest {slowest.seconds:.2f}s: {slowest.job.user}/{slowest.job.name} {slowest.job.kind})"
+    return "\n".join([*lines, summary])
+
+
+def run_batch(args: Namespace) -> int:
+    """Generate badges listed in `--batch` and print a summary to stderr.
+
+    Parameters
+    ----------
+    args : Namespace
+        parsed arguments
+
+    Returns:
+    -------
+    int
+        exit status, 1 if any badge failed
+
+    """
+    if args.batch == "-":
+        jobs = parse_badge_list(sys.stdin, color=str(args.color))
+    else:
+        with Path(args.batch).open() as f:
+            jobs = parse_badge_list(f, color=str(args.color))
+    state_path = None if args.state is None else Path(args.state)
+    state = None if state_path is None else load_state(state_path)
+    from .ratelimit import scheduler  # noqa: PLC0415
+
+    scheduler.max_wait = float("inf")  # badges wait for their turn and for `Retry-After` rather than fail
+    start = time.perf_counter()
+    results = generate_bulk(jobs, Path(args.out_dir), workers=int(args.jobs), state=state)
+    if state_path is not None and state is not None:
+        save_state(state_path, state, results)
+    print(format_summary(results, time.perf_counter() - start), file=sys.stderr)  # noqa: T201
+    return int(any(r.error is not None for r in results))
 
 
 def main() -> None:
@@ -108,11 +616,15 @@ def main() -> None:
 
     """
     args = parse_args()
+    if args.batch is not None:
+        sys.exit(run_batch(args))
     color = str(args.color)
     user = str(args.user)
     name = str(args.name)
     if not check_connectivity():
         raise HttpConnectionNotFountError
+    from .generate import GHCRBadgeGenerator  # noqa: PLC0415
+
     g = GHCRBadgeGenerator(color=color)
     data = g.generate_tags(user, name)
     if args.out:
@@ -0,0 +1,418 @@
+"""Collect server metrics and expose them in the Prometheus text format.
+
+Metrics are recorded on request threads of waitress, so a recording must not
+wait for other threads. Each thread writes to its own shard, and only the
+scrape of `/metrics` sums the shards up. A lock is taken once per thread and
+metric, when the thread first records it.
+
+Metrics are per process: behind gunicorn, each worker serves its own.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import math
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Iterable
+
+    from typing_extensions import Self
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""`Content-Type` of the Prometheus text format."""
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Upper bounds in seconds of histogram buckets, without `+Inf`."""
+
+
+class Sample(NamedTuple):
+    """Value of a metric with its labels."""
+
+    suffix: str
+    """appended to the metric name, e.g. `_bucket` of histograms"""
+    labels: dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    """Samples of a metric, as written in one `# TYPE` block."""
+
+    name: str
+    kind: str
+    """`counter`, `gauge` or `histogram`"""
+    help: str
+    samples: list[Sample]
+
+
+class _Shards:
+    """Per-thread dicts, registered at the first write of each thread."""
+
+    def __init__(self: Self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[tuple[weakref.ref[threading.Thread], dict[tuple[str, ...], list[float]]]] = []
+        self._retired: dict[tuple[str, ...], list[float]] = {}
+
+    def get(self: Self) -> dict[tuple[str, ...], list[float]]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: dict[tuple[str, ...], list[float]] = {}
+            with self._lock:
+                self._retire()
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def merged(self: Self) -> dict[tuple[str, ...], list[float]]:
+        with self._lock:
+            self._retire()
+            total = {labels: list(values) for labels, values in self._retired.items()}
+            for _, shard in self._shards:
+                # copying is atomic under the GIL, so the owner may keep writing
+                for labels, values in shard.copy().items():
+                    _add(total.setdefault(labels, [0.0] * len(values)), list(values))
+        return total
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+    def _retire(self: Self) -> None:
+        # merge shards of finished threads, e.g. of short-lived executors, so they do not pile up
+        alive = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                alive.append((ref, shard))
+                continue
+            for labels, values in shard.items():
+                _add(self._retired.setdefault(labels, [0.0] * len(values)), values)
+        self._shards = alive
+
+
+def _add(total: list[float], values: list[float]) -> None:
+    for i, value in enumerate(values):
+        total[i] += value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self: Self, name: str, help_: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_
+        self.labelnames = labelnames
+        self._shards = _Shards()
+
+    def _values(self: Self, labels: tuple[str, ...], size: int) -> list[float]:
+        if len(labels) != len(self.labelnames):
+            msg = f"{self.name} has labels {', '.join(self.labelnames)}, got {len(labels)} values."
+            raise ValueError(msg)
+        shard = self._shards.get()
+        values = shard.get(labels)
+        if values is None:
+            values = shard[labels] = [0.0] * size
+        return values
+
+    def clear(self: Self) -> None:
+        """Reset all values to zero."""
+        self._shards.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def inc(self: Self, *labels: str, amount: float = 1) -> None:
+        """Increase the value of a label set.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        *labels : str
+            label values in the order of `labelnames`
+        amount : float, optional
+            increment, by default 1
+
+        """
+        self._values(labels, 1)[0] += amount
+
+    def collect(self: Self) -> MetricFamily:
+        """Sum values of all threads.
+
+        Returns:
+        -------
+        MetricFamily
+            one `_total` sample per label set
+
+        """
+        samples = [
+            Sample("_total", dict(zip(self.labelnames, labels, strict=True)), values[0])
+            for labels, values in sorted(self._shards.merged().items())
+        ]
+        return MetricFamily(self.name, self.kind, self.help, samples)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self: Self,
+        name: str,
+        help_: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Create a histogram.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        name : str
+            metric name
+        help_ : str
+            description of the metric
+        labelnames : tuple[str, ...], optional
+            label names, by default none
+        buckets : tuple[float, ...], optional
+            sorted upper bounds of buckets, by default `DEFAULT_BUCKETS`
+
+        Raises:
+        ------
+        ValueError
+            raise if buckets are not sorted
+
+        """
+        if list(buckets) != sorted(buckets):
+            msg = f"buckets of {name} should be sorted."
+            raise ValueError(msg)
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(b for b in buckets if b != math.inf)
+
+    def observe(self: Self, value: float, *labels: str) -> None:
+        """Record a value of a label set.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        value : float
+            observed value, e.g. seconds
+        *labels : str
+            label values in the order of `labelnames`
+
+        """
+        # per-bucket counts, then the `+Inf` bucket, then the sum
+        values = self._values(labels, len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    @contextlib.contextmanager
+    def time(self: Self, *labels: str) -> Generator[None, None, None]:
+        """Record seconds spent in the block.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        *labels : str
+            label values in the order of `labelnames`
+
+        Yields:
+        ------
+        None
+            nothing
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def collect(self: Self) -> MetricFamily:
+        """Sum values of all threads.
+
+        Returns:
+        -------
+        MetricFamily
+            cumulative `_bucket` samples, `_sum` and `_count` per label set
+
+        """
+        samples = []
+        for labels, values in sorted(self._shards.merged().items()):
+            named = dict(zip(self.labelnames, labels, strict=True))
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), values, strict=False):
+                cumulative += count
+                samples.append(Sample("_bucket", {**named, "le": _format(bound)}, cumulative))
+            samples.append(Sample("_sum", named, values[-1]))
+            samples.append(Sample("_count", named, cumulative))
+        return MetricFamily(self.name, self.kind, self.help, samples)
+
+
+class Registry:
+    """Metrics and collectors rendered together."""
+
+    def __init__(self: Self) -> None:
+        """Create an empty registry."""
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self: Self, name: str, help_: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        """Create and register a counter.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        name : str
+            metric name without `_total`
+        help_ : str
+            description of the metric
+        labelnames : tuple[str, ...], optional
+            label names, by default none
+
+        Returns:
+        -------
+        Counter
+            registered counter
+
+        """
+        counter = Counter(name, help_, labelnames)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(
+        self: Self,
+        name: str,
+        help_: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        name : str
+            metric name
+        help_ : str
+            description of the metric
+        labelnames : tuple[str, ...], optional
+            label names, by default none
+        buckets : tuple[float, ...], optional
+            sorted upper bounds of buckets, by default `DEFAULT_BUCKETS`
+
+        Returns:
+        -------
+        Histogram
+            registered histogram
+
+        """
+        histogram = Histogram(name, help_, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def add_collector(self: Self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Register a function reading metrics at scrape time, e.g. from cache statistics.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        collector : Callable[[], Iterable[MetricFamily]]
+            function returning metric families
+
+        """
+        self._collectors.append(collector)
+
+    def collect(self: Self) -> list[MetricFamily]:
+        """Read all metrics.
+
+        Returns:
+        -------
+        list[MetricFamily]
+            registered metrics, then families of collectors in registration order
+
+        """
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def render(self: Self) -> str:
+        """Render all metrics in the Prometheus text format 0.0.4.
+
+        Returns:
+        -------
+        str
+            exposition served at `/metrics`
+
+        """
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape(family.help, quote=False)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                selector = f"{{{label_text}}}" if labels else ""
+                lines.append(f"{family.name}{suffix}{selector} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str, *, quote: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+"""Metrics served at `/metrics`."""
+
+request_seconds = registry.histogram(
+    "ghcr_badge_request_seconds",
+    "Seconds to serve a request.",
+    ("route", "status"),
+)
+upstream_seconds = registry.histogram(
+    "ghcr_badge_upstream_seconds",
+    "Seconds to get a response from the registry.",
+    ("endpoint", "status"),
+)
+upstream_responses = registry.counter(
+    "ghcr_badge_upstream_responses",
+    "Responses from the registry, with status `error` if none was received.",
+    ("endpoint", "status"),
+)
+upstream_scheduled = registry.counter(
+    "ghcr_badge_upstream_scheduled",
+    "Upstream requests by priority and whether they were sent, delayed, dropped or rejected.",
+    ("priority", "result"),
+)
+render_seconds = registry.histogram(
+    "ghcr_badge_render_seconds",
+    "Seconds to render a badge.",
+    ("kind",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
@@ -0,0 +1,266 @@
+"""Refresh badges of the most requested packages before they expire.
+
+Requests are counted per `(owner, package, endpoint)` with exponentially
+decaying scores. A background thread periodically takes the top-K of them and,
+for those whose data expires within `lead` seconds, reloads tag lists through
+`GHCRBadgeGenerator.load_tags` and renders badges again through the loaders the
+routes gave, so that popular badges are served from cache after expiry too.
+Each round stops once it has sent `budget` upstream requests, counted as the
+scheduler sends them, e.g. a multi-arch size badge costs one per platform.
+They are sent at low priority, so that they are dropped rather than delay
+requests when upstream throttles.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from .generate import GHCRBadgeGenerator, tag_cache
+from .ratelimit import background, count_requests
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+    from .cache import TTLCache
+
+BadgeKey = tuple[str, ...]
+"""Key of `badge_cache`: endpoint, package owner, package name and normalized parameters."""
+BadgeLoader = Callable[[], tuple[bytes, str]]
+"""Function rendering a badge as its encoded svg and ETag."""
+_TAG_ENDPOINTS = frozenset({"tags", "latest_tag"})
+
+
+class _Counter:
+    __slots__ = ("loaders", "score", "updated_at")
+
+    def __init__(self: Self, now: float) -> None:
+        self.score = 0.0
+        self.updated_at = now
+        self.loaders: OrderedDict[BadgeKey, BadgeLoader] = OrderedDict()
+
+
+class PrefetchScheduler:
+    """Background refresher of the hottest badges in a badge cache."""
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        badge_cache: TTLCache[BadgeKey, tuple[bytes, str]],
+        *,
+        top_k: int = 0,
+        lead: float = 30,
+        interval: float = 5,
+        budget: int = 8,
+        half_life: float = 600,
+        maxsize: int = 4096,
+        variants: int = 8,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Create a scheduler.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        badge_cache : TTLCache[BadgeKey, tuple[bytes, str]]
+            cache of rendered badges to keep warm
+        top_k : int, optional
+            number of hottest `(owner, package, endpoint)` to refresh, by default 0 (disabled)
+        lead : float, optional
+            second before expiry to refresh an entry, by default 30
+        interval : float, optional
+            second between rounds, by default 5
+        budget : int, optional
+            upstream requests per round, by default 8
+        half_life : float, optional
+            second for a request to count half, by default 600
+        maxsize : int, optional
+            number of `(owner, package, endpoint)` to track, by default 4096
+        variants : int, optional
+            badges with different parameters to keep per `(owner, package, endpoint)`, by default 8
+        clock : Callable[[], float], optional
+            wall clock, by default `time.time`
+
+        """
+        self.badge_cache = badge_cache
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self.variants = variants
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, str, str], _Counter] = {}
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stopped = threading.Event()
+        self.configure(top_k=top_k, lead=lead, interval=interval, budget=budget)
+
+    def configure(self: Self, *, top_k: int, lead: float, interval: float, budget: int) -> None:
+        """Change the bounds of the scheduler in place.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        top_k : int
+            number of hottest `(owner, package, endpoint)` to refresh, 0 to disable
+        lead : float
+            second before expiry to refresh an entry
+        interval : float
+            second between rounds
+        budget : int
+            upstream requests per round
+
+        Raises:
+        ------
+        ValueError
+            raise if a bound is negative or interval is not positive
+
+        """
+        if top_k < 0 or lead < 0 or interval <= 0 or budget < 0:
+            msg = f"bounds should be positive: {top_k=}, {lead=}, {interval=}, {budget=}"
+            raise ValueError(msg)
+        self.top_k = top_k
+        self.lead = lead
+        self.interval = interval
+        self.budget = budget
+
+    def record(self: Self, key: BadgeKey, loader: BadgeLoader) -> None:
+        """Count a request of a badge, starting the background thread in this process if needed.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : BadgeKey
+            key of the badge in the badge cache
+        loader : BadgeLoader
+            function to render the badge again
+
+        """
+        if self.top_k == 0:
+            return
+        now = self._clock()
+        endpoint, package_owner, package_name = key[:3]
+        with self._lock:
+            counter = self._counters.get((package_owner, package_name, endpoint))
+            if counter is None:
+                counter = self._counters[package_owner, package_name, endpoint] = _Counter(now)
+            counter.score = self._decayed(counter, now) + 1
+            counter.updated_at = now
+            counter.loaders[key] = loader
+            counter.loaders.move_to_end(key)
+            while len(counter.loaders) > self.variants:
+                counter.loaders.popitem(last=False)
+        self.start()
+
+    def hot(self: Self) -> list[tuple[str, str, str]]:
+        """Get the hottest `(owner, package, endpoint)`, dropping the coldest beyond `maxsize`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+
+        Returns:
+        -------
+        list[tuple[str, str, str]]
+            up to `top_k` package owner, package name and endpoint, hottest first
+
+        """
+        now = self._clock()
+        with self._lock:
+            scores = {name: self._decayed(counter, now) for name, counter in self._counters.items()}
+            for name in heapq.nsmallest(len(scores) - self.maxsize, scores, key=scores.__getitem__):
+                del self._counters[name]
+        return heapq.nlargest(self.top_k, scores, key=scores.__getitem__)
+
+    def run_once(self: Self) -> int:
+        """Refresh the hottest entries which expire soon, until `budget` upstream requests are sent.
+
+        The last refresh of a round may exceed the budget by the requests it
+        needs. Failed refreshes are skipped; the entry is then loaded on
+        request as usual.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+
+        Returns:
+        -------
+        int
+            number of upstream requests sent
+
+        """
+        refreshed: set[tuple[str, str]] = set()
+        with count_requests() as requests:
+            for package_owner, package_name, endpoint in self.hot():
+                if endpoint in _TAG_ENDPOINTS and (package_owner, package_name) not in refreshed:
+                    refreshed.add((package_owner, package_name))
+                    if self._expires_soon(tag_cache.expires_in((package_owner, package_name))):
+                        if requests.sent >= self.budget:
+                            break
+                        self._refresh_tags(package_owner, package_name)
+                with self._lock:
+                    counter = self._counters.get((package_owner, package_name, endpoint))
+                    loaders = [] if counter is None else list(counter.loaders.items())
+                for key, loader in loaders:
+                    if not self._expires_soon(self.badge_cache.expires_in(key)):
+                        continue
+                    # tag badges render from tag_cache, the others fetch upstream
+                    if endpoint not in _TAG_ENDPOINTS and requests.sent >= self.budget:
+                        return requests.sent
+                    self._refresh_badge(key, loader)
+        return requests.sent
+
+    def start(self: Self) -> None:
+        """Start the background thread unless it runs in this process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # threads do not survive fork, e.g. of gunicorn workers from a preloaded app
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="ghcr-badge-prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self: Self) -> None:
+        """Stop the background thread and forget counted requests."""
+        with self._lock:
+            thread, self._thread, self._pid = self._thread, None, None
+            self._counters.clear()
+        self._stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self: Self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def _decayed(self: Self, counter: _Counter, now: float) -> float:
+        return counter.score * 0.5 ** ((now - counter.updated_at) / self.half_life)
+
+    def _expires_soon(self: Self, expires_in: float | None) -> bool:
+        # not cached entries were evicted, or loaded by another worker sharing a backend
+        return expires_in is not None and expires_in < self.lead
+
+    def _refresh_tags(self: Self, package_owner: str, package_name: str) -> None:
+        try:
+            with background():
+                tag_list = GHCRBadgeGenerator().load_tags(package_owner, package_name)
+        except Exception:  # noqa: BLE001
+            return
+        tag_cache.set((package_owner, package_name), tag_list)
+
+    def _refresh_badge(self: Self, key: BadgeKey, loader: BadgeLoader) -> None:
+        try:
+            with background():
+                badge = loader()
+        except Exception:  # noqa: BLE001
+            return
+        self.badge_cache.set(key, badge)
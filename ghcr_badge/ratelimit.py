@@ -0,0 +1,345 @@
+"""Pace upstream requests so that ghcr.io does not throttle the process.
+
+Every request takes a token from a bucket refilled at `rate` per second up to
+`burst`. A request of a caller waits up to `max_wait` seconds for a token,
+while a background refresh (stale-while-revalidate reloads and prefetching,
+run inside `background()`) is only sent if the bucket holds more than
+`reserve` of its tokens, and is dropped otherwise; the cached value stays in
+use until a later refresh succeeds. `count_requests()` counts the requests sent
+in a block, e.g. against the budget of a prefetch round.
+
+Responses `429 Too Many Requests` and `5xx` raise `UpstreamThrottledError`.
+`Retry-After` of such a response, or `backoff` seconds for a `429` without it,
+pauses all requests of the process; requests that cannot wait that long raise
+`UpstreamThrottledError` without being sent.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from typing import TYPE_CHECKING, TypedDict
+
+from .metrics import upstream_scheduled
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Mapping
+
+    from typing_extensions import Self
+
+
+class UpstreamThrottledError(Exception):
+    """Exception for requests refused by upstream, or not sent because upstream throttles."""
+
+
+class SchedulerStats(TypedDict):
+    """Statistics of scheduled upstream requests."""
+
+    sent: int
+    delayed: int
+    """requests which waited for a token or for `Retry-After` before being sent"""
+    dropped: int
+    """background requests not sent"""
+    rejected: int
+    """requests of callers not sent, as they would wait longer than `max_wait`"""
+    throttled: int
+    """responses `429` or `5xx`"""
+    paused_for: float
+    """seconds until requests are sent again after `Retry-After`"""
+
+
+class RequestCounter:
+    """Number of upstream requests sent within `count_requests()`."""
+
+    __slots__ = ("sent",)
+
+    def __init__(self: Self) -> None:
+        """Create a counter of no requests."""
+        self.sent = 0
+
+
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar("ghcr_badge_background", default=False)
+_counter: contextvars.ContextVar[RequestCounter | None] = contextvars.ContextVar("ghcr_badge_counter", default=None)
+
+
+@contextlib.contextmanager
+def background() -> Generator[None, None, None]:
+    """Send upstream requests of the block at low priority, e.g. refreshes nobody waits for.
+
+    Yields:
+    ------
+    None
+        nothing
+
+    """
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+@contextlib.contextmanager
+def count_requests() -> Generator[RequestCounter, None, None]:
+    """Count upstream requests sent in the block, also by threads and tasks given a copy of its context.
+
+    Yields:
+    ------
+    RequestCounter
+        counter of requests sent so far
+
+    """
+    counter = RequestCounter()
+    token = _counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _counter.reset(token)
+
+
+def retry_after(headers: Mapping[str, str], now: float) -> float | None:
+    """Parse `Retry-After` of a response.
+
+    Parameters
+    ----------
+    headers : Mapping[str, str]
+        response headers
+    now : float
+        current UNIX time, to convert an HTTP date to seconds
+
+    Returns:
+    -------
+    float | None
+        seconds to wait, None if the header is missing or invalid
+
+    """
+    value = headers.get("Retry-After", "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - now, 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamScheduler:
+    """Thread-safe token bucket of upstream requests, paused by `Retry-After`."""
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        *,
+        rate: float = 20,
+        burst: int = 40,
+        max_wait: float = 2,
+        reserve: float = 0.5,
+        backoff: float = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a scheduler with a full bucket.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        rate : float, optional
+            tokens added per second, 0 to send without pacing, by default 20
+        burst : int, optional
+            tokens the bucket holds, by default 40
+        max_wait : float, optional
+            seconds a request of a caller may wait to be sent, by default 2
+        reserve : float, optional
+            fraction of the bucket background requests leave to callers, by default 0.5
+        backoff : float, optional
+            seconds to pause after `429` without `Retry-After`, by default 5
+        clock : Callable[[], float], optional
+            monotonic clock, by default `time.monotonic`
+
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._sent = self._delayed = self._dropped = self._rejected = self._throttled = 0
+        self.configure(rate=rate, burst=burst, max_wait=max_wait, reserve=reserve, backoff=backoff)
+
+    def configure(
+        self: Self,
+        *,
+        rate: float,
+        burst: int,
+        max_wait: float,
+        reserve: float = 0.5,
+        backoff: float = 5,
+    ) -> None:
+        """Change the limits in place and fill the bucket.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        rate : float
+            tokens added per second, 0 to send without pacing
+        burst : int
+            tokens the bucket holds
+        max_wait : float
+            seconds a request of a caller may wait to be sent
+        reserve : float, optional
+            fraction of the bucket background requests leave to callers, by default 0.5
+        backoff : float, optional
+            seconds to pause after `429` without `Retry-After`, by default 5
+
+        Raises:
+        ------
+        ValueError
+            raise if a limit is negative, burst is less than 1 or reserve is not a fraction
+
+        """
+        if rate < 0 or burst < 1 or max_wait < 0 or backoff < 0 or not 0 <= reserve < 1:
+            msg = f"invalid limits: {rate=}, {burst=}, {max_wait=}, {reserve=}, {backoff=}"
+            raise ValueError(msg)
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self.max_wait = max_wait
+            self.reserve = reserve
+            self.backoff = backoff
+            self._tokens = float(burst)
+            self._updated_at = self._clock()
+
+    def schedule(self: Self) -> float:
+        """Take a token for a request, at the priority of the current context.
+
+        Returns:
+        -------
+        float
+            seconds to wait before sending the request
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if a background request cannot be sent now, or a request of a caller
+            would wait longer than `max_wait`
+
+        """
+        low = _background.get()
+        counter = _counter.get()
+        priority = "background" if low else "caller"
+        with self._lock:
+            now = self._clock()
+            paused = max(self._paused_until - now, 0.0)
+            if self.rate > 0:
+                self._tokens = min(self._tokens + (now - self._updated_at) * self.rate, self.burst)
+                self._updated_at = now
+            tokens = self._tokens if self.rate > 0 else float(self.burst)
+            if low and (paused > 0 or tokens - 1 < self.burst * self.reserve):
+                self._dropped += 1
+                result = "dropped"
+            else:
+                delay = max(paused, (1 - tokens) / self.rate if tokens < 1 else 0.0)
+                if delay > self.max_wait:
+                    self._rejected += 1
+                    result = "rejected"
+                else:
+                    if self.rate > 0:
+                        self._tokens -= 1  # may go below 0, reserving a token not added yet
+                    self._sent += 1
+                    self._delayed += delay > 0
+                    if counter is not None:
+                        counter.sent += 1
+                    result = "delayed" if delay > 0 else "sent"
+        upstream_scheduled.inc(priority, result)
+        if result in ("dropped", "rejected"):
+            msg = f"upstream requests are throttled, {priority} request {result}."
+            raise UpstreamThrottledError(msg)
+        return delay
+
+    def acquire(self: Self) -> None:
+        """Wait until a request may be sent, see `schedule`."""
+        delay = self.schedule()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self: Self) -> None:
+        """Wait on the event loop until a request may be sent, see `schedule`."""
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        delay = self.schedule()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def check_response(self: Self, status: int, headers: Mapping[str, str]) -> None:
+        """Pause requests if upstream throttles, and refuse the response.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        status : int
+            response status code
+        headers : Mapping[str, str]
+            response headers
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if the response is `429` or `5xx`
+
+        """
+        if status != HTTPStatus.TOO_MANY_REQUESTS and status < HTTPStatus.INTERNAL_SERVER_ERROR:
+            return
+        seconds = retry_after(headers, time.time())
+        if seconds is None and status == HTTPStatus.TOO_MANY_REQUESTS:
+            seconds = self.backoff
+        with self._lock:
+            self._throttled += 1
+            if seconds is not None:
+                self._paused_until = max(self._paused_until, self._clock() + seconds)
+        msg = f"upstream responded {status}" + (f", retry after {seconds:g} seconds." if seconds is not None else ".")
+        raise UpstreamThrottledError(msg)
+
+    def stats(self: Self) -> SchedulerStats:
+        """Get statistics of scheduled requests.
+
+        Returns:
+        -------
+        SchedulerStats
+            requests by outcome, and seconds until requests are sent again
+
+        """
+        with self._lock:
+            return {
+                "sent": self._sent,
+                "delayed": self._delayed,
+                "dropped": self._dropped,
+                "rejected": self._rejected,
+                "throttled": self._throttled,
+                "paused_for": max(self._paused_until - self._clock(), 0.0),
+            }
+
+    def reset(self: Self) -> None:
+        """Fill the bucket, resume requests and drop statistics."""
+        with self._lock:
+            self._tokens = float(self.burst)
+            self._updated_at = self._clock()
+            self._paused_until = 0.0
+            self._sent = self._delayed = self._dropped = self._rejected = self._throttled = 0
+
+
+scheduler = UpstreamScheduler()
+"""Scheduler of requests of the process-wide upstream clients."""
+
+
+def _reset_after_fork() -> None:
+    # each worker has its own bucket, and the lock may have been held by a thread which is gone
+    scheduler._lock = threading.Lock()  # noqa: SLF001
+    scheduler.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
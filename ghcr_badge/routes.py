@@ -0,0 +1,480 @@
+"""Route data, badge response helpers and settings shared by WSGI and ASGI servers."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, NamedTuple
+from urllib.parse import quote, urlencode
+
+from . import __version__
+from .backends import Codec, open_backend
+from .cache import TTLCache
+from .generate import BaseBadgeGenerator, manifest_store, revalidations, single_flight, tag_cache, tag_digests
+from .metrics import MetricFamily, Sample, registry
+from .prefetch import PrefetchScheduler
+from .ratelimit import UpstreamThrottledError, scheduler
+from .tracing import trace_log
+from .upstream import UpstreamClient, clients, configure_client
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping, Sequence
+
+    from .cache import CacheStats
+
+REPO_LINK = "https://github.com/eggplants/ghcr-badge"
+BADGE_KINDS = ("tags", "latest_tag", "size")
+
+
+def _dump_badge(badge: tuple[bytes, str]) -> bytes:
+    svg, etag = badge
+    return etag.encode() + b"\n" + svg
+
+
+def _load_badge(data: bytes) -> tuple[bytes, str]:
+    etag, _, svg = data.partition(b"\n")
+    return svg, etag.decode()
+
+
+badge_cache: TTLCache[tuple[str, ...], tuple[bytes, str]] = TTLCache(
+    maxsize=4096,
+    ttl=300,
+    stale_ttl=0,
+    namespace="badges:v1",
+    codec=Codec(_dump_badge, _load_badge),
+    fallback=(UpstreamThrottledError,),
+)
+"""Rendered badges and their ETags, keyed by endpoint, package and normalized parameters.
+
+An expired badge is served while upstream throttles, rather than an error.
+"""
+
+prefetcher = PrefetchScheduler(badge_cache)
+"""Refresher of the most requested badges, disabled until configured."""
+
+
+def cache_metrics() -> list[MetricFamily]:
+    """Read lookups and sizes of the caches for `/metrics`.
+
+    Returns:
+    -------
+    list[MetricFamily]
+        lookups by result, their ratios and number of entries, per cache
+
+    """
+    caches = {"tags": tag_cache, "tag_digests": tag_digests, "manifests": manifest_store, "badges": badge_cache}
+    stats: dict[str, CacheStats] = {name: cache.stats() for name, cache in caches.items()}
+    lookups, ratios, entries = [], [], []
+    for name, stat in stats.items():
+        total = stat["hits"] + stat["misses"] + stat["stale"]
+        for result, count in (("hit", stat["hits"]), ("miss", stat["misses"]), ("stale", stat["stale"])):
+            lookups.append(Sample("_total", {"cache": name, "result": result}, count))
+            ratios.append(Sample("", {"cache": name, "result": result}, count / total if total else 0))
+        entries.append(Sample("", {"cache": name}, stat["size"]))
+    return [
+        MetricFamily("ghcr_badge_cache_lookups", "counter", "Cache lookups by result.", lookups),
+        MetricFamily("ghcr_badge_cache_lookup_ratio", "gauge", "Fraction of cache lookups by result.", ratios),
+        MetricFamily("ghcr_badge_cache_entries", "gauge", "Entries in the in-process cache.", entries),
+    ]
+
+
+def upstream_metrics() -> list[MetricFamily]:
+    """Read savings of upstream requests for `/metrics`.
+
+    Returns:
+    -------
+    list[MetricFamily]
+        conditional requests and their `304`s, connection reuse, shared
+        in-flight fetches and outcomes of manifest revalidations
+
+    """
+    conditional, not_modified, connections, reused = [], [], [], []
+    for client in clients():
+        labels = {"client": "sync" if isinstance(client, UpstreamClient) else "async"}
+        stat = client.validators.stats()
+        conditional.append(Sample("_total", labels, stat["conditional"]))
+        not_modified.append(Sample("_total", labels, stat["not_modified"]))
+        if isinstance(client, UpstreamClient):
+            pool = client.stats()
+            connections.append(Sample("_total", labels, pool["connections"]))
+            reused.append(Sample("_total", labels, pool["reused"]))
+    flights = [("sync", single_flight.stats())]
+    # the async generator is only loaded by the ASGI server, and loads asyncio
+    if (async_generate := sys.modules.get("ghcr_badge.async_generate")) is not None:
+        flights.append(("async", async_generate.async_single_flight.stats()))
+    calls = [Sample("_total", {"flight": name}, stat["calls"]) for name, stat in flights]
+    shared = [Sample("_total", {"flight": name}, stat["shared"]) for name, stat in flights]
+    outcomes = [Sample("_total", {"outcome": name}, count) for name, count in revalidations.stats().items()]
+    return [
+        MetricFamily(
+            "ghcr_badge_upstream_conditional_requests",
+            "counter",
+            "Upstream requests sent with If-None-Match or If-Modified-Since.",
+            conditional,
+        ),
+        MetricFamily(
+            "ghcr_badge_upstream_not_modified",
+            "counter",
+            "Conditional upstream requests answered 304 Not Modified, i.e. without body.",
+            not_modified,
+        ),
+        MetricFamily("ghcr_badge_upstream_connections", "counter", "Upstream connections opened.", connections),
+        MetricFamily(
+            "ghcr_badge_upstream_reused_requests",
+            "counter",
+            "Upstream requests sent over an already opened connection.",
+            reused,
+        ),
+        MetricFamily("ghcr_badge_single_flight_calls", "counter", "Calls of upstream fetches.", calls),
+        MetricFamily(
+            "ghcr_badge_single_flight_shared",
+            "counter",
+            "Calls of upstream fetches which waited on an identical in-flight one.",
+            shared,
+        ),
+        MetricFamily(
+            "ghcr_badge_manifest_revalidations",
+            "counter",
+            "HEAD requests checking manifests of mutable tags, by outcome.",
+            outcomes,
+        ),
+    ]
+
+
+registry.add_collector(cache_metrics)
+registry.add_collector(upstream_metrics)
+
+
+def index_data() -> dict[str, Any]:
+    """Get data served at `/index.json`.
+
+    Returns:
+    -------
+    dict[str, Any]
+        available paths, examples, repository and version
+
+    """
+    return {
+        "available_paths": [
+            "/",
+            "/<package_owner>/<package_name>/tags?color=...&ignore=...&n=...&label=...&trim=...&sort=...",
+            "/<package_owner>/<package_name>/latest_tag?color=...&ignore=...&label=...&trim=...&sort=...",
+            "/<package_owner>/<package_name>/size?tag=...&platform=...&color=...&label=...&trim=...",
+            "POST /batch",
+            "/metrics",
+        ],
+        "example_paths": [
+            "/",
+            "/eggplants/ghcr-badge/tags",
+            "/eggplants/ghcr-badge/latest_tag",
+            "/eggplants/ghcr-badge/size",
+            "/frysztak/orpington-news/size",
+            "/tuananh/aws-cli/size",
+            "/plantuml/docker%2Fjekyll/tags",
+        ],
+        "repo": REPO_LINK,
+        "version": __version__,
+    }
+
+
+def encode_svg(svg: str) -> tuple[bytes, str]:
+    """Encode a svg and compute its strong ETag.
+
+    Parameters
+    ----------
+    svg : str
+        svg source string
+
+    Returns:
+    -------
+    tuple[bytes, str]
+        encoded svg and its content hash
+
+    """
+    data = svg.encode()
+    return data, hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def svg_cache_headers() -> dict[str, str]:
+    """Get caching headers of a badge response.
+
+    Browsers, CDNs and camo may keep a badge, but revalidate it with its
+    `ETag` on every use, so that an unchanged badge is `304 Not Modified`.
+
+    Returns:
+    -------
+    dict[str, str]
+        `Cache-Control`, `Pragma` and `Expires` headers
+
+    """
+    return {
+        "Cache-Control": "no-cache",
+        "Pragma": "no-cache",  # for HTTP 1.0
+        "Expires": datetime.now(tz=timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+    }
+
+
+class BadgeRequest(NamedTuple):
+    """Badge with normalized parameters, built by `badge_request`."""
+
+    key: tuple[str, ...]
+    """key in `badge_cache`: kind, package owner, package name and parameters"""
+    options: dict[str, str]
+    """keyword arguments of the generator"""
+    params: dict[str, str]
+    """keyword arguments of its `generate_<kind>` method, `n` not converted yet"""
+
+    def render(self: BadgeRequest, generator_class: Callable[..., Any]) -> Any:  # noqa: ANN401
+        """Generate the badge.
+
+        Parameters
+        ----------
+        self : BadgeRequest
+            class instance
+        generator_class : Callable[..., Any]
+            `GHCRBadgeGenerator` or `AsyncGHCRBadgeGenerator`
+
+        Returns:
+        -------
+        Any
+            svg, or a coroutine of it for an async generator
+
+        """
+        generator = generator_class(**self.options)
+        params: dict[str, Any] = dict(self.params)
+        if "n" in params:
+            params["n"] = int(params["n"])
+        kind, package_owner, package_name = self.key[:3]
+        return getattr(generator, f"generate_{kind}")(package_owner, package_name, **params)
+
+
+def badge_request(kind: str, package_owner: str, package_name: str, query: Mapping[str, str]) -> BadgeRequest:
+    """Normalize parameters of a badge, filling defaults.
+
+    Parameters
+    ----------
+    kind : str
+        badge kind, one of `BADGE_KINDS`
+    package_owner : str
+        package owner name, e.g. 'eggplants'
+    package_name : str
+        package name, e.g. 'asciiquarium-docker'
+    query : Mapping[str, str]
+        query parameters
+
+    Returns:
+    -------
+    BadgeRequest
+        cache key and arguments to render the badge
+
+    """
+    color = query.get("color", "#44cc11")
+    trim = query.get("trim", "")
+    if kind == "size":
+        tag = query.get("tag", "latest")
+        label = query.get("label", "image size")
+        platform = query.get("platform", "")
+        return BadgeRequest(
+            ("size", package_owner, package_name, tag, color, label, trim, platform),
+            {"color": color, "trim_type": trim},
+            {"tag": tag, "label": label, "platform": platform},
+        )
+    ignore_tag = query.get("ignore", "latest")
+    sort = query.get("sort", "lexical")
+    options = {"color": color, "ignore_tag": ignore_tag, "trim_type": trim, "sort": sort}
+    if kind == "tags":
+        label = query.get("label", "image tags")
+        tag_num = query.get("n", "3")
+        return BadgeRequest(
+            ("tags", package_owner, package_name, color, ignore_tag, label, tag_num, trim, sort),
+            options,
+            {"n": tag_num, "label": label},
+        )
+    label = query.get("label", "version")
+    return BadgeRequest(
+        ("latest_tag", package_owner, package_name, color, ignore_tag, label, trim, sort),
+        options,
+        {"label": label},
+    )
+
+
+class BatchLimits:
+    """Bounds of `/batch` requests."""
+
+    max_items = 500
+    """Number of badges in one request."""
+    workers = 16
+    """Number of badges loaded concurrently per request."""
+
+
+class BatchItem(NamedTuple):
+    """Badge requested in a `/batch` request."""
+
+    kind: str
+    package_owner: str
+    package_name: str
+    params: dict[str, str]
+
+    @property
+    def path(self: BatchItem) -> str:
+        """Get the path serving the same badge."""
+        query = f"?{urlencode(self.params)}" if self.params else ""
+        return f"/{quote(self.package_owner)}/{quote(self.package_name)}/{self.kind}{query}"
+
+
+def parse_batch(body: Any) -> list[BatchItem]:  # noqa: ANN401
+    """Validate the JSON body of a `/batch` request.
+
+    Parameters
+    ----------
+    body : Any
+        decoded JSON, a list of `{"owner", "package", "kind", "params"}` objects
+
+    Returns:
+    -------
+    list[BatchItem]
+        requested badges in order
+
+    Raises:
+    ------
+    ValueError
+        raise if the body is malformed or has more than `BatchLimits.max_items` items
+
+    """
+    if not isinstance(body, list):
+        msg = "body should be a JSON list of badges."
+        raise ValueError(msg)  # noqa: TRY004
+    if len(body) > BatchLimits.max_items:
+        msg = f"{len(body)} badges requested, at most {BatchLimits.max_items} allowed."
+        raise ValueError(msg)
+    items = []
+    for i, item in enumerate(body):
+        if not isinstance(item, dict):
+            msg = f"badge {i} should be an object."
+            raise ValueError(msg)  # noqa: TRY004
+        owner, package, kind, params = item.get("owner"), item.get("package"), item.get("kind"), item.get("params", {})
+        if not isinstance(owner, str) or not owner or not isinstance(package, str) or not package:
+            msg = f"badge {i} should have owner and package."
+            raise ValueError(msg)
+        if kind not in BADGE_KINDS:
+            msg = f"kind of badge {i} should be one of {', '.join(BADGE_KINDS)}."
+            raise ValueError(msg)
+        if not isinstance(params, dict) or not all(isinstance(v, (str, int)) for v in params.values()):
+            msg = f"params of badge {i} should be an object of strings."
+            raise ValueError(msg)
+        items.append(BatchItem(kind, owner, package, {str(k): str(v) for k, v in params.items()}))
+    return items
+
+
+def batch_data(items: Sequence[BatchItem], results: Sequence[tuple[bytes, str] | Exception]) -> dict[str, Any]:
+    """Get the JSON body of a `/batch` response.
+
+    Parameters
+    ----------
+    items : Sequence[BatchItem]
+        requested badges
+    results : Sequence[tuple[bytes, str] | Exception]
+        encoded svg and ETag, or the error, of each badge
+
+    Returns:
+    -------
+    dict[str, Any]
+        badges in the requested order, each with `svg` and `etag` or `exception` and `message`
+
+    """
+    badges = []
+    for item, result in zip(items, results, strict=True):
+        badge: dict[str, str] = {"owner": item.package_owner, "package": item.package_name, "kind": item.kind}
+        if isinstance(result, Exception):
+            badge.update(exception=type(result).__name__, message=str(result))
+        else:
+            badge.update(svg=result[0].decode(), etag=result[1])
+        badges.append(badge)
+    return {"badges": badges}
+
+
+def batch_multipart(items: Sequence[BatchItem], results: Sequence[tuple[bytes, str] | Exception]) -> tuple[bytes, str]:
+    """Encode a `/batch` response as `multipart/mixed`.
+
+    Each part has `Content-Location` of the path serving the same badge. A
+    failed badge is a JSON part with `exception` and `message`.
+
+    Parameters
+    ----------
+    items : Sequence[BatchItem]
+        requested badges
+    results : Sequence[tuple[bytes, str] | Exception]
+        encoded svg and ETag, or the error, of each badge
+
+    Returns:
+    -------
+    tuple[bytes, str]
+        body and its `Content-Type`
+
+    """
+    parts = []
+    for item, result in zip(items, results, strict=True):
+        if isinstance(result, Exception):
+            content_type, extra = "application/json", ""
+            body = json.dumps({"exception": type(result).__name__, "message": str(result)}).encode()
+        else:
+            (body, etag), content_type = result, "image/svg+xml"
+            extra = f'ETag: "{etag}"\r\n'
+        head = f"Content-Type: {content_type}\r\nContent-Location: {item.path}\r\n{extra}\r\n"
+        parts.append(head.encode() + body)
+    # a hash of all parts practically never occurs in any of them
+    boundary = hashlib.blake2b(b"".join(parts), digest_size=16).hexdigest()
+    delimiter = f"--{boundary}\r\n".encode()
+    body = b"".join(delimiter + part + b"\r\n" for part in parts) + f"--{boundary}--\r\n".encode()
+    return body, f"multipart/mixed; boundary={boundary}"
+
+
+def configure_from_environ(environ: Mapping[str, str]) -> None:
+    """Configure upstream client and its rate limit, caches, their backend, prefetching and tracing from environment.
+
+    Parameters
+    ----------
+    environ : Mapping[str, str]
+        environment variables, e.g. `os.environ`
+
+    """
+    configure_client(pool_maxsize=int(environ.get("UPSTREAM_POOL_SIZE", "10")))
+    scheduler.configure(
+        rate=float(environ.get("UPSTREAM_RATE", "20")),
+        burst=int(environ.get("UPSTREAM_BURST", "40")),
+        max_wait=float(environ.get("UPSTREAM_MAX_WAIT", "2")),
+    )
+    tag_cache.configure(
+        maxsize=int(environ.get("TAG_CACHE_SIZE", "1024")),
+        ttl=float(environ.get("TAG_CACHE_TTL", "300")),
+        stale_ttl=float(environ.get("TAG_CACHE_STALE_TTL", "86400")),
+    )
+    badge_cache.configure(
+        maxsize=int(environ.get("BADGE_CACHE_SIZE", "4096")),
+        ttl=float(environ.get("BADGE_CACHE_TTL", "300")),
+        stale_ttl=0,
+    )
+    BaseBadgeGenerator.registry_url = environ.get("REGISTRY_URL", "https://ghcr.io").rstrip("/")
+    BaseBadgeGenerator.max_tag_pages = int(environ.get("TAG_MAX_PAGES", "1000"))
+    BaseBadgeGenerator.tag_resync_interval = float(environ.get("TAG_RESYNC_INTERVAL", "3600"))
+    manifest_store.configure(
+        maxsize=int(environ.get("MANIFEST_STORE_SIZE", "4096")),
+        maxweight=int(environ.get("MANIFEST_STORE_BYTES", str(64 * 1024 * 1024))),
+    )
+    BatchLimits.max_items = int(environ.get("BATCH_MAX_ITEMS", "500"))
+    BatchLimits.workers = int(environ.get("BATCH_WORKERS", "16"))
+    backend = open_backend(environ)
+    for cache in (tag_cache, tag_digests, manifest_store, badge_cache):
+        cache.use_backend(backend)
+    trace_log.configure(
+        path=environ.get("TRACE_LOG", ""),
+        threshold=float(environ.get("TRACE_LOG_THRESHOLD", "0")),
+    )
+    prefetcher.configure(
+        top_k=int(environ.get("PREFETCH_TOP_K", "32")),
+        lead=float(environ.get("PREFETCH_LEAD", "30")),
+        interval=float(environ.get("PREFETCH_INTERVAL", "5")),
+        budget=int(environ.get("PREFETCH_BUDGET", "8")),
+    )
@@ -2,35 +2,97 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+import contextlib
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
 from os import environ
 from typing import TYPE_CHECKING
 
-from flask import Flask, jsonify, make_response, render_template, request
+from flask import Flask, g, jsonify, make_response, render_template, request
 from flask.wrappers import Response
-from waitress import serve
 
 from . import __version__
 from .generate import GHCRBadgeGenerator
+from .metrics import CONTENT_TYPE, registry, request_seconds
+from .routes import (
+    REPO_LINK,
+    BatchLimits,
+    badge_cache,
+    badge_request,
+    batch_data,
+    batch_multipart,
+    configure_from_environ,
+    encode_svg,
+    index_data,
+    parse_batch,
+    prefetcher,
+    svg_cache_headers,
+)
+from .tracing import start_trace, trace_log
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
     from typing import Literal
 
 
 _PACKAGE_PARAM_RULE = "/<package_owner>/<path:package_name>"
-_REPO_LINK = "https://github.com/eggplants/ghcr-badge"
 
 app = Flask(__name__)
 app.config["JSONIFY_PRETTYPRINT_REGULAR"] = True
 
 
-def return_svg(svg: str) -> Response:
+@app.before_request
+def start_timer() -> None:
+    """Remember when the request started, and start tracing its phases."""
+    g.started_at = time.perf_counter()
+    g.trace_scope = contextlib.ExitStack()
+    g.trace = g.trace_scope.enter_context(start_trace())
+
+
+@app.after_request
+def record_request(res: Response) -> Response:
+    """Record latency of the request per route and status, and report its phases as `Server-Timing`.
+
+    Parameters
+    ----------
+    res : Response
+        response to send
+
+    Returns:
+    -------
+    Response
+        the same response
+
+    """
+    started_at = g.get("started_at")
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_seconds.observe(time.perf_counter() - started_at, route, str(res.status_code))
+    trace = g.get("trace")
+    if trace is not None:
+        res.headers["Server-Timing"] = trace.server_timing()
+        trace_log.write(trace, method=request.method, path=request.full_path.rstrip("?"), status=res.status_code)
+    return res
+
+
+@app.teardown_request
+def end_trace(_: BaseException | None) -> None:
+    """Stop tracing the request."""
+    scope = g.pop("trace_scope", None)
+    if scope is not None:
+        scope.close()
+
+
+def return_svg(svg: str | bytes, etag: str | None = None) -> Response:
     """Return a generated svg as `Flask.Response`.
 
     Parameters
     ----------
-    svg : str
+    svg : str | bytes
         svg source string
+    etag : str | None, optional
+        strong ETag of the svg, by default None
 
     Returns:
     -------
@@ -38,19 +100,94 @@ def return_svg(svg: str) -> Response:
         Flask response object
 
     """
-    expiry_time = datetime.now(tz=timezone.utc) + timedelta(3666)
-
     res = make_response(
         svg,
     )
     res.mimetype = "image/svg+xml"
-    res.headers["Cache-Control"] = "max-age=3666,s-maxage=3666,no-store,proxy-revalidate"
-    res.headers["Pragma"] = "no-cache"  # for HTTP 1.0
-    res.headers["Expires"] = expiry_time.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    res.headers.update(svg_cache_headers())
+    if etag is not None:
+        res.set_etag(etag)
 
     return res
 
 
+def load_cached_svg(key: tuple[str, ...], render: Callable[[], str]) -> tuple[bytes, str]:
+    """Get a svg and its ETag from `badge_cache`, counting the request for prefetching.
+
+    Parameters
+    ----------
+    key : tuple[str, ...]
+        endpoint, package owner, package name and normalized parameters
+    render : Callable[[], str]
+        function to generate the svg on cache miss
+
+    Returns:
+    -------
+    tuple[bytes, str]
+        encoded svg and its ETag
+
+    """
+
+    def load() -> tuple[bytes, str]:
+        return encode_svg(render())
+
+    prefetcher.record(key, load)
+    return badge_cache.get(key, load)
+
+
+def return_cached_svg(key: tuple[str, ...], render: Callable[[], str]) -> Response:
+    """Return a svg from `badge_cache`, or `304 Not Modified` if the client has it.
+
+    Parameters
+    ----------
+    key : tuple[str, ...]
+        endpoint, package owner, package name and normalized parameters
+    render : Callable[[], str]
+        function to generate the svg on cache miss
+
+    Returns:
+    -------
+    Response
+        Flask response object
+
+    """
+    svg, etag = load_cached_svg(key, render)
+    if request.if_none_match.contains_weak(etag):
+        res = return_svg(b"", etag)
+        res.status_code = 304
+        return res
+    return return_svg(svg, etag)
+
+
+def badge_renderer(
+    kind: str,
+    package_owner: str,
+    package_name: str,
+    q_params: Mapping[str, str],
+) -> tuple[tuple[str, ...], Callable[[], str]]:
+    """Get the cache key and the render function of a badge.
+
+    Parameters
+    ----------
+    kind : str
+        badge kind, one of `tags`, `latest_tag` and `size`
+    package_owner : str
+        package owner name, e.g. 'eggplants'
+    package_name : str
+        package name, e.g. 'asciiquarium-docker'
+    q_params : Mapping[str, str]
+        query parameters
+
+    Returns:
+    -------
+    tuple[tuple[str, ...], Callable[[], str]]
+        key in `badge_cache` and function to generate the svg
+
+    """
+    badge = badge_request(kind, package_owner, package_name, q_params)
+    return badge.key, lambda: badge.render(GHCRBadgeGenerator)
+
+
 @app.route("/", methods=["GET"])
 @app.route("/index", methods=["GET"])
 @app.route("/index<any('.html', '.json'):ext>", methods=["GET"])
@@ -77,7 +214,7 @@ def __get_index_html() -> Response:
         HTML
 
     """
-    return Response(render_template("index.j2", version=__version__, repo_link=_REPO_LINK))
+    return Response(render_template("index.j2", version=__version__, repo_link=REPO_LINK))
 
 
 def __get_index_json() -> Response:
@@ -90,27 +227,7 @@ def __get_index_json() -> Response:
 
     """
     try:
-        return jsonify(
-            {
-                "available_paths": [
-                    "/",
-                    "/<package_owner>/<package_name>/tags?color=...&ignore=...&n=...&label=...&trim=...",
-                    "/<package_owner>/<package_name>/latest_tag?color=...&ignore=...&label=...&trim=...",
-                    "/<package_owner>/<package_name>/size?tag=...&color=...&label=...&trim=...",
-                ],
-                "example_paths": [
-                    "/",
-                    "/eggplants/ghcr-badge/tags",
-                    "/eggplants/ghcr-badge/latest_tag",
-                    "/eggplants/ghcr-badge/size",
-                    "/frysztak/orpington-news/size",
-                    "/tuananh/aws-cli/size",
-                    "/plantuml/docker%2Fjekyll/tags",
-                ],
-                "repo": _REPO_LINK,
-                "version": __version__,
-            },
-        )
+        return jsonify(index_data())
     except Exception as err:  # noqa: BLE001
         return jsonify(exception=type(err).__name__)
 
@@ -133,24 +250,7 @@ def get_tags(package_owner: str, package_name: str) -> Response:
 
     """
     try:
-        q_params = request.args
-        color = q_params.get("color", "#44cc11")
-        ignore_tag = q_params.get("ignore", "latest")
-        label = q_params.get("label", "image tags")
-        tag_num = q_params.get("n", 3)
-        trim = q_params.get("trim", "")
-        res = return_svg(
-            GHCRBadgeGenerator(
-                color=color,
-                ignore_tag=ignore_tag,
-                trim_type=trim,
-            ).generate_tags(
-                package_owner,
-                package_name,
-                n=int(tag_num),
-                label=label,
-            ),
-        )
+        res = return_cached_svg(*badge_renderer("tags", package_owner, package_name, request.args))
     except Exception as err:  # noqa: BLE001
         return jsonify(exception=type(err).__name__, message=str(err))
 
@@ -175,22 +275,7 @@ def get_latest_tag(package_owner: str, package_name: str) -> Response:
 
     """
     try:
-        q_params = request.args
-        color = q_params.get("color", "#44cc11")
-        ignore_tag = q_params.get("ignore", "latest")
-        label = q_params.get("label", "version")
-        trim = q_params.get("trim", "")
-        res = return_svg(
-            GHCRBadgeGenerator(
-                color=color,
-                ignore_tag=ignore_tag,
-                trim_type=trim,
-            ).generate_latest_tag(
-                package_owner,
-                package_name,
-                label=label,
-            ),
-        )
+        res = return_cached_svg(*badge_renderer("latest_tag", package_owner, package_name, request.args))
     except Exception as err:  # noqa: BLE001
         return jsonify(exception=type(err).__name__)
 
@@ -215,25 +300,65 @@ def get_size(package_owner: str, package_name: str) -> Response:
 
     """
     try:
-        q_params = request.args
-        tag = q_params.get("tag", "latest")
-        color = q_params.get("color", "#44cc11")
-        label = q_params.get("label", "image size")
-        trim = q_params.get("trim", "")
-        res = return_svg(
-            GHCRBadgeGenerator(color=color, trim_type=trim).generate_size(
-                package_owner,
-                package_name,
-                tag=tag,
-                label=label,
-            ),
-        )
+        res = return_cached_svg(*badge_renderer("size", package_owner, package_name, request.args))
     except Exception as err:  # noqa: BLE001
         return jsonify(exception=type(err).__name__)
 
     return res
 
 
+@app.route("/batch", methods=["POST"])
+def post_batch() -> Response:
+    """Get many badges in one request.
+
+    The body is a JSON list of `{"owner", "package", "kind", "params"}`
+    objects. Badges are loaded by up to `BatchLimits.workers` threads; the
+    same badge is loaded once, and badges of the same package share its tag
+    list or manifest lookups through the caches.
+
+    Returns:
+    -------
+    Response
+        JSON of badges in the requested order, or `multipart/mixed` if preferred by `Accept`
+
+    """
+    try:
+        items = parse_batch(request.get_json(silent=True))
+    except ValueError as err:
+        res = jsonify(exception=type(err).__name__, message=str(err))
+        res.status_code = 400
+        return res
+
+    keys, renderers = [], {}
+    for item in items:
+        key, render = badge_renderer(item.kind, item.package_owner, item.package_name, item.params)
+        keys.append(key)
+        renderers.setdefault(key, render)
+
+    def load(key: tuple[str, ...]) -> tuple[bytes, str] | Exception:
+        try:
+            return load_cached_svg(key, renderers[key])
+        except Exception as err:  # noqa: BLE001
+            return err
+
+    with ThreadPoolExecutor(max_workers=max(min(BatchLimits.workers, len(renderers)), 1)) as pool:
+        # run each load in a copy of this context, so that its spans join the request's trace
+        futures = [pool.submit(contextvars.copy_context().run, load, key) for key in renderers]
+        loaded = {key: future.result() for key, future in zip(renderers, futures, strict=True)}
+    results = [loaded[key] for key in keys]
+
+    if request.accept_mimetypes.best_match(["application/json", "multipart/mixed"]) == "multipart/mixed":
+        body, content_type = batch_multipart(items, results)
+        return Response(body, content_type=content_type)
+    return jsonify(batch_data(items, results))
+
+
+@app.route("/metrics")
+def metrics() -> Response:
+    """Expose metrics of this process in the Prometheus text format."""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route("/health")
 def health() -> Response:
     """Check if server is up."""
@@ -246,6 +371,9 @@ def main() -> None:
     """Run API server at `0.0.0.0:5000`."""
     host = environ.get("HOST", "0.0.0.0")  # noqa: S104
     port = int(environ.get("PORT", "5000"))
+    configure_from_environ(environ)
+    from waitress import serve  # noqa: PLC0415  # not needed by WSGI servers importing `app`
+
     serve(app, host=host, port=port)
 
 
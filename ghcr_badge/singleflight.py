@@ -0,0 +1,166 @@
+"""Coalesce concurrent identical calls into one."""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Generic, TypedDict, TypeVar
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Awaitable, Callable, Hashable
+
+    from typing_extensions import Self
+
+_K = TypeVar("_K", bound="Hashable")
+_V = TypeVar("_V")
+
+
+class SingleFlightStats(TypedDict):
+    """Statistics of coalesced calls."""
+
+    calls: int
+    shared: int
+
+
+class _Call(Generic[_V]):
+    __slots__ = ("done", "error", "value")
+
+    def __init__(self: Self) -> None:
+        self.done = threading.Event()
+        self.value: _V | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[_K, _V]):
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self: Self) -> None:
+        """Create a group of calls."""
+        self._lock = threading.Lock()
+        self._calls: dict[_K, _Call[_V]] = {}
+        self._count = 0
+        self._shared = 0
+
+    def do(self: Self, key: _K, fn: Callable[[], _V]) -> _V:
+        """Call `fn`, or wait for the in-flight call with the same key.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            key identifying identical calls
+        fn : Callable[[], _V]
+            function to call
+
+        Returns:
+        -------
+        _V
+            return value of `fn`, shared by callers waiting on the same call
+
+        Raises:
+        ------
+        BaseException
+            exception raised by `fn`, re-raised to every waiting caller
+
+        """
+        with self._lock:
+            self._count += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                self._shared += 1
+
+        if leader:
+            try:
+                value = call.value = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return value
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value  # type: ignore[return-value]
+
+    def stats(self: Self) -> SingleFlightStats:
+        """Get statistics of calls.
+
+        Returns:
+        -------
+        SingleFlightStats
+            number of calls, and those which waited on another caller
+
+        """
+        with self._lock:
+            return {"calls": self._count, "shared": self._shared}
+
+
+class AsyncSingleFlight(Generic[_K, _V]):
+    """Run at most one awaitable per key at a time on an event loop."""
+
+    def __init__(self: Self) -> None:
+        """Create a group of calls."""
+        self._calls: dict[_K, asyncio.Future[_V]] = {}
+        self._count = 0
+        self._shared = 0
+
+    async def do(self: Self, key: _K, fn: Callable[[], Awaitable[_V]]) -> _V:
+        """Await `fn`, or the in-flight call with the same key.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : _K
+            key identifying identical calls
+        fn : Callable[[], Awaitable[_V]]
+            coroutine function to call
+
+        Returns:
+        -------
+        _V
+            return value of `fn`, shared by callers waiting on the same call
+
+        """
+        import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+        self._count += 1
+        call = self._calls.get(key)
+        if call is not None:
+            self._shared += 1
+            return await asyncio.shield(call)
+
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            call.exception()  # mark as retrieved when nobody waits
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            del self._calls[key]
+
+    def stats(self: Self) -> SingleFlightStats:
+        """Get statistics of calls.
+
+        Returns:
+        -------
+        SingleFlightStats
+            number of calls, and those which waited on another caller
+
+        """
+        return {"calls": self._count, "shared": self._shared}
@@ -0,0 +1,115 @@
+"""Compile `ignore` and `trim` options into one reusable tag matcher."""
+
+from __future__ import annotations
+
+import fnmatch
+import functools
+import re
+from itertools import filterfalse
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from typing_extensions import Self
+
+TRIM_PATTERNS = {
+    "patch": r"^v?\d+\.\d+\.\d+[^.]*$",
+    "major": r"^v?\d+\.\d+[^.]*$",
+}
+"""Patterns of tags hidden by each `trim` option."""
+_NO_TRIM_PATTERN = "^$"
+
+
+class TagFilter:
+    """Hide tags matching a trim pattern or any of ignore globs.
+
+    All patterns are compiled into one regex, so each tag is tested once
+    instead of once per glob.
+    """
+
+    def __init__(self: Self, ignore_tags: Iterable[str], trim_pattern: str) -> None:
+        """Compile a filter.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        ignore_tags : Iterable[str]
+            `fnmatch` globs of tags to hide
+        trim_pattern : str
+            regex of tags to hide
+
+        """
+        self.ignore_tags = list(ignore_tags)
+        self.trim_pattern = trim_pattern
+        pattern = "|".join([f"(?:{trim_pattern})", *map(fnmatch.translate, dict.fromkeys(self.ignore_tags))])
+        self._excludes = re.compile(pattern).match
+
+    def excludes(self: Self, tag: str) -> bool:
+        """Check whether a tag is hidden.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tag : str
+            tag name
+
+        Returns:
+        -------
+        bool
+            True if the tag is hidden
+
+        """
+        return self._excludes(tag) is not None
+
+    def filter(self: Self, tags: list[str], n: int | None = None) -> list[str]:
+        """Filter given tags.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        tags : list[str]
+            tags to filter
+        n : int | None, optional
+            keep only the last n filtered tags, scanning from the end and
+            stopping once found, by default None (keep all)
+
+        Returns:
+        -------
+        list[str]
+            Filtered tags
+
+        """
+        if n is None:
+            return list(filterfalse(self._excludes, tags))
+        filtered: list[str] = []
+        if n <= 0:
+            return filtered
+        for tag in filterfalse(self._excludes, reversed(tags)):
+            filtered.append(tag)
+            if len(filtered) == n:
+                break
+        return filtered[::-1]
+
+
+@functools.lru_cache(maxsize=256)
+def get_tag_filter(ignore_tag: str = "latest", trim_type: str = "") -> TagFilter:
+    """Get a compiled filter, shared by all callers passing the same options.
+
+    Parameters
+    ----------
+    ignore_tag : str, optional
+        comma-separated globs of tags to hide, by default "latest"
+    trim_type : str, optional
+        type to hide tags, `patch` or `major`, by default ""
+
+    Returns:
+    -------
+    TagFilter
+        compiled filter
+
+    """
+    return TagFilter(ignore_tag.split(","), TRIM_PATTERNS.get(trim_type, _NO_TRIM_PATTERN))
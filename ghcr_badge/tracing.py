@@ -0,0 +1,210 @@
+"""Time phases of a request and report them as `Server-Timing`.
+
+A server starts a `Trace` per request with `start_trace`, and generators wrap
+their phases (auth and validation, tag and manifest fetches, filtering and
+rendering) in `span`. Spans outside a trace, e.g. of the CLI or of background
+refreshes, cost one context variable lookup and are not recorded.
+
+The trace is held by a context variable, so spans of tasks gathered by an
+async generator join their request. Threads do not inherit it unless started
+through `contextvars.copy_context().run`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from typing_extensions import Self
+
+
+class Span(NamedTuple):
+    """Timed phase of a request."""
+
+    name: str
+    start: float
+    """seconds since the trace started"""
+    duration: float
+    """seconds"""
+
+
+class Trace:
+    """Spans recorded while serving one request."""
+
+    def __init__(self: Self) -> None:
+        """Start an empty trace."""
+        self.started_at = time.perf_counter()
+        self.spans: list[Span] = []
+
+    def add(self: Self, name: str, start: float, duration: float) -> None:
+        """Record a span.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        name : str
+            phase name
+        start : float
+            `time.perf_counter()` when the phase started
+        duration : float
+            seconds spent in the phase
+
+        """
+        # list.append is atomic, so threads of the same request may add spans concurrently
+        self.spans.append(Span(name, start - self.started_at, duration))
+
+    def elapsed(self: Self) -> float:
+        """Get seconds since the trace started.
+
+        Returns:
+        -------
+        float
+            seconds
+
+        """
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self: Self) -> str:
+        """Format spans as a `Server-Timing` header, followed by the total.
+
+        Spans of the same phase are summed, e.g. manifests of platforms fetched concurrently.
+
+        Returns:
+        -------
+        str
+            e.g. `tags;dur=41.2, filter;dur=0.1, render;dur=0.1, total;dur=42.0`
+
+        """
+        durations: dict[str, float] = {}
+        counts: dict[str, int] = {}
+        for span in list(self.spans):
+            durations[span.name] = durations.get(span.name, 0) + span.duration
+            counts[span.name] = counts.get(span.name, 0) + 1
+        metrics = [
+            f"{name};dur={duration * 1000:.1f}" + (f';desc="{counts[name]} spans"' if counts[name] > 1 else "")
+            for name, duration in durations.items()
+        ]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def to_dict(self: Self) -> dict[str, Any]:
+        """Get spans as JSON-serializable data.
+
+        Returns:
+        -------
+        dict[str, Any]
+            total and spans in milliseconds
+
+        """
+        return {
+            "total_ms": round(self.elapsed() * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for name, start, duration in sorted(self.spans, key=lambda span: span.start)
+            ],
+        }
+
+
+_current: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("ghcr_badge_trace", default=None)
+
+
+@contextlib.contextmanager
+def start_trace() -> Generator[Trace, None, None]:
+    """Trace the block, e.g. handling of a request.
+
+    Yields:
+    ------
+    Trace
+        trace receiving spans of the block
+
+    """
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Generator[None, None, None]:
+    """Record the block as a phase of the current trace, if any.
+
+    Parameters
+    ----------
+    name : str
+        phase name, e.g. `tags`
+
+    Yields:
+    ------
+    None
+        nothing
+
+    """
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+class TraceLog:
+    """Sink appending traces of slow requests to a file as JSON lines."""
+
+    def __init__(self: Self) -> None:
+        """Create a disabled sink."""
+        self.path = ""
+        self.threshold = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self: Self, path: str = "", threshold: float = 0) -> None:
+        """Set where and which traces are written.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        path : str, optional
+            file to append to, by default "" (disabled)
+        threshold : float, optional
+            seconds a request should take to be written, by default 0 (all)
+
+        """
+        self.path = path
+        self.threshold = threshold
+
+    def write(self: Self, trace: Trace, **fields: str | int) -> None:
+        """Append a trace if enabled and the request was slow.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        trace : Trace
+            finished trace
+        **fields : str | int
+            request attributes, e.g. `path` and `status`
+
+        """
+        if not self.path or trace.elapsed() < self.threshold:
+            return
+        line = json.dumps({"time": time.time(), **fields, **trace.to_dict()}) + "\n"
+        with self._lock, Path(self.path).open("a", encoding="utf-8") as f:
+            f.write(line)
+
+
+trace_log = TraceLog()
+"""Sink of request traces, disabled until configured."""
@@ -0,0 +1,636 @@
+"""Share keep-alive HTTP connections to ghcr.io across generators.
+
+`GHCRBadgeGenerator` instances are short-lived (the server builds one per
+request), so they borrow a process-wide `UpstreamClient` instead of opening
+their own connections.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from http import HTTPStatus
+from http.cookiejar import DefaultCookiePolicy
+from typing import TYPE_CHECKING, TypedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import upstream_responses, upstream_seconds
+from .ratelimit import UpstreamScheduler, scheduler
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Mapping
+
+    import httpx
+    from typing_extensions import Self
+
+_TIMEOUT = 10
+_POOL_MAXSIZE = 10
+_VALIDATORS_MAXSIZE = 4096
+
+
+def endpoint_of(url: str) -> str:
+    """Get the registry endpoint of a request URL, as labelled in metrics.
+
+    Parameters
+    ----------
+    url : str
+        request URL
+
+    Returns:
+    -------
+    str
+        `tags/list`, `manifests` or `other` (e.g. the token endpoint)
+
+    """
+    if "/tags/list" in url:
+        return "tags/list"
+    if "/manifests/" in url:
+        return "manifests"
+    return "other"
+
+
+def record_upstream(url: str, status: int | None, seconds: float) -> None:
+    """Record latency and status of an upstream request.
+
+    Parameters
+    ----------
+    url : str
+        request URL
+    status : int | None
+        response status code, or None if no response was received
+    seconds : float
+        seconds to get the response
+
+    """
+    endpoint = endpoint_of(url)
+    label = "error" if status is None else str(status)
+    upstream_seconds.observe(seconds, endpoint, label)
+    upstream_responses.inc(endpoint, label)
+
+
+class PoolStats(TypedDict):
+    """Statistics of pooled upstream connections."""
+
+    pools: int
+    connections: int
+    requests: int
+    reused: int
+
+
+class ConditionalStats(TypedDict):
+    """Statistics of conditional upstream requests."""
+
+    validators: int
+    """URLs whose validators are remembered"""
+    conditional: int
+    """requests sent with `If-None-Match` or `If-Modified-Since`"""
+    not_modified: int
+    """responses of conditional requests which were `304 Not Modified`, i.e. saved a body transfer"""
+
+
+def conditional_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    """Get headers of a request conditional on the validators of a response.
+
+    Parameters
+    ----------
+    headers : Mapping[str, str]
+        response headers
+
+    Returns:
+    -------
+    dict[str, str]
+        `If-None-Match` and `If-Modified-Since` for its `ETag` and `Last-Modified`, if any
+
+    """
+    return {
+        name: value
+        for name, header in (("If-None-Match", "ETag"), ("If-Modified-Since", "Last-Modified"))
+        if (value := headers.get(header))
+    }
+
+
+class Validators:
+    """`ETag` and `Last-Modified` of responses, remembered per request URL to send conditional requests."""
+
+    def __init__(self: Self, maxsize: int = _VALIDATORS_MAXSIZE) -> None:
+        """Create an empty store.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        maxsize : int, optional
+            number of URLs to remember, by default 4096
+
+        """
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], dict[str, str]] = OrderedDict()
+        self._conditional = 0
+        self._not_modified = 0
+
+    @staticmethod
+    def key(url: str, params: Mapping[str, str | int] | None) -> tuple[str, str]:
+        """Get the key of a request.
+
+        Parameters
+        ----------
+        url : str
+            request URL
+        params : Mapping[str, str | int] | None
+            query parameters
+
+        Returns:
+        -------
+        tuple[str, str]
+            URL and normalized query parameters
+
+        """
+        return url, "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+
+    def headers(self: Self, key: tuple[str, str]) -> dict[str, str]:
+        """Get conditional request headers of a request, counting it as conditional if any.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : tuple[str, str]
+            request key
+
+        Returns:
+        -------
+        dict[str, str]
+            `If-None-Match` and `If-Modified-Since` headers, empty if nothing is remembered
+
+        """
+        with self._lock:
+            headers = self._entries.get(key)
+            if headers is None:
+                return {}
+            self._entries.move_to_end(key)
+            self._conditional += 1
+        return dict(headers)
+
+    def update(self: Self, key: tuple[str, str], status_code: int, headers: Mapping[str, str]) -> None:
+        """Remember validators of a response, or count a `304 Not Modified`.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        key : tuple[str, str]
+            request key
+        status_code : int
+            response status code
+        headers : Mapping[str, str]
+            response headers
+
+        """
+        if status_code == HTTPStatus.NOT_MODIFIED:
+            with self._lock:
+                self._not_modified += 1
+            return
+        if status_code != HTTPStatus.OK:
+            return
+        validators = conditional_headers(headers)
+        with self._lock:
+            if validators:
+                self._entries[key] = validators
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self: Self) -> ConditionalStats:
+        """Get statistics of conditional requests.
+
+        Returns:
+        -------
+        ConditionalStats
+            remembered URLs, conditional requests and `304` responses
+
+        """
+        with self._lock:
+            return {
+                "validators": len(self._entries),
+                "conditional": self._conditional,
+                "not_modified": self._not_modified,
+            }
+
+
+class UpstreamClient:
+    """Thread-safe HTTP client keeping pooled connections alive."""
+
+    def __init__(
+        self: Self,
+        *,
+        pool_maxsize: int = _POOL_MAXSIZE,
+        timeout: float = _TIMEOUT,
+        scheduler: UpstreamScheduler = scheduler,
+    ) -> None:
+        """Create a client.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        pool_maxsize : int, optional
+            number of connections kept alive per host, by default 10
+        timeout : float, optional
+            second to wait for upstream, by default 10
+        scheduler : UpstreamScheduler, optional
+            rate limiter of requests, by default the process-wide one
+
+        Raises:
+        ------
+        ValueError
+            raise if pool_maxsize is not positive
+
+        """
+        if pool_maxsize < 1:
+            msg = f"{pool_maxsize} should be positive."
+            raise ValueError(msg)
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self._adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self._session = requests.Session()
+        # cookies would be shared between threads, and the registry does not need them
+        self._session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        self.validators = Validators()
+
+    def get(
+        self: Self,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        params: Mapping[str, str | int] | None = None,
+        conditional: bool = False,
+    ) -> requests.Response:
+        """Send GET request over a pooled connection.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        url : str
+            request URL
+        headers : Mapping[str, str] | None, optional
+            request headers, by default None
+        params : Mapping[str, str | int] | None, optional
+            query parameters, by default None
+        conditional : bool, optional
+            send validators remembered for the URL and remember the new ones,
+            so that the response may be `304 Not Modified`, by default False
+
+        Returns:
+        -------
+        requests.Response
+            response object
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if the request is not sent as upstream throttles, or the response is `429` or `5xx`
+
+        """
+        if not conditional:
+            return self._request("GET", url, headers=headers, params=params)
+        key = self.validators.key(url, params)
+        headers = {**(headers or {}), **self.validators.headers(key)}
+        response = self._request("GET", url, headers=headers, params=params)
+        self.validators.update(key, response.status_code, response.headers)
+        return response
+
+    def head(self: Self, url: str, *, headers: Mapping[str, str] | None = None) -> requests.Response:
+        """Send HEAD request over a pooled connection.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        url : str
+            request URL
+        headers : Mapping[str, str] | None, optional
+            request headers, by default None
+
+        Returns:
+        -------
+        requests.Response
+            response object without body
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if the request is not sent as upstream throttles, or the response is `429` or `5xx`
+
+        """
+        return self._request("HEAD", url, headers=headers)
+
+    def _request(
+        self: Self,
+        method: str,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None,
+        params: Mapping[str, str | int] | None = None,
+    ) -> requests.Response:
+        self.scheduler.acquire()
+        start, status = time.perf_counter(), None
+        try:
+            response = self._session.request(method, url, headers=headers, params=params, timeout=self.timeout)
+            status = response.status_code
+        finally:
+            record_upstream(url, status, time.perf_counter() - start)
+        self.scheduler.check_response(response.status_code, response.headers)
+        return response
+
+    def stats(self: Self) -> PoolStats:
+        """Get statistics of the connection pools.
+
+        Returns:
+        -------
+        PoolStats
+            `connections` is the number of opened connections (= handshakes),
+            `reused` is the number of requests sent over an already opened one
+
+        """
+        pools = self._adapter.poolmanager.pools
+        connections = 0
+        sent = 0
+        for key in pools.keys():  # noqa: SIM118
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            sent += pool.num_requests
+        return {
+            "pools": len(pools),
+            "connections": connections,
+            "requests": sent,
+            "reused": max(sent - connections, 0),
+        }
+
+    def close(self: Self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+
+
+class AsyncUpstreamClient:
+    """Non-blocking HTTP client keeping pooled connections alive.
+
+    It requires the optional `httpx` dependency (`pip install ghcr-badge[async]`).
+    """
+
+    def __init__(
+        self: Self,
+        *,
+        pool_maxsize: int = _POOL_MAXSIZE,
+        timeout: float = _TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+        scheduler: UpstreamScheduler = scheduler,
+    ) -> None:
+        """Create a client.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        pool_maxsize : int, optional
+            number of connections kept alive per host, by default 10
+        timeout : float, optional
+            second to wait for upstream, by default 10
+        transport : httpx.AsyncBaseTransport | None, optional
+            transport to send requests with, by default a pooled network one
+        scheduler : UpstreamScheduler, optional
+            rate limiter of requests, by default the process-wide one
+
+        Raises:
+        ------
+        ValueError
+            raise if pool_maxsize is not positive
+        ImportError
+            raise if httpx is not installed
+
+        """
+        if pool_maxsize < 1:
+            msg = f"{pool_maxsize} should be positive."
+            raise ValueError(msg)
+        try:
+            import httpx  # noqa: PLC0415
+        except ImportError as e:
+            msg = "AsyncUpstreamClient requires httpx: pip install ghcr-badge[async]"
+            raise ImportError(msg) from e
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_maxsize),
+            timeout=timeout,
+            transport=transport,
+        )
+        self.validators = Validators()
+
+    async def get(
+        self: Self,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        params: Mapping[str, str | int] | None = None,
+        conditional: bool = False,
+    ) -> httpx.Response:
+        """Send GET request over a pooled connection.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        url : str
+            request URL
+        headers : Mapping[str, str] | None, optional
+            request headers, by default None
+        params : Mapping[str, str | int] | None, optional
+            query parameters, by default None
+        conditional : bool, optional
+            send validators remembered for the URL and remember the new ones,
+            so that the response may be `304 Not Modified`, by default False
+
+        Returns:
+        -------
+        httpx.Response
+            response object
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if the request is not sent as upstream throttles, or the response is `429` or `5xx`
+
+        """
+        if not conditional:
+            return await self._request("GET", url, headers=headers, params=params)
+        key = self.validators.key(url, params)
+        headers = {**(headers or {}), **self.validators.headers(key)}
+        response = await self._request("GET", url, headers=headers, params=params)
+        self.validators.update(key, response.status_code, response.headers)
+        return response
+
+    async def head(self: Self, url: str, *, headers: Mapping[str, str] | None = None) -> httpx.Response:
+        """Send HEAD request over a pooled connection.
+
+        Parameters
+        ----------
+        self : Self
+            class instance
+        url : str
+            request URL
+        headers : Mapping[str, str] | None, optional
+            request headers, by default None
+
+        Returns:
+        -------
+        httpx.Response
+            response object without body
+
+        Raises:
+        ------
+        UpstreamThrottledError
+            raise if the request is not sent as upstream throttles, or the response is `429` or `5xx`
+
+        """
+        return await self._request("HEAD", url, headers=headers)
+
+    async def _request(
+        self: Self,
+        method: str,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None,
+        params: Mapping[str, str | int] | None = None,
+    ) -> httpx.Response:
+        await self.scheduler.aacquire()
+        start, status = time.perf_counter(), None
+        try:
+            response = await self._client.request(method, url, headers=headers, params=params)
+            status = response.status_code
+        finally:
+            record_upstream(url, status, time.perf_counter() - start)
+        self.scheduler.check_response(response.status_code, response.headers)
+        return response
+
+    async def aclose(self: Self) -> None:
+        """Close all pooled connections."""
+        await self._client.aclose()
+
+
+_client: UpstreamClient | None = None
+_client_options: dict[str, float] = {}
+_client_lock = threading.Lock()
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncUpstreamClient] = weakref.WeakKeyDictionary()
+
+
+def get_client() -> UpstreamClient:
+    """Get the process-wide upstream client, creating it at first use.
+
+    Returns:
+    -------
+    UpstreamClient
+        shared client
+
+    """
+    global _client  # noqa: PLW0603
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None:
+            _client = UpstreamClient(
+                pool_maxsize=int(_client_options.get("pool_maxsize", _POOL_MAXSIZE)),
+                timeout=_client_options.get("timeout", _TIMEOUT),
+            )
+        return _client
+
+
+def get_async_client() -> AsyncUpstreamClient:
+    """Get the async upstream client of the running event loop, creating it at first use.
+
+    Returns:
+    -------
+    AsyncUpstreamClient
+        client shared on the running event loop
+
+    """
+    import asyncio  # noqa: PLC0415  # only async callers pay for it
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncUpstreamClient(
+            pool_maxsize=int(_client_options.get("pool_maxsize", _POOL_MAXSIZE)),
+            timeout=_client_options.get("timeout", _TIMEOUT),
+        )
+    return client
+
+
+def clients() -> list[UpstreamClient | AsyncUpstreamClient]:
+    """Get the upstream clients created so far in this process, without creating any.
+
+    Returns:
+    -------
+    list[UpstreamClient | AsyncUpstreamClient]
+        process-wide client if created, then async clients of live event loops
+
+    """
+    with _client_lock:
+        client = _client
+    return [*([] if client is None else [client]), *list(_async_clients.values())]
+
+
+def configure_client(*, pool_maxsize: int = _POOL_MAXSIZE, timeout: float = _TIMEOUT) -> UpstreamClient:
+    """Replace the process-wide upstream client.
+
+    Async clients created afterwards use the same options.
+
+    Parameters
+    ----------
+    pool_maxsize : int, optional
+        number of connections kept alive per host, by default 10
+    timeout : float, optional
+        second to wait for upstream, by default 10
+
+    Returns:
+    -------
+    UpstreamClient
+        new shared client
+
+    """
+    global _client
+    client = UpstreamClient(pool_maxsize=pool_maxsize, timeout=timeout)
+    with _client_lock:
+        old, _client = _client, client
+        _client_options.update(pool_maxsize=pool_maxsize, timeout=timeout)
+    if old is not None:
+        old.close()
+    return client
+
+
+def _forget_client_after_fork() -> None:
+    # sockets opened before fork (e.g. gunicorn's `preload_app`) must not be
+    # shared between workers; each child opens its own pool lazily.
+    global _client, _client_lock  # noqa: PLW0603
+    _client = None
+    _client_lock = threading.Lock()
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_client_after_fork)
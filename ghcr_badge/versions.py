@@ -0,0 +1,62 @@
+"""Order tags by semantic version precedence."""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+_VERSION_PATTERN = re.compile(
+    r"^v?(?P<major>\d+)(?:\.(?P<minor>\d+))?(?:\.(?P<patch>\d+))?"
+    r"(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$",
+)
+
+VersionKey = tuple[bool, int, int, int, bool, tuple[tuple[int, int, str], ...]]
+"""Whether a tag is a version, major, minor and patch numbers, whether it is a release, pre-release identifiers."""
+_NOT_VERSION_KEY: VersionKey = (False, 0, 0, 0, False, ())
+
+
+def version_key(tag: str) -> VersionKey:
+    """Get a sort key ordering tags by semver precedence.
+
+    `v` prefix, missing minor or patch numbers and build metadata are
+    allowed. Tags which are not versions sort before all versions.
+
+    Parameters
+    ----------
+    tag : str
+        tag name, e.g. 'v1.10.0-rc.1'
+
+    Returns:
+    -------
+    VersionKey
+        sort key
+
+    """
+    m = _VERSION_PATTERN.match(tag)
+    if m is None:
+        return _NOT_VERSION_KEY
+    pre = m["pre"]
+    pre_key = () if pre is None else tuple((0, int(i), "") if i.isdigit() else (1, 0, i) for i in pre.split("."))
+    return (True, int(m["major"]), int(m["minor"] or 0), int(m["patch"] or 0), pre is None, pre_key)
+
+
+def sort_by_version(tags: Iterable[str]) -> tuple[str, ...]:
+    """Sort tags from the oldest version to the newest one.
+
+    Tags which are not versions come first in their given order.
+
+    Parameters
+    ----------
+    tags : Iterable[str]
+        tags to sort
+
+    Returns:
+    -------
+    tuple[str, ...]
+        sorted tags
+
+    """
+    return tuple(sorted(tags, key=version_key))
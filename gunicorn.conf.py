@@ -1,6 +1,15 @@
 """Gunicorn configuraitons."""
 
+import os
+
 max_requests = 1200
 preload_app = True
 timeout = 5
 wsgi_app = "ghcr_badge.server:app"
+
+
+def post_worker_init(_: object) -> None:
+    """Configure each worker from environment variables, as `ghcr-badge-server` does."""
+    from ghcr_badge.routes import configure_from_environ  # noqa: PLC0415
+
+    configure_from_environ(os.environ)
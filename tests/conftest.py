@@ -0,0 +1,63 @@
+"""Shared fixtures for tests."""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+
+from benchmarks.stub_registry import StubRegistry
+from ghcr_badge.generate import BaseBadgeGenerator, manifest_store, tag_cache, tag_digests
+from ghcr_badge.ratelimit import scheduler
+from ghcr_badge.routes import badge_cache, prefetcher
+
+
+class Clock:
+    """Manual clock, moved by setting `now`."""
+
+    def __init__(self) -> None:
+        """Create a clock at 0."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    """Create a manual clock."""
+    return Clock()
+
+
+@pytest.fixture
+def registry_options() -> dict[str, Any]:
+    """Options of the stub registry, overridden by modules needing another one."""
+    return {"tags": 5}
+
+
+@pytest.fixture
+def registry(registry_options: dict[str, Any], monkeypatch: pytest.MonkeyPatch) -> Generator[StubRegistry, None, None]:
+    """Point generators at a stub registry."""
+    with StubRegistry(**registry_options) as stub:
+        monkeypatch.setattr(BaseBadgeGenerator, "registry_url", stub.url)
+        yield stub
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches() -> Generator[None, None, None]:
+    """Isolate process-wide caches, prefetching and rate limits between tests."""
+    scheduler.configure(rate=20, burst=40, max_wait=2)
+    scheduler.reset()
+    tag_cache.clear()
+    tag_digests.clear()
+    manifest_store.clear()
+    badge_cache.clear()
+    yield
+    tag_cache.clear()
+    tag_digests.clear()
+    manifest_store.clear()
+    badge_cache.clear()
+    prefetcher.stop()
+    prefetcher.top_k = 0  # enabled by tests of configure_from_environ
@@ -0,0 +1,206 @@
+"""Tests for ghcr_badge.asgi module."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from ghcr_badge.asgi import app  # noqa: E402
+from ghcr_badge.routes import badge_cache  # noqa: E402
+
+
+def _get(
+    path: str,
+    headers: dict[str, str] | None = None,
+    method: str = "GET",
+    json: object = None,
+) -> httpx.Response:
+    async def run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.request(method, path, headers=headers, json=json)
+
+    return asyncio.run(run())
+
+
+class TestIndexRoute:
+    """Test index routes."""
+
+    def test_get_index_html(self) -> None:
+        """Test GET / returns HTML."""
+        response = _get("/")
+        assert response.status_code == 200
+        assert "<html" in response.text
+
+    def test_get_index_json(self) -> None:
+        """Test GET /index.json returns JSON."""
+        response = _get("/index.json")
+        assert response.headers["content-type"] == "application/json"
+        assert "available_paths" in response.json()
+
+    def test_health(self) -> None:
+        """Test GET /health."""
+        assert _get("/health").text == "OK"
+
+    def test_metrics(self) -> None:
+        """Test GET /metrics records requests under the route names of the WSGI server."""
+        _get("/testuser/testrepo/size", method="POST")
+        text = _get("/metrics").text
+        assert (
+            'ghcr_badge_request_seconds_count{route="/<package_owner>/<path:package_name>/size",status="405"}' in text
+        )
+        assert 'ghcr_badge_single_flight_calls_total{flight="async"}' in text
+
+    def test_server_timing(self) -> None:
+        """Test every response reports its phases."""
+        assert _get("/health").headers["server-timing"].startswith("total;dur=")
+
+    def test_static(self) -> None:
+        """Test GET /static/ serves package files only."""
+        assert _get("/static/favicon.png").headers["content-type"] == "image/png"
+        assert _get("/static/..%2Fserver.py").status_code == 404
+
+    def test_not_found(self) -> None:
+        """Test unknown path."""
+        assert _get("/unknown").status_code == 404
+
+    def test_method_not_allowed(self) -> None:
+        """Test non-GET method."""
+        assert _get("/health", method="POST").status_code == 405
+
+
+class TestBadgeRoutes:
+    """Test badge routes."""
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_get_tags(self, mock_generator_class: MagicMock) -> None:
+        """Test GET /<owner>/<name>/tags with parameters."""
+        mock_generator = MagicMock()
+        mock_generator.generate_tags = AsyncMock(return_value="<svg>v1.0.0</svg>")
+        mock_generator_class.return_value = mock_generator
+
+        response = _get("/testuser/nested/repo/tags?color=red&n=5&ignore=dev&label=versions&trim=patch&sort=semver")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("image/svg+xml")
+        assert response.text == "<svg>v1.0.0</svg>"
+        mock_generator_class.assert_called_once_with(color="red", ignore_tag="dev", trim_type="patch", sort="semver")
+        mock_generator.generate_tags.assert_awaited_once_with("testuser", "nested/repo", n=5, label="versions")
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_get_latest_tag(self, mock_generator_class: MagicMock) -> None:
+        """Test GET /<owner>/<name>/latest_tag with default parameters."""
+        mock_generator = MagicMock()
+        mock_generator.generate_latest_tag = AsyncMock(return_value="<svg>v1.0.2</svg>")
+        mock_generator_class.return_value = mock_generator
+
+        assert _get("/testuser/testrepo/latest_tag").status_code == 200
+        mock_generator.generate_latest_tag.assert_awaited_once_with("testuser", "testrepo", label="version")
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_get_size_not_modified(self, mock_generator_class: MagicMock) -> None:
+        """Test a matching If-None-Match gets 304 from the shared badge cache."""
+        mock_generator = MagicMock()
+        mock_generator.generate_size = AsyncMock(return_value="<svg>10 MB</svg>")
+        mock_generator_class.return_value = mock_generator
+
+        first = _get("/testuser/testrepo/size")
+        assert first.headers["cache-control"] == "no-cache"
+        response = _get("/testuser/testrepo/size", headers={"If-None-Match": first.headers["etag"]})
+        assert response.status_code == 304
+        assert response.content == b""
+        mock_generator.generate_size.assert_awaited_once_with(
+            "testuser", "testrepo", tag="latest", label="image size", platform=""
+        )
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_get_tags_error(self, mock_generator_class: MagicMock) -> None:
+        """Test errors are returned as JSON like the WSGI server."""
+        response = _get("/testuser/testrepo/tags?n=x")
+        assert response.json() == {"exception": "ValueError", "message": "invalid literal for int() with base 10: 'x'"}
+        mock_generator_class.assert_called_once()
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_blocking_backend(self, mock_generator_class: MagicMock) -> None:
+        """Test a slow shared cache backend does not block other requests on the event loop."""
+        mock_generator = MagicMock()
+        mock_generator.generate_size = AsyncMock(return_value="<svg>10 MB</svg>")
+        mock_generator_class.return_value = mock_generator
+        backend = MagicMock()
+        backend.get.side_effect = lambda *_: time.sleep(0.5)
+
+        async def run() -> float:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                started = time.perf_counter()
+                badge = asyncio.create_task(client.get("/testuser/testrepo/size"))
+                await asyncio.sleep(0.05)
+                await client.get("/health")
+                elapsed = time.perf_counter() - started
+                assert (await badge).text == "<svg>10 MB</svg>"
+                return elapsed
+
+        badge_cache.use_backend(backend)
+        try:
+            assert asyncio.run(run()) < 0.25
+        finally:
+            badge_cache.use_backend(None)
+        backend.set.assert_called_once()
+
+    def test_head(self) -> None:
+        """Test HEAD has headers but no body."""
+        response = _get("/health", method="HEAD")
+        assert response.status_code == 200
+        assert response.headers["content-length"] == "2"
+        assert response.content == b""
+
+
+class TestBatchRoute:
+    """Test batch route."""
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_post_batch(self, mock_generator_class: MagicMock) -> None:
+        """Test badges are returned in order, with the same badge rendered once."""
+        mock_generator = MagicMock()
+        mock_generator.generate_latest_tag = AsyncMock(return_value="<svg>v1</svg>")
+        mock_generator.generate_size = AsyncMock(side_effect=ValueError("broken"))
+        mock_generator_class.return_value = mock_generator
+
+        item = {"owner": "user", "package": "repo", "kind": "latest_tag"}
+        response = _get("/batch", method="POST", json=[item, {**item, "kind": "size"}, item])
+        badges = response.json()["badges"]
+        assert [badge.get("svg") for badge in badges] == ["<svg>v1</svg>", None, "<svg>v1</svg>"]
+        assert badges[1]["message"] == "broken"
+        mock_generator.generate_latest_tag.assert_awaited_once()
+
+    @patch("ghcr_badge.asgi.AsyncGHCRBadgeGenerator")
+    def test_post_batch_multipart(self, mock_generator_class: MagicMock) -> None:
+        """Test badges as multipart/mixed parts."""
+        mock_generator = MagicMock()
+        mock_generator.generate_size = AsyncMock(return_value="<svg/>")
+        mock_generator_class.return_value = mock_generator
+
+        response = _get(
+            "/batch",
+            method="POST",
+            json=[{"owner": "user", "package": "repo", "kind": "size"}],
+            headers={"Accept": "multipart/mixed"},
+        )
+        assert response.headers["content-type"].startswith("multipart/mixed; boundary=")
+        assert b"Content-Location: /user/repo/size\r\n" in response.content
+
+    def test_post_batch_invalid(self) -> None:
+        """Test malformed bodies are rejected."""
+        response = _get("/batch", method="POST", json={"owner": "user"})
+        assert response.status_code == 400
+        assert response.json()["exception"] == "ValueError"
+
+    def test_get_batch(self) -> None:
+        """Test batch route accepts POST only."""
+        response = _get("/batch")
+        assert response.status_code == 405
+        assert response.headers["allow"] == "POST"
@@ -0,0 +1,292 @@
+"""Tests for ghcr_badge.async_generate module."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from ghcr_badge.async_generate import AsyncGHCRBadgeGenerator  # noqa: E402
+from ghcr_badge.generate import InvalidImageError, manifest_store, tag_cache  # noqa: E402
+from ghcr_badge.upstream import AsyncUpstreamClient  # noqa: E402
+
+_DIGEST = "sha256:" + "a" * 64
+_INDEX = {
+    "schemaVersion": 2,
+    "mediaType": "application/vnd.oci.image.index.v1+json",
+    "manifests": [{"mediaType": "application/vnd.oci.image.manifest.v1+json", "size": 1, "digest": _DIGEST}],
+}
+_MANIFEST = {
+    "schemaVersion": 2,
+    "mediaType": "application/vnd.oci.image.manifest.v1+json",
+    "config": {"mediaType": "application/vnd.oci.image.config.v1+json", "size": 1024, "digest": "sha256:c"},
+    "layers": [{"mediaType": "application/vnd.oci.image.layer.v1.tar+gzip", "size": 2048, "digest": "sha256:d"}],
+}
+
+
+def _registry(requests: list[str], body: dict[str, Any] | None = None) -> AsyncUpstreamClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await asyncio.sleep(0.01)
+        if body is not None:
+            return httpx.Response(200, json=body)
+        if request.url.path.endswith("/tags/list"):
+            return httpx.Response(200, json={"tags": ["v1.0.0", "v1.1.0", "latest"]})
+        if request.url.path.endswith(f"/manifests/{_DIGEST}"):
+            return httpx.Response(200, content=json.dumps(_MANIFEST).encode())
+        return httpx.Response(200, json=_INDEX)
+
+    return AsyncUpstreamClient(transport=httpx.MockTransport(handler))
+
+
+class TestAsyncGHCRBadgeGenerator:
+    """Test AsyncGHCRBadgeGenerator class."""
+
+    def test_generate_tags(self) -> None:
+        """Test generate_tags fetches and filters tags."""
+        requests: list[str] = []
+        gen = AsyncGHCRBadgeGenerator(client=_registry(requests))
+        result = asyncio.run(gen.generate_tags("user", "repo", n=2))
+        assert "v1.0.0 | v1.1.0" in result
+        assert requests == ["/v2/user/repo/tags/list"]
+        assert tag_cache.peek(("user", "repo")).tags == ("v1.0.0", "v1.1.0", "latest")
+
+    def test_generate_latest_tag_cached(self) -> None:
+        """Test generate_latest_tag reuses the shared tag cache."""
+        requests: list[str] = []
+        gen = AsyncGHCRBadgeGenerator(client=_registry(requests))
+
+        async def run() -> list[str]:
+            return [await gen.generate_latest_tag("user", "repo") for _ in range(3)]
+
+        assert all("v1.1.0" in svg for svg in asyncio.run(run()))
+        assert requests == ["/v2/user/repo/tags/list"]
+
+    def test_generate_tags_invalid(self) -> None:
+        """Test generate_tags with invalid response."""
+        gen = AsyncGHCRBadgeGenerator(client=_registry([], body={"errors": []}))
+        assert "invalid" in asyncio.run(gen.generate_tags("user", "repo"))
+
+    def test_generate_tags_negative_n(self) -> None:
+        """Test generate_tags with negative n value."""
+        gen = AsyncGHCRBadgeGenerator(client=_registry([]))
+        with pytest.raises(ValueError, match="should be positive"):
+            asyncio.run(gen.generate_tags("user", "repo", n=-1))
+
+    def test_generate_size_follows_index(self) -> None:
+        """Test generate_size resolves an index and stores the child by digest."""
+        requests: list[str] = []
+        gen = AsyncGHCRBadgeGenerator(client=_registry(requests))
+        assert "3 KiB" in asyncio.run(gen.generate_size("user", "repo"))
+        assert requests == ["/v2/user/repo/manifests/latest", f"/v2/user/repo/manifests/{_DIGEST}"]
+        assert _DIGEST in manifest_store
+
+    def test_generate_size_platforms_concurrent(self) -> None:
+        """Test child manifests of all platforms are fetched concurrently."""
+        digests = ["sha256:" + c * 64 for c in "ab"]
+        index = _INDEX | {
+            "manifests": [
+                {"mediaType": "application/vnd.oci.image.manifest.v1+json", "size": 1, "digest": digests[0]}
+                | {"platform": {"os": "linux", "architecture": "amd64"}},
+                {"mediaType": "application/vnd.oci.image.manifest.v1+json", "size": 1, "digest": digests[1]}
+                | {"platform": {"os": "linux", "architecture": "arm64"}},
+            ],
+        }
+        in_flight: list[int] = [0, 0]
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if not request.url.path.endswith("/latest"):
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+                await asyncio.sleep(0.01)
+                in_flight[0] -= 1
+                return httpx.Response(200, json=_MANIFEST)
+            return httpx.Response(200, json=index)
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+        assert "linux/amd64 3 KiB | linux/arm64 3 KiB" in asyncio.run(gen.generate_size("user", "repo", platform="all"))
+        assert in_flight == [0, 2]
+
+    def test_generate_size_platforms_bounded(self) -> None:
+        """Test at most max_manifest_fetches child manifests are fetched at a time."""
+        digests = ["sha256:" + c * 64 for c in "abcde"]
+        index = _INDEX | {
+            "manifests": [
+                {"mediaType": "application/vnd.oci.image.manifest.v1+json", "size": 1, "digest": digest}
+                | {"platform": {"os": "linux", "architecture": f"arch{i}"}}
+                for i, digest in enumerate(digests)
+            ],
+        }
+        in_flight: list[int] = [0, 0]
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if not request.url.path.endswith("/latest"):
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+                await asyncio.sleep(0.01)
+                in_flight[0] -= 1
+                return httpx.Response(200, json=_MANIFEST)
+            return httpx.Response(200, json=index)
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+        with patch.object(AsyncGHCRBadgeGenerator, "max_manifest_fetches", 2):
+            manifests = asyncio.run(gen.get_platform_manifests("user", "repo", platform="all"))
+        assert [name for name, _ in manifests] == [f"linux/arch{i}" for i in range(5)]
+        assert in_flight == [0, 2]
+
+    def test_generate_size_revalidated(self) -> None:
+        """Test a size badge of a mutable tag costs a HEAD request while its digest is the same."""
+        index_digest = "sha256:" + "f" * 64
+        requests: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(f"{request.method} {request.url.path}")
+            if request.url.path.endswith(f"/manifests/{_DIGEST}"):
+                return httpx.Response(200, json=_MANIFEST)
+            return httpx.Response(200, json=_INDEX, headers={"Docker-Content-Digest": index_digest})
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+
+        async def run() -> list[str]:
+            return [await gen.generate_size("user", "repo") for _ in range(2)]
+
+        assert all("3 KiB" in svg for svg in asyncio.run(run()))
+        assert requests == [
+            "GET /v2/user/repo/manifests/latest",
+            f"GET /v2/user/repo/manifests/{_DIGEST}",
+            "HEAD /v2/user/repo/manifests/latest",
+        ]
+
+    def test_generate_size_invalid(self) -> None:
+        """Test generate_size with error response."""
+        gen = AsyncGHCRBadgeGenerator(client=_registry([], body={"errors": []}))
+        assert "invalid" in asyncio.run(gen.generate_size("user", "repo"))
+
+    def test_fetch_tags_coalesced(self) -> None:
+        """Test concurrent tasks share one tag list request."""
+        requests: list[str] = []
+        gen = AsyncGHCRBadgeGenerator(client=_registry(requests))
+
+        async def run() -> list[list[str]]:
+            return await asyncio.gather(*(gen.fetch_tags("user", "repo") for _ in range(5)))
+
+        assert asyncio.run(run()) == [["v1.0.0", "v1.1.0", "latest"]] * 5
+        assert requests == ["/v2/user/repo/tags/list"]
+
+    def test_fetch_tags_paginated(self) -> None:
+        """Test fetch_tags follows Link headers."""
+        requests: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(str(request.url))
+            if request.url.params.get("last") == "b":
+                return httpx.Response(200, json={"tags": ["c"]})
+            link = '</v2/user/repo/tags/list?last=b&n=2>; rel="next"'
+            return httpx.Response(200, json={"tags": ["a", "b"]}, headers={"Link": link})
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+        assert asyncio.run(gen.fetch_tags("user", "repo")) == ["a", "b", "c"]
+        assert requests[1] == "https://ghcr.io/v2/user/repo/tags/list?last=b&n=2"
+
+    def test_generate_tags_truncated(self) -> None:
+        """Test a tag list with more than max_tag_pages pages is an invalid badge and not cached."""
+        requests: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(str(request.url))
+            link = f'</v2/user/repo/tags/list?last={len(requests)}&n=1>; rel="next"'
+            return httpx.Response(200, json={"tags": [str(len(requests))]}, headers={"Link": link})
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+        gen.max_tag_pages = 2
+        assert "invalid" in asyncio.run(gen.generate_latest_tag("user", "repo"))
+        assert len(requests) == 2
+        assert tag_cache.peek(("user", "repo")) is None
+
+    def test_get_tags_incremental_refresh(self) -> None:
+        """Test refreshing a cached tag list fetches only tags after its last one."""
+        queries: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            queries.append(request.url.query.decode())
+            if request.url.params.get("last") == "b":
+                return httpx.Response(200, json={"tags": ["c"]})
+            return httpx.Response(200, json={"tags": ["a", "b"]})
+
+        gen = AsyncGHCRBadgeGenerator(client=AsyncUpstreamClient(transport=httpx.MockTransport(handler)))
+
+        async def run() -> list[list[str]]:
+            return [await gen.get_tags("user", "repo") for _ in range(2)]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            assert asyncio.run(run()) == [["a", "b"], ["a", "b", "c"]]
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert queries == ["n=300", "n=300&last=b"]
+
+    def test_get_tags_semver_after_lexical_refresh(self) -> None:
+        """Test a semver read syncs a tag list a lexical generator refreshed after its last tag."""
+        queries: list[str] = []
+        pushed: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            queries.append(request.url.query.decode())
+            if "last" in request.url.params:
+                return httpx.Response(200, json={"tags": []})
+            return httpx.Response(200, json={"tags": [*pushed, "v1.8.0", "v1.9.0"]})
+
+        client = AsyncUpstreamClient(transport=httpx.MockTransport(handler))
+        lexical, semver = AsyncGHCRBadgeGenerator(client=client), AsyncGHCRBadgeGenerator(client=client, sort="semver")
+
+        async def run() -> list[str]:
+            await semver.get_tags("user", "repo")
+            pushed.append("v1.10.0")
+            tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+            try:
+                await lexical.get_tags("user", "repo")
+            finally:
+                tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+            return await semver.get_tags("user", "repo")
+
+        assert asyncio.run(run())[-1] == "v1.10.0"
+        assert queries == ["n=300", "n=300&last=v1.9.0", "n=300"]
+
+    def test_get_tags_not_modified(self) -> None:
+        """Test refreshing a tag list sends its ETag, and reuses the list on 304."""
+        statuses: list[int] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == '"v1"':
+                statuses.append(304)
+                return httpx.Response(304)
+            statuses.append(200)
+            return httpx.Response(200, json={"tags": ["a", "b"]}, headers={"ETag": '"v1"'})
+
+        client = AsyncUpstreamClient(transport=httpx.MockTransport(handler))
+        gen = AsyncGHCRBadgeGenerator(client=client)
+
+        async def run() -> list[list[str]]:
+            return [await gen.get_tags("user", "repo") for _ in range(3)]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            with patch.object(AsyncGHCRBadgeGenerator, "tag_resync_interval", 0):
+                assert asyncio.run(run()) == [["a", "b"]] * 3
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert statuses == [200, 304, 304]
+        assert client.validators.stats() == {"validators": 1, "conditional": 2, "not_modified": 2}
+
+    def test_invalid_image(self) -> None:
+        """Test invalid package name is rejected before any request."""
+        requests: list[str] = []
+        gen = AsyncGHCRBadgeGenerator(client=_registry(requests))
+        with pytest.raises(InvalidImageError):
+            asyncio.run(gen.get_tags("invalid user!", "repo"))
+        assert requests == []
@@ -0,0 +1,350 @@
+"""Tests for ghcr_badge.backends module."""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from benchmarks.stub_registry import StubRegistry
+from ghcr_badge.backends import Codec, RedisBackend, SQLiteBackend, open_backend
+from ghcr_badge.cache import DigestStore, TTLCache
+from ghcr_badge.generate import BaseBadgeGenerator, GHCRBadgeGenerator, TagList, manifest_store, tag_cache, tag_digests
+from ghcr_badge.routes import badge_cache
+
+_INT_CODEC = Codec(lambda v: str(v).encode(), int)
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    """Minimal stand-in of a Redis server: GET, SET (PX), DEL, SCAN, SELECT."""
+
+    server: _RESPServer
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        while line := self.rfile.readline():
+            args = [self.rfile.read(int(self.rfile.readline()[1:]) + 2)[:-2] for _ in range(int(line[1:]))]
+            self.wfile.write(self.server.execute(args))
+
+
+class _RESPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _RESPHandler)
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands: list[bytes] = []
+        self.connections = 0
+
+    def execute(self, args: list[bytes]) -> bytes:  # noqa: PLR0911
+        command = args[0].upper()
+        self.commands.append(command)
+        if command == b"GET":
+            value, expires_at = self.data.get(args[1], (b"", None))
+            if args[1] not in self.data or (expires_at is not None and expires_at < time.time()):
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires_at = time.time() + int(args[4]) / 1000 if len(args) > 3 else None  # noqa: PLR2004
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(k, None) is not None for k in args[1:])
+        if command == b"SCAN":
+            keys = [k for k in self.data if fnmatch.fnmatchcase(k.decode(), args[3].decode())]
+            return b"*2\r\n$1\r\n0\r\n*%d\r\n%s" % (len(keys), b"".join(b"$%d\r\n%s\r\n" % (len(k), k) for k in keys))
+        if command == b"SELECT":
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+@pytest.fixture
+def resp_server() -> Generator[_RESPServer, None, None]:
+    """Run a local stand-in of a Redis server."""
+    server = _RESPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sqlite_path(tmp_path: Path) -> Path:
+    """Get a path of a new database."""
+    return tmp_path / "cache.sqlite3"
+
+
+class TestSQLiteBackend:
+    """Test SQLiteBackend class."""
+
+    def test_set_get(self, sqlite_path: Path) -> None:
+        """Test entries are shared by backends on the same file."""
+        SQLiteBackend(sqlite_path).set("ns", "k", b"v", 1.0, None)
+        backend = SQLiteBackend(sqlite_path)
+        assert backend.get("ns", "k") == (b"v", 1.0)
+        assert backend.get("other", "k") is None
+
+    def test_expire(self, sqlite_path: Path) -> None:
+        """Test expired entries are not returned."""
+        backend = SQLiteBackend(sqlite_path)
+        backend.set("ns", "k", b"v", 1.0, -1)
+        assert backend.get("ns", "k") is None
+
+    def test_clear(self, sqlite_path: Path) -> None:
+        """Test clear drops only the given namespace."""
+        backend = SQLiteBackend(sqlite_path)
+        backend.set("a", "k", b"1", 1.0, None)
+        backend.set("b", "k", b"2", 1.0, None)
+        backend.clear("a")
+        assert backend.get("a", "k") is None
+        assert backend.get("b", "k") == (b"2", 1.0)
+
+    def test_trim(self, sqlite_path: Path) -> None:
+        """Test the oldest entries beyond maxsize are dropped."""
+        backend = SQLiteBackend(sqlite_path, maxsize=10)
+        for i in range(256):
+            backend.set("ns", str(i), b"v", float(i), None)
+        assert backend.get("ns", "0") is None
+        assert backend.get("ns", "255") == (b"v", 255.0)
+
+    def test_error(self, sqlite_path: Path) -> None:
+        """Test errors are counted instead of raised."""
+        backend = SQLiteBackend(sqlite_path)
+        backend._connect().execute("DROP TABLE entries")  # noqa: SLF001
+        assert backend.get("ns", "k") is None
+        backend.set("ns", "k", b"v", 1.0, None)
+        assert backend.errors == 2
+
+
+class TestRedisBackend:
+    """Test RedisBackend class."""
+
+    def test_set_get(self, resp_server: _RESPServer) -> None:
+        """Test entries round trip with their store time and expiry."""
+        backend = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}/1")
+        backend.set("ns", "k", b"v\nw", 1.5, 60)
+        assert backend.get("ns", "k") == (b"v\nw", 1.5)
+        assert backend.get("ns", "missing") is None
+        assert resp_server.data[b"ghcr-badge:ns:k"][1] is not None
+        assert resp_server.commands[0] == b"SELECT"
+
+    def test_clear(self, resp_server: _RESPServer) -> None:
+        """Test clear drops only the given namespace."""
+        backend = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+        backend.set("a", "k", b"1", 1.0, None)
+        backend.set("b", "k", b"2", 1.0, None)
+        backend.clear("a")
+        assert backend.get("a", "k") is None
+        assert backend.get("b", "k") == (b"2", 1.0)
+
+    def test_unavailable(self, resp_server: _RESPServer) -> None:
+        """Test an unreachable server is a miss."""
+        port = resp_server.server_address[1]
+        resp_server.shutdown()
+        resp_server.server_close()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}", timeout=0.1)
+        assert backend.get("ns", "k") is None
+        backend.set("ns", "k", b"v", 1.0, None)
+        assert backend.errors == 2
+
+    def test_backoff(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test an unreachable server is not tried again until the backoff passes."""
+        connect = Mock(side_effect=ConnectionRefusedError)
+        monkeypatch.setattr(socket, "create_connection", connect)
+        backend = RedisBackend(backoff=60)
+        assert backend.get("ns", "k") is None
+        backend.set("ns", "k", b"v", 1.0, None)
+        assert (connect.call_count, backend.errors) == (1, 2)
+        backend = RedisBackend(backoff=0)
+        backend.get("ns", "k")
+        backend.get("ns", "k")
+        assert connect.call_count == 3
+
+    def test_connection_per_thread(self, resp_server: _RESPServer) -> None:
+        """Test threads have their own connection, reused over calls."""
+        backend = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+        backend.set("ns", "k", b"v", 1.0, None)
+        threads = [threading.Thread(target=backend.get, args=("ns", "k")) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert backend.get("ns", "k") == (b"v", 1.0)
+        assert resp_server.connections == 3
+        assert backend.errors == 0
+
+    def test_invalid_url(self) -> None:
+        """Test a URL of another scheme."""
+        with pytest.raises(ValueError, match="redis://"):
+            RedisBackend("http://localhost")
+
+
+class TestOpenBackend:
+    """Test open_backend function."""
+
+    def test_memory(self) -> None:
+        """Test memory needs no backend."""
+        assert open_backend({}) is None
+
+    def test_sqlite(self, sqlite_path: Path) -> None:
+        """Test sqlite backend options."""
+        backend = open_backend({"CACHE_BACKEND": "sqlite", "CACHE_SQLITE_PATH": str(sqlite_path)})
+        assert isinstance(backend, SQLiteBackend)
+        assert backend.path == str(sqlite_path)
+
+    def test_redis(self) -> None:
+        """Test redis backend options."""
+        backend = open_backend({"CACHE_BACKEND": "redis", "CACHE_REDIS_URL": "redis://:pw@cache:6380/2"})
+        assert isinstance(backend, RedisBackend)
+        assert (backend.host, backend.port, backend.password, backend.db) == ("cache", 6380, "pw", 2)
+
+    def test_unknown(self) -> None:
+        """Test unknown backend."""
+        with pytest.raises(ValueError, match="should be one of"):
+            open_backend({"CACHE_BACKEND": "memcached"})
+
+
+class TestSharedCaches:
+    """Test caches sharing entries through a backend."""
+
+    def test_ttl_cache(self, sqlite_path: Path) -> None:
+        """Test a value loaded by one worker is reused by another."""
+        caches: list[TTLCache[str, int]] = [TTLCache(namespace="ns", codec=_INT_CODEC) for _ in range(2)]
+        for cache in caches:
+            cache.use_backend(SQLiteBackend(sqlite_path))
+        assert caches[0].get("a", Mock(return_value=1)) == 1
+        loader = Mock(return_value=2)
+        assert caches[1].get("a", loader) == 1
+        loader.assert_not_called()
+        assert caches[1].stats() == {"size": 1, "hits": 1, "misses": 0, "stale": 0}
+
+    def test_ttl_cache_fresher_shared(self, sqlite_path: Path) -> None:
+        """Test a stale local value is replaced by a fresher shared one."""
+        now = [0.0]
+        caches: list[TTLCache[str, int]] = [
+            TTLCache(ttl=10, namespace="ns", codec=_INT_CODEC, clock=lambda: now[0]) for _ in range(2)
+        ]
+        for cache in caches:
+            cache.use_backend(SQLiteBackend(sqlite_path))
+        caches[0].set("a", 1)
+        caches[1].set("a", 1)
+        now[0] = 15.0
+        caches[0].set("a", 2)
+        assert caches[1].get("a", Mock(return_value=3)) == 2
+
+    def test_ttl_cache_recall(self, sqlite_path: Path) -> None:
+        """Test recall finds a value stored by another worker, or a newer one than the local stale value."""
+        now = [0.0]
+        caches: list[TTLCache[str, int]] = [
+            TTLCache(ttl=10, namespace="ns", codec=_INT_CODEC, clock=lambda: now[0]) for _ in range(2)
+        ]
+        for cache in caches:
+            cache.use_backend(SQLiteBackend(sqlite_path))
+        caches[0].set("a", 1)
+        assert caches[1].peek("a") is None
+        assert caches[1].recall("a") == 1
+        assert caches[1].peek("a") == 1
+        now[0] = 15.0
+        caches[0].set("a", 2)
+        assert asyncio.run(caches[1].arecall("a")) == 2
+        assert caches[1].recall("b") is None
+
+    def test_tag_digest_shared(
+        self,
+        sqlite_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test a size badge is revalidated with HEAD from a digest stored by another worker."""
+        with StubRegistry(tags=1) as registry:
+            monkeypatch.setattr(BaseBadgeGenerator, "registry_url", registry.url)
+            try:
+                for cache in (tag_digests, manifest_store):
+                    cache.use_backend(SQLiteBackend(sqlite_path))
+                badge = GHCRBadgeGenerator().generate_size("load", "package-0")
+                tag_digests._entries.clear()  # noqa: SLF001
+                manifest_store._entries.clear()  # noqa: SLF001
+                assert GHCRBadgeGenerator().generate_size("load", "package-0") == badge
+            finally:
+                for cache in (tag_digests, manifest_store):
+                    cache.use_backend(None)
+            assert registry.stats()["GET manifests"] == 1
+            assert registry.stats()["HEAD manifests"] == 1
+
+    def test_ttl_cache_corrupt_entry(self, sqlite_path: Path) -> None:
+        """Test an entry which cannot be decoded is a miss."""
+        backend = SQLiteBackend(sqlite_path)
+        backend.set("ns", '"a"', b"not an int", time.time(), None)
+        cache: TTLCache[str, int] = TTLCache(namespace="ns", codec=_INT_CODEC)
+        cache.use_backend(backend)
+        assert cache.get("a", Mock(return_value=1)) == 1
+        assert backend.errors == 1
+
+    def test_ttl_cache_corrupt_redis_entry(self, resp_server: _RESPServer) -> None:
+        """Test a Redis value without a valid store time is a miss."""
+        backend = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+        resp_server.data[b'ghcr-badge:ns:"a"'] = (b"not a time\n1", None)
+        cache: TTLCache[str, int] = TTLCache(namespace="ns", codec=_INT_CODEC)
+        cache.use_backend(backend)
+        assert cache.get("a", Mock(return_value=1)) == 1
+        assert backend.errors == 1
+        assert backend.get("ns", '"a"') == (b"1", cache._entries["a"][1])  # noqa: SLF001
+
+    def test_ttl_cache_without_codec(self, sqlite_path: Path) -> None:
+        """Test a cache without codec cannot use a backend."""
+        with pytest.raises(ValueError, match="no codec"):
+            TTLCache().use_backend(SQLiteBackend(sqlite_path))
+
+    def test_digest_store(self, sqlite_path: Path) -> None:
+        """Test a stored value is read by another worker."""
+        stores: list[DigestStore[int]] = [DigestStore(namespace="ns", codec=_INT_CODEC) for _ in range(2)]
+        for store in stores:
+            store.use_backend(SQLiteBackend(sqlite_path))
+        stores[0].set("sha256:a", 42, weight=2)
+        assert stores[1].get("sha256:a") == 42
+        assert "sha256:a" in stores[1]
+        assert stores[1].get("sha256:b") is None
+
+    def test_async_access(self, sqlite_path: Path) -> None:
+        """Test async reads and writes reach the backend as sync ones do."""
+        cache: TTLCache[str, int] = TTLCache(namespace="ns", codec=_INT_CODEC)
+        store: DigestStore[int] = DigestStore(namespace="ns", codec=_INT_CODEC)
+        cache.use_backend(SQLiteBackend(sqlite_path))
+        store.use_backend(SQLiteBackend(sqlite_path))
+
+        async def run() -> tuple[int, int | None]:
+            await cache.aset("a", 1)
+            await store.aset("sha256:a", 42, weight=2)
+            cache._entries.clear()  # noqa: SLF001
+            store._entries.clear()  # noqa: SLF001
+            return await cache.aget("a", AsyncMock(return_value=2)), await store.aget("sha256:a")
+
+        assert asyncio.run(run()) == (1, 42)
+
+    def test_module_codecs(self, resp_server: _RESPServer) -> None:
+        """Test module-level caches round trip their values."""
+        backend = RedisBackend(f"redis://127.0.0.1:{resp_server.server_address[1]}")
+        try:
+            for cache in (tag_cache, manifest_store, badge_cache):
+                cache.use_backend(backend)
+            tag_cache.set(("user", "repo"), TagList.of(("v1.10.0", "v1.9.0"), 1.0))
+            manifest_store.set("sha256:a", {"layers": []}, weight=1)
+            badge_cache.set(("size",), (b"<svg/>", "etag"))
+            tag_cache._entries.clear()  # noqa: SLF001
+            manifest_store._entries.clear()  # noqa: SLF001
+            badge_cache._entries.clear()  # noqa: SLF001
+            assert tag_cache.get(("user", "repo"), Mock()) == TagList.of(("v1.10.0", "v1.9.0"), 1.0)
+            assert manifest_store.get("sha256:a") == {"layers": []}
+            assert badge_cache.get(("size",), Mock()) == (b"<svg/>", "etag")
+        finally:
+            for cache in (tag_cache, manifest_store, badge_cache):
+                cache.use_backend(None)
@@ -0,0 +1,90 @@
+"""Tests for benchmarks.bench_generate module."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from benchmarks.bench_generate import (
+    _format_seconds,
+    cases,
+    compare,
+    image_manifest,
+    index_manifest,
+    main,
+    parse_manifest,
+    run,
+)
+from ghcr_badge.generate import _MEDIA_TYPE_OCI_IMAGE_INDEX_V1, _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1
+from ghcr_badge.server import app
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _run(**seconds: float) -> dict[str, object]:
+    """Make results of a run."""
+    return {"results": {name: {"seconds": value, "number": 1} for name, value in seconds.items()}}
+
+
+class TestCases:
+    """Test benchmark cases."""
+
+    def test_cases_run(self) -> None:
+        """Test every case runs once, covering each group."""
+        names = []
+        with app.test_request_context():
+            for case in cases():
+                case.func()
+                names.append(case.name)
+        assert len(names) == len(set(names))
+        assert {name.split("/")[0] for name in names} == {"filter", "manifest", "size", "render", "response"}
+        assert "filter/globs/100000" in names
+
+    def test_parse_manifest(self) -> None:
+        """Test images are parsed as themselves and indexes as their platforms, skipping attestations."""
+        image = image_manifest(_MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1, 2)
+        index = index_manifest(_MEDIA_TYPE_OCI_IMAGE_INDEX_V1, _MEDIA_TYPE_OCI_IMAGE_MANIFEST_V1)
+        assert parse_manifest(json.dumps(image).encode(), "all") == image
+        assert [name for name, _ in parse_manifest(json.dumps(index).encode(), "all")] == [  # type: ignore[union-attr]
+            "linux/amd64",
+            "linux/arm64/v8",
+            "linux/arm/v7",
+        ]
+
+    def test_run_keyword(self) -> None:
+        """Test only cases containing the keyword are run."""
+        data = run("size/sum/8_", repeat=1)
+        assert list(data["results"]) == ["size/sum/8_layers"]
+        assert data["results"]["size/sum/8_layers"]["seconds"] > 0
+
+
+class TestCompare:
+    """Test comparison of runs."""
+
+    def test_compare(self) -> None:
+        """Test slowdowns over the threshold are regressions and cases of one run are missing."""
+        baseline = _run(a=1.0, b=1.0, c=1.0, d=1.0)
+        current = _run(a=1.05, b=1.2, c=0.5, e=1.0)
+        assert list(compare(baseline, current, 0.1)) == [
+            ("a", 1.0, 1.05, "unchanged"),
+            ("b", 1.0, 1.2, "regression"),
+            ("c", 1.0, 0.5, "improvement"),
+            ("d", 1.0, None, "missing"),
+            ("e", None, 1.0, "missing"),
+        ]
+
+    def test_main_exit_status(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test `compare` exits with 1 on regression."""
+        baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+        baseline.write_text(json.dumps(_run(a=1e-6)))
+        current.write_text(json.dumps(_run(a=2e-6)))
+        assert main(["compare", str(baseline), str(current)]) == 1
+        assert "a" in capsys.readouterr().out
+        assert main(["compare", str(baseline), str(baseline)]) == 0
+
+    def test_format_seconds(self) -> None:
+        """Test seconds are shown in a readable unit."""
+        assert [_format_seconds(s) for s in (None, 2.0, 2e-3, 2e-6, 2e-9)] == ["-", "2.00s", "2.00ms", "2.00us", "2ns"]
@@ -0,0 +1,250 @@
+"""Tests for ghcr_badge.cache module."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+from unittest.mock import Mock
+
+import pytest
+
+from ghcr_badge import ratelimit
+from ghcr_badge.cache import DigestStore, TTLCache
+
+if TYPE_CHECKING:
+    from conftest import Clock
+
+
+class TestTTLCache:
+    """Test TTLCache class."""
+
+    def test_get_miss_then_hit(self) -> None:
+        """Test a loaded value is reused while fresh."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10)
+        loader = Mock(return_value=1)
+        assert cache.get("a", loader) == 1
+        assert cache.get("a", loader) == 1
+        loader.assert_called_once()
+        assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "stale": 0}
+
+    def test_get_loader_error_not_cached(self) -> None:
+        """Test exceptions from loader propagate and are not cached."""
+        cache: TTLCache[str, int] = TTLCache()
+        with pytest.raises(KeyError):
+            cache.get("a", Mock(side_effect=KeyError))
+        assert cache.peek("a") is None
+        assert cache.get("a", Mock(return_value=2)) == 2
+
+    def test_lru_eviction(self) -> None:
+        """Test least recently used entry is evicted."""
+        cache: TTLCache[str, int] = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a", Mock())
+        cache.set("c", 3)
+        assert cache.peek("a") == 1
+        assert cache.peek("b") is None
+        assert cache.peek("c") == 3
+        assert len(cache) == 2
+
+    def test_configure_shrinks(self) -> None:
+        """Test configure evicts entries beyond the new bound."""
+        cache: TTLCache[str, int] = TTLCache()
+        for i in range(5):
+            cache.set(str(i), i)
+        cache.configure(maxsize=2, ttl=1, stale_ttl=1)
+        assert len(cache) == 2
+        assert cache.ttl == 1
+
+    def test_configure_negative(self) -> None:
+        """Test configure rejects negative bounds."""
+        cache: TTLCache[str, int] = TTLCache()
+        with pytest.raises(ValueError, match="should be positive"):
+            cache.configure(maxsize=-1, ttl=1, stale_ttl=1)
+
+    def test_stale_while_revalidate(self, clock: Clock) -> None:
+        """Test an expired entry is served while one background refresh runs."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+        cache.set("a", 1)
+        clock.now = 20
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_loader() -> int:
+            started.set()
+            release.wait(5)
+            return 2
+
+        loader = Mock(side_effect=slow_loader)
+        assert cache.get("a", loader) == 1
+        assert started.wait(5)
+        assert cache.get("a", loader) == 1
+        release.set()
+        for _ in range(500):
+            if cache.peek("a") == 2:
+                break
+            threading.Event().wait(0.01)
+        assert cache.peek("a") == 2
+        loader.assert_called_once()
+        assert cache.stats()["stale"] == 2
+
+    def test_stale_refresh_error_keeps_value(self, clock: Clock) -> None:
+        """Test a failing background refresh keeps serving the stale value."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+        cache.set("a", 1)
+        clock.now = 20
+        done = threading.Event()
+
+        def failing_loader() -> int:
+            done.set()
+            raise RuntimeError
+
+        assert cache.get("a", failing_loader) == 1
+        assert done.wait(5)
+        assert cache.peek("a") == 1
+
+    def test_too_stale_reloads(self, clock: Clock) -> None:
+        """Test an entry older than ttl + stale_ttl is reloaded synchronously."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=10, clock=clock)
+        cache.set("a", 1)
+        clock.now = 30
+        assert cache.get("a", Mock(return_value=2)) == 2
+
+    def test_fallback_serves_expired(self, clock: Clock) -> None:
+        """Test an expired entry is returned if loading raises a fallback exception."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=0, clock=clock, fallback=(TimeoutError,))
+        cache.set("a", 1)
+        clock.now = 30
+        assert cache.get("a", Mock(side_effect=TimeoutError)) == 1
+        with pytest.raises(TimeoutError):
+            cache.get("b", Mock(side_effect=TimeoutError))
+        with pytest.raises(KeyError):
+            cache.get("a", Mock(side_effect=KeyError))
+
+    def test_refresh_in_background(self, clock: Clock) -> None:
+        """Test background refreshes send upstream requests at low priority."""
+        cache: TTLCache[str, bool] = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+        cache.set("a", False)  # noqa: FBT003
+        clock.now = 20
+
+        def loader() -> bool:
+            return ratelimit._background.get()  # noqa: SLF001
+
+        cache.get("a", loader)
+        for _ in range(500):
+            if cache.peek("a"):
+                break
+            threading.Event().wait(0.01)
+        assert cache.peek("a") is True
+        assert ratelimit._background.get() is False  # noqa: SLF001
+
+    def test_clear(self) -> None:
+        """Test clear drops entries and statistics."""
+        cache: TTLCache[str, int] = TTLCache()
+        cache.get("a", Mock(return_value=1))
+        cache.clear()
+        assert cache.stats() == {"size": 0, "hits": 0, "misses": 0, "stale": 0}
+
+
+class TestDigestStore:
+    """Test DigestStore class."""
+
+    def test_get_set(self) -> None:
+        """Test stored values are returned and counted."""
+        store: DigestStore[int] = DigestStore()
+        assert store.get("sha256:a") is None
+        store.set("sha256:a", 1, weight=10)
+        assert store.get("sha256:a") == 1
+        assert "sha256:a" in store
+        assert store.weight == 10
+        assert store.stats() == {"size": 1, "hits": 1, "misses": 1, "stale": 0}
+
+    def test_evict_by_size(self) -> None:
+        """Test least recently used entry is evicted beyond maxsize."""
+        store: DigestStore[int] = DigestStore(maxsize=2)
+        store.set("sha256:a", 1, weight=1)
+        store.set("sha256:b", 2, weight=1)
+        store.get("sha256:a")
+        store.set("sha256:c", 3, weight=1)
+        assert "sha256:a" in store
+        assert "sha256:b" not in store
+        assert store.weight == 2
+
+    def test_evict_by_weight(self) -> None:
+        """Test entries are evicted beyond maxweight."""
+        store: DigestStore[int] = DigestStore(maxweight=100)
+        store.set("sha256:a", 1, weight=60)
+        store.set("sha256:b", 2, weight=60)
+        assert "sha256:a" not in store
+        assert store.weight == 60
+
+    def test_set_replaces_weight(self) -> None:
+        """Test storing the same digest again does not double its weight."""
+        store: DigestStore[int] = DigestStore()
+        store.set("sha256:a", 1, weight=60)
+        store.set("sha256:a", 1, weight=60)
+        assert store.weight == 60
+        assert len(store) == 1
+
+    def test_configure_negative(self) -> None:
+        """Test configure rejects negative bounds."""
+        store: DigestStore[int] = DigestStore()
+        with pytest.raises(ValueError, match="should be positive"):
+            store.configure(maxsize=1, maxweight=-1)
+
+    def test_clear(self) -> None:
+        """Test clear drops entries and weight."""
+        store: DigestStore[int] = DigestStore()
+        store.set("sha256:a", 1, weight=60)
+        store.clear()
+        assert len(store) == 0
+        assert store.weight == 0
+
+
+class TestTTLCacheAsync:
+    """Test TTLCache.aget."""
+
+    def test_aget_miss_then_hit(self) -> None:
+        """Test an awaited value is reused while fresh."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10)
+        calls = []
+
+        async def loader() -> int:
+            calls.append(1)
+            return 1
+
+        async def run() -> list[int]:
+            return [await cache.aget("a", loader) for _ in range(2)]
+
+        assert asyncio.run(run()) == [1, 1]
+        assert len(calls) == 1
+
+    def test_aget_stale_while_revalidate(self, clock: Clock) -> None:
+        """Test an expired entry is served while a task refreshes it."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+        cache.set("a", 1)
+        clock.now = 20
+
+        async def loader() -> int:
+            return 2
+
+        async def run() -> int:
+            value = await cache.aget("a", loader)
+            await asyncio.sleep(0.01)
+            return value
+
+        assert asyncio.run(run()) == 1
+        assert cache.peek("a") == 2
+
+    def test_aget_fallback_serves_expired(self, clock: Clock) -> None:
+        """Test an expired entry is returned if the awaited loader raises a fallback exception."""
+        cache: TTLCache[str, int] = TTLCache(ttl=10, stale_ttl=0, clock=clock, fallback=(TimeoutError,))
+        cache.set("a", 1)
+        clock.now = 30
+
+        async def loader() -> int:
+            raise TimeoutError
+
+        assert asyncio.run(cache.aget("a", loader)) == 1
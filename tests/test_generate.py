@@ -2,19 +2,30 @@
 
 from __future__ import annotations
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
 from ghcr_badge.generate import (
+    BaseBadgeGenerator,
     GHCRBadgeGenerator,
     InvalidImageError,
     InvalidManifestError,
     InvalidMediaTypeError,
     InvalidTagError,
     InvalidTagListError,
+    TagList,
+    TagListTruncatedError,
+    manifest_store,
+    revalidations,
+    single_flight,
+    tag_cache,
+    tag_digests,
 )
+from ghcr_badge.tracing import start_trace
 
 if TYPE_CHECKING:
     from ghcr_badge.dicts import ManifestV2, OCIImageManifestV1
@@ -127,10 +138,10 @@ class TestGHCRBadgeGenerator:
         result = gen.generate_size("user", "repo")
         assert "invalid" in result
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_manifest_v2(self, mock_get: MagicMock) -> None:
         """Test get_manifest with ManifestV2 response."""
-        mock_response = Mock()
+        mock_response = Mock(headers={}, content=b"{}")
         mock_manifest: ManifestV2 = {
             "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
             "schemaVersion": 2,
@@ -154,10 +165,10 @@ class TestGHCRBadgeGenerator:
         result = gen.get_manifest("user", "repo", tag="v1.0.0")
         assert result == mock_manifest
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_oci_image_manifest_v1(self, mock_get: MagicMock) -> None:
         """Test get_manifest with OCIImageManifestV1 response."""
-        mock_response = Mock()
+        mock_response = Mock(headers={}, content=b"{}")
         mock_manifest: OCIImageManifestV1 = {
             "schemaVersion": 2,
             "mediaType": "application/vnd.oci.image.manifest.v1+json",
@@ -178,14 +189,201 @@ class TestGHCRBadgeGenerator:
         result = gen.get_manifest("user", "repo", tag="v1.0.0")
         assert result == mock_manifest
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_manifest_index_child_stored(self, mock_get: MagicMock) -> None:
+        """Test the child manifest of an index is fetched by digest only once."""
+        digest = "sha256:" + "a" * 64
+        index_response = Mock(headers={}, content=b"{}")
+        index_response.json.return_value = {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.index.v1+json",
+            "manifests": [{"mediaType": "application/vnd.oci.image.manifest.v1+json", "size": 1, "digest": digest}],
+        }
+        child_manifest = {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.manifest.v1+json",
+            "config": {"mediaType": "application/vnd.oci.image.config.v1+json", "size": 1000, "digest": "sha256:c"},
+            "layers": [],
+        }
+        child_response = Mock(headers={}, content=b"0123456789")
+        child_response.json.return_value = child_manifest
+        mock_get.side_effect = [index_response, child_response, index_response]
+
+        gen = GHCRBadgeGenerator()
+        assert gen.get_manifest("user", "repo", tag="latest") == child_manifest
+        assert gen.get_manifest("user", "repo", tag="latest") == child_manifest
+        assert gen.get_manifest("user", "repo", tag=digest) == child_manifest
+        urls = [c.args[0] for c in mock_get.call_args_list]
+        assert urls == [
+            "https://ghcr.io/v2/user/repo/manifests/latest",
+            f"https://ghcr.io/v2/user/repo/manifests/{digest}",
+            "https://ghcr.io/v2/user/repo/manifests/latest",
+        ]
+        assert manifest_store.weight == 10
+
+    @staticmethod
+    def _multi_arch_registry(barrier: threading.Barrier | None = None) -> Mock:
+        """Mock a registry of an index of three platforms and an attestation."""
+        platforms = {"a": ("linux", "amd64", ""), "b": ("linux", "arm64", "v8"), "c": ("linux", "arm", "v7")}
+        platforms["d"] = ("unknown", "unknown", "")
+        manifests = []
+        for char, (os, arch, variant) in platforms.items():
+            platform = {"os": os, "architecture": arch} | ({"variant": variant} if variant else {})
+            manifests.append(
+                {
+                    "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                    "size": 1,
+                    "digest": "sha256:" + char * 64,
+                    "platform": platform,
+                },
+            )
+        sizes = {"a": 3 * 1024, "b": 2 * 1024, "c": 1024, "d": 1}
+
+        def get(url: str, **_: object) -> Mock:
+            ref = url.rsplit("/", 1)[1]
+            if not ref.startswith("sha256:"):
+                body = {"schemaVersion": 2, "mediaType": "application/vnd.oci.image.index.v1+json"}
+                return Mock(headers={}, content=b"{}", json=Mock(return_value=body | {"manifests": manifests}))
+            if barrier is not None:
+                barrier.wait()
+            body = {
+                "schemaVersion": 2,
+                "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                "config": {"mediaType": "application/vnd.oci.image.config.v1+json", "size": 0, "digest": "sha256:c"},
+                "layers": [{"mediaType": "application/vnd.oci.image.layer.v1.tar+gzip", "size": sizes[ref[7]]}],
+            }
+            return Mock(headers={}, content=b"{}", json=Mock(return_value=body))
+
+        return Mock(side_effect=get)
+
+    @pytest.mark.parametrize(
+        ("platform", "value"),
+        [
+            ("", "3 KiB"),
+            ("linux/arm64", "2 KiB"),
+            ("linux/arm/v7", "1 KiB"),
+            ("min", "1 KiB"),
+            ("max", "3 KiB"),
+            ("all", "linux/amd64 3 KiB | linux/arm64/v8 2 KiB | linux/arm/v7 1 KiB"),
+        ],
+    )
+    def test_generate_size_platform(self, platform: str, value: str) -> None:
+        """Test a platform is picked from an index, or sizes of platforms are aggregated without attestations."""
+        with patch("ghcr_badge.upstream.UpstreamClient.get", self._multi_arch_registry()):
+            assert f">{value}<" in GHCRBadgeGenerator().generate_size("user", "repo", platform=platform)
+
+    def test_generate_size_platform_concurrent(self) -> None:
+        """Test child manifests are fetched concurrently, and stored by digest."""
+        mock_get = self._multi_arch_registry(threading.Barrier(3, timeout=5))
+        with patch("ghcr_badge.upstream.UpstreamClient.get", mock_get):
+            GHCRBadgeGenerator().generate_size("user", "repo", platform="all")
+        assert mock_get.call_count == 4
+        assert "sha256:" + "b" * 64 in manifest_store
+
+    @pytest.mark.parametrize(
+        ("platform", "children"),
+        [("", 1), ("all", 3)],
+    )
+    def test_generate_size_spans(self, platform: str, children: int) -> None:
+        """Test phases are traced, including index to child hops fetched by other threads."""
+        with (
+            patch("ghcr_badge.upstream.UpstreamClient.get", self._multi_arch_registry()),
+            start_trace() as trace,
+        ):
+            GHCRBadgeGenerator().generate_size("user", "repo", platform=platform)
+        names = sorted(span.name for span in trace.spans)
+        assert names == ["auth", "manifest", *["manifest_child"] * children, "render"]
+
+    def test_generate_size_platform_missing(self) -> None:
+        """Test a platform not in the index."""
+        with patch("ghcr_badge.upstream.UpstreamClient.get", self._multi_arch_registry()):
+            assert "invalid" in GHCRBadgeGenerator().generate_size("user", "repo", platform="windows/amd64")
+
+    def test_generate_size_platform_invalid(self) -> None:
+        """Test a malformed platform."""
+        with pytest.raises(ValueError, match="os/architecture"):
+            GHCRBadgeGenerator().generate_size("user", "repo", platform="amd64")
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_platform_manifests_single(self, mock_get: MagicMock) -> None:
+        """Test an image which is not multi-arch has one unnamed platform."""
+        manifest = {
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "schemaVersion": 2,
+            "config": {"mediaType": "application/vnd.docker.container.image.v1+json", "size": 1, "digest": "sha256:c"},
+            "layers": [],
+        }
+        mock_get.return_value = Mock(headers={}, content=b"{}", json=Mock(return_value=manifest))
+        assert GHCRBadgeGenerator().get_platform_manifests("user", "repo", platform="all") == [("", manifest)]
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_manifest_stored_by_content_digest(self, mock_get: MagicMock) -> None:
+        """Test a manifest fetched by tag is stored under its Docker-Content-Digest."""
+        digest = "sha256:" + "b" * 64
+        mock_manifest = {
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "schemaVersion": 2,
+            "config": {"mediaType": "application/vnd.docker.container.image.v1+json", "size": 1, "digest": "sha256:c"},
+            "layers": [],
+        }
+        mock_response = Mock(headers={"Docker-Content-Digest": digest}, content=b"{}")
+        mock_response.json.return_value = mock_manifest
+        mock_get.return_value = mock_response
+
+        gen = GHCRBadgeGenerator()
+        gen.get_manifest("user", "repo", tag="v1.0.0")
+        assert gen.get_manifest("user", "repo", tag=digest) == mock_manifest
+        mock_get.assert_called_once()
+
+    @pytest.mark.parametrize(
+        ("head_digest", "outcome", "gets"),
+        [("sha256:" + "b" * 64, "unchanged", 1), ("sha256:" + "e" * 64, "changed", 2), (None, "fallback", 2)],
+    )
+    def test_get_manifest_revalidated(self, head_digest: str | None, outcome: str, gets: int) -> None:
+        """Test a known manifest of a mutable tag is reused while HEAD tells the same digest."""
+        digest = "sha256:" + "b" * 64
+        manifest = {
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "schemaVersion": 2,
+            "config": {"mediaType": "application/vnd.docker.container.image.v1+json", "size": 1, "digest": "sha256:c"},
+            "layers": [],
+        }
+        response = Mock(headers={"Docker-Content-Digest": digest}, content=b"{}", json=Mock(return_value=manifest))
+        head_headers = {} if head_digest is None else {"Docker-Content-Digest": head_digest}
+        before = revalidations.stats()
+        with (
+            patch("ghcr_badge.upstream.UpstreamClient.get", return_value=response) as mock_get,
+            patch("ghcr_badge.upstream.UpstreamClient.head", return_value=Mock(ok=True, headers=head_headers)),
+        ):
+            gen = GHCRBadgeGenerator()
+            assert gen.get_manifest("user", "repo") == manifest
+            assert gen.get_manifest("user", "repo") == manifest
+        assert mock_get.call_count == gets
+        assert tag_digests.peek(("user", "repo", "latest")) == digest
+        after = revalidations.stats()
+        assert {k: after[k] - before[k] for k in after} == {k: int(k == outcome) for k in after}  # type: ignore[literal-required]
+
+    @patch("ghcr_badge.upstream.UpstreamClient.head")
+    def test_fetch_digest(self, mock_head: MagicMock) -> None:
+        """Test fetch_digest reads Docker-Content-Digest of a HEAD response."""
+        mock_head.return_value = Mock(ok=True, headers={"Docker-Content-Digest": "sha256:a"})
+        gen = GHCRBadgeGenerator()
+        assert gen.fetch_digest("user", "repo", tag="v1") == "sha256:a"
+        assert mock_head.call_args[0][0] == "https://ghcr.io/v2/user/repo/manifests/v1"
+
+        mock_head.return_value = Mock(ok=True, headers={})
+        assert gen.fetch_digest("user", "repo") is None
+        mock_head.return_value = Mock(ok=False, headers={"Docker-Content-Digest": "sha256:a"})
+        assert gen.fetch_digest("user", "repo") is None
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_invalid_tag(self, mock_get: MagicMock) -> None:
         """Test get_manifest with invalid tag."""
         gen = GHCRBadgeGenerator()
         with pytest.raises(InvalidTagError):
             gen.get_manifest("user", "repo", tag="invalid tag with spaces")
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_empty_manifest(self, mock_get: MagicMock) -> None:
         """Test get_manifest with empty manifest."""
         mock_response = Mock()
@@ -196,7 +394,7 @@ class TestGHCRBadgeGenerator:
         with pytest.raises(InvalidManifestError, match="manifest is empty"):
             gen.get_manifest("user", "repo")
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_with_errors(self, mock_get: MagicMock) -> None:
         """Test get_manifest with errors in response."""
         mock_response = Mock()
@@ -207,10 +405,10 @@ class TestGHCRBadgeGenerator:
         with pytest.raises(InvalidManifestError, match="manifest contains some error"):
             gen.get_manifest("user", "repo")
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_manifest_invalid_media_type(self, mock_get: MagicMock) -> None:
         """Test get_manifest with invalid media type."""
-        mock_response = Mock()
+        mock_response = Mock(headers={}, content=b"{}")
         mock_response.json.return_value = {"mediaType": "application/vnd.invalid.type", "schemaVersion": 2}
         mock_get.return_value = mock_response
 
@@ -218,10 +416,10 @@ class TestGHCRBadgeGenerator:
         with pytest.raises(InvalidMediaTypeError):
             gen.get_manifest("user", "repo")
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_tags_success(self, mock_get: MagicMock) -> None:
         """Test get_tags with successful response."""
-        mock_response = Mock()
+        mock_response = Mock(headers={})
         mock_response.json.return_value = {"tags": ["v1.0.0", "v1.0.1", "latest"]}
         mock_get.return_value = mock_response
 
@@ -229,10 +427,10 @@ class TestGHCRBadgeGenerator:
         result = gen.get_tags("user", "repo")
         assert result == ["v1.0.0", "v1.0.1", "latest"]
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_get_tags_empty(self, mock_get: MagicMock) -> None:
         """Test get_tags with empty response."""
-        mock_response = Mock()
+        mock_response = Mock(headers={})
         mock_response.json.return_value = {"tags": []}
         mock_get.return_value = mock_response
 
@@ -240,6 +438,257 @@ class TestGHCRBadgeGenerator:
         with pytest.raises(InvalidTagListError):
             gen.get_tags("user", "repo")
 
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_tags_cached(self, mock_get: MagicMock) -> None:
+        """Test get_tags reuses a cached tag list."""
+        mock_response = Mock(headers={})
+        mock_response.json.return_value = {"tags": ["v1.0.0", "v1.0.1"]}
+        mock_get.return_value = mock_response
+
+        assert GHCRBadgeGenerator().get_tags("user", "repo") == ["v1.0.0", "v1.0.1"]
+        assert GHCRBadgeGenerator().get_tags("user", "repo") == ["v1.0.0", "v1.0.1"]
+        mock_get.assert_called_once()
+        assert tag_cache.peek(("user", "repo")).tags == ("v1.0.0", "v1.0.1")
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_tags_incremental_refresh(self, mock_get: MagicMock) -> None:
+        """Test refreshing a cached tag list fetches only tags after its last one."""
+        full = Mock(headers={})
+        full.json.return_value = {"tags": ["a", "b"]}
+        delta = Mock(headers={})
+        delta.json.return_value = {"tags": ["c"]}
+        mock_get.side_effect = [full, delta]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["a", "b"]
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["a", "b", "c"]
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert "last" not in mock_get.call_args_list[0].kwargs["params"]
+        assert mock_get.call_args_list[1].kwargs["params"]["last"] == "b"
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_tags_semver_refresh(self, mock_get: MagicMock) -> None:
+        """Test a semver refresh fetches the whole list, as a new version may sort before the last tag."""
+        first = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["v1.8.0", "v1.9.0"]}))
+        second = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["v1.10.0", "v1.8.0", "v1.9.0"]}))
+        mock_get.side_effect = [first, second]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            assert "v1.9.0" in GHCRBadgeGenerator(sort="semver").generate_latest_tag("user", "repo")
+            assert "v1.10.0" in GHCRBadgeGenerator(sort="semver").generate_latest_tag("user", "repo")
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert "last" not in mock_get.call_args_list[1].kwargs["params"]
+        assert mock_get.call_args_list[1].kwargs["conditional"] is True
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_tags_semver_after_lexical_refresh(self, mock_get: MagicMock) -> None:
+        """Test a semver read syncs a tag list a lexical generator refreshed after its last tag."""
+        first = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["v1.8.0", "v1.9.0"]}))
+        after = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": []}))
+        whole = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["v1.10.0", "v1.8.0", "v1.9.0"]}))
+        mock_get.side_effect = [first, after, whole]
+
+        assert "v1.9.0" in GHCRBadgeGenerator(sort="semver").generate_latest_tag("user", "repo")
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["v1.8.0", "v1.9.0"]
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert tag_cache.peek(("user", "repo")).partial  # type: ignore[union-attr]
+        assert "v1.10.0" in GHCRBadgeGenerator(sort="semver").generate_latest_tag("user", "repo")
+        assert GHCRBadgeGenerator(sort="semver").get_tags("user", "repo")[-1] == "v1.10.0"
+        assert [c.kwargs["params"].get("last") for c in mock_get.call_args_list] == [None, "v1.9.0", None]
+        assert not tag_cache.peek(("user", "repo")).partial  # type: ignore[union-attr]
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    @patch.object(BaseBadgeGenerator, "tag_resync_interval", 0)
+    def test_get_tags_not_modified(self, mock_get: MagicMock) -> None:
+        """Test a tag list answered 304 is reused and synced again."""
+        full = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["a", "b"]}))
+        mock_get.side_effect = [full, Mock(status_code=304, headers={})]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["a", "b"]
+            synced_at = tag_cache.peek(("user", "repo")).synced_at
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["a", "b"]
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert [c.kwargs["conditional"] for c in mock_get.call_args_list] == [True, True]
+        assert tag_cache.peek(("user", "repo")).synced_at >= synced_at
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    @patch.object(BaseBadgeGenerator, "tag_resync_interval", 0)
+    def test_get_tags_multi_page_unconditional(self, mock_get: MagicMock) -> None:
+        """Test a tag list of more pages than one is not requested conditionally."""
+        tags = [f"v{i}" for i in range(300)]
+        mock_get.return_value = Mock(status_code=200, headers={}, json=Mock(return_value={"tags": tags}))
+        tag_cache.set(("user", "repo"), TagList.of(tuple(tags), 0))
+        GHCRBadgeGenerator().load_tags("user", "repo")
+        assert mock_get.call_args.kwargs["conditional"] is False
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_load_tags_not_modified_uncached(self, mock_get: MagicMock) -> None:
+        """Test a 304 without a cached tag list to reuse fetches the list again."""
+        mock_get.side_effect = [
+            Mock(status_code=304, headers={}),
+            Mock(status_code=200, headers={}, json=Mock(return_value={"tags": ["a"]})),
+        ]
+        assert GHCRBadgeGenerator().load_tags("user", "repo").tags == ("a",)
+        assert [c.kwargs["conditional"] for c in mock_get.call_args_list] == [True, False]
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    @patch.object(BaseBadgeGenerator, "tag_resync_interval", 0)
+    def test_get_tags_resync(self, mock_get: MagicMock) -> None:
+        """Test a tag list older than tag_resync_interval is fetched whole."""
+        first = Mock(headers={})
+        first.json.return_value = {"tags": ["v1.9.0"]}
+        second = Mock(headers={})
+        second.json.return_value = {"tags": ["v1.10.0", "v1.9.0"]}
+        mock_get.side_effect = [first, second]
+
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        try:
+            GHCRBadgeGenerator().get_tags("user", "repo")
+            assert GHCRBadgeGenerator().get_tags("user", "repo") == ["v1.10.0", "v1.9.0"]
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert "last" not in mock_get.call_args_list[1].kwargs["params"]
+
+    def test_merge_tags(self) -> None:
+        """Test merge_tags appends new tags, keeps the time of the whole fetch and marks the list partial."""
+        cached = TagList.of(("a", "b"), 1.0)
+        merged = TagList.of(("a", "b", "c"), 1.0, partial=True)
+        assert GHCRBadgeGenerator.merge_tags(cached, ["b", "c"], "b", 2.0) == merged
+        assert GHCRBadgeGenerator.merge_tags(cached, [], "b", 2.0) == cached._replace(partial=True)
+        assert GHCRBadgeGenerator.merge_tags(cached, ["x"], None, 2.0) == TagList.of(("x",), 2.0)
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_get_tags_semver(self, mock_get: MagicMock) -> None:
+        """Test get_tags orders tags by version with sort=semver, reusing the cached index."""
+        mock_response = Mock(headers={})
+        mock_response.json.return_value = {"tags": ["latest", "v1.10.0", "v1.9.0", "v2.0.0-rc.1"]}
+        mock_get.return_value = mock_response
+
+        assert GHCRBadgeGenerator().get_tags("user", "repo") == ["latest", "v1.10.0", "v1.9.0", "v2.0.0-rc.1"]
+        gen = GHCRBadgeGenerator(sort="semver")
+        assert gen.get_tags("user", "repo") == ["latest", "v1.9.0", "v1.10.0", "v2.0.0-rc.1"]
+        assert gen.generate_latest_tag("user", "repo").count("v2.0.0-rc.1") > 0
+        mock_get.assert_called_once()
+
+    def test_init_invalid_sort(self) -> None:
+        """Test initialization with unknown sort."""
+        with pytest.raises(ValueError, match="should be one of"):
+            GHCRBadgeGenerator(sort="random")
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_fetch_tags_coalesced(self, mock_get: MagicMock) -> None:
+        """Test concurrent fetches of the same tag list send one request."""
+        release = threading.Event()
+
+        def slow_get(*_: object, **__: object) -> Mock:
+            release.wait(5)
+            mock_response = Mock(headers={})
+            mock_response.json.return_value = {"tags": ["v1.0.0"]}
+            return mock_response
+
+        mock_get.side_effect = slow_get
+        shared = single_flight.stats()["shared"]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(GHCRBadgeGenerator().fetch_tags, "user", "repo") for _ in range(4)]
+            for _ in range(500):
+                if single_flight.stats()["shared"] - shared >= 3:
+                    break
+                threading.Event().wait(0.01)
+            release.set()
+            assert [f.result() for f in futures] == [["v1.0.0"]] * 4
+        mock_get.assert_called_once()
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_fetch_tags_paginated(self, mock_get: MagicMock) -> None:
+        """Test fetch_tags follows Link headers to the last page."""
+        first = Mock(headers={"Link": '</v2/user/repo/tags/list?last=b&n=2>; rel="next"'})
+        first.json.return_value = {"tags": ["a", "b"]}
+        second = Mock(headers={})
+        second.json.return_value = {"tags": ["c"]}
+        mock_get.side_effect = [first, second]
+
+        assert GHCRBadgeGenerator().fetch_tags("user", "repo") == ["a", "b", "c"]
+        assert mock_get.call_args_list[1].args == ("https://ghcr.io/v2/user/repo/tags/list?last=b&n=2",)
+        assert mock_get.call_args_list[1].kwargs["params"] is None
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_iter_tags_lazy(self, mock_get: MagicMock) -> None:
+        """Test iter_tags fetches no more pages than the caller consumes."""
+        page = Mock(headers={"Link": '</v2/user/repo/tags/list?last=b&n=2>; rel="next"'})
+        page.json.return_value = {"tags": ["a", "b"]}
+        mock_get.return_value = page
+
+        tags = GHCRBadgeGenerator().iter_tags("user", "repo")
+        assert [next(tags), next(tags)] == ["a", "b"]
+        mock_get.assert_called_once()
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_iter_tags_max_pages(self, mock_get: MagicMock) -> None:
+        """Test iter_tags raises after max_tag_pages pages rather than returning a truncated list."""
+        pages = []
+        for i in range(5):
+            page = Mock(headers={"Link": f'</v2/user/repo/tags/list?last={i}&n=1>; rel="next"'})
+            page.json.return_value = {"tags": [str(i)]}
+            pages.append(page)
+        mock_get.side_effect = pages
+
+        gen = GHCRBadgeGenerator()
+        gen.max_tag_pages = 3
+        tags = gen.iter_tags("user", "repo")
+        assert [next(tags) for _ in range(3)] == ["0", "1", "2"]
+        with pytest.raises(TagListTruncatedError, match="more than 3 pages"):
+            next(tags)
+        assert mock_get.call_count == 3
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_iter_tags_hourly_builds(self, mock_get: MagicMock) -> None:
+        """Test the default limit reads a tag list of several years of hourly builds whole."""
+        pages = []
+        for i in range(150):
+            page = Mock(headers={"Link": f'</v2/user/repo/tags/list?last={i}&n=300>; rel="next"'} if i < 149 else {})
+            page.json.return_value = {"tags": [f"{i}-{j}" for j in range(300)]}
+            pages.append(page)
+        mock_get.side_effect = pages
+
+        assert len(list(GHCRBadgeGenerator().iter_tags("user", "repo"))) == 45000
+        assert mock_get.call_count == 150
+
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
+    def test_iter_tags_last(self, mock_get: MagicMock) -> None:
+        """Test iter_tags sends the last= cursor and accepts an empty page."""
+        mock_response = Mock(headers={})
+        mock_response.json.return_value = {"tags": []}
+        mock_get.return_value = mock_response
+
+        assert list(GHCRBadgeGenerator().iter_tags("user", "repo", last="v1.0.0")) == []
+        assert mock_get.call_args.kwargs["params"] == {"n": 300, "last": "v1.0.0"}
+
+    def test_next_page_url(self) -> None:
+        """Test parsing Link header."""
+        url = "https://ghcr.io/v2/user/repo/tags/list"
+        link = '</v2/user/repo/tags/list?last=v1&n=300>; rel="next"'
+        assert GHCRBadgeGenerator.next_page_url(url, {"Link": link}) == f"{url}?last=v1&n=300"
+        assert GHCRBadgeGenerator.next_page_url(url, {"Link": f'<{url}>; rel="next"'}) is None
+        assert GHCRBadgeGenerator.next_page_url(url, {}) is None
+
+    def test_filter_tag_list_last_n(self) -> None:
+        """Test filter_tag_list keeps the last n filtered tags in order."""
+        gen = GHCRBadgeGenerator(ignore_tag="latest,*-rc")
+        tags = ["v1", "v2", "v3-rc", "v3", "latest"]
+        assert gen.filter_tag_list(tags, 2) == ["v2", "v3"]
+        assert gen.filter_tag_list(tags, 10) == ["v1", "v2", "v3"]
+        assert gen.filter_tag_list(tags, 0) == []
+
     @patch("ghcr_badge.generate.GHCRBadgeGenerator.get_tags")
     def test_filter_tags_basic(self, mock_get_tags: MagicMock) -> None:
         """Test filter_tags with basic filtering."""
@@ -278,14 +727,14 @@ class TestGHCRBadgeGenerator:
         result = gen.get_tags("user", "repo")
         assert result == ["v1.0.0"]
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_auth_invalid_user(self, mock_get: MagicMock) -> None:
         """Test authentication with invalid user."""
         gen = GHCRBadgeGenerator()
         with pytest.raises(InvalidImageError):
             gen.get_tags("invalid user!", "repo")
 
-    @patch("ghcr_badge.generate.requests.get")
+    @patch("ghcr_badge.upstream.UpstreamClient.get")
     def test_auth_invalid_repo(self, mock_get: MagicMock) -> None:
         """Test authentication with invalid repo."""
         gen = GHCRBadgeGenerator()
@@ -0,0 +1,61 @@
+"""Tests of modules loaded by entry points."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+_HEAVY = ("requests", "urllib3", "humanfriendly", "anybadge", "flask", "waitress", "asyncio", "ghcr_badge.generate")
+
+
+def _import_times(code: str) -> dict[str, int]:
+    """Run code in a new interpreter and get cumulative microseconds of each imported module."""
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    """Test entry points import only what they use."""
+
+    @pytest.mark.parametrize("argv", [["--help"], ["--version"], []])
+    def test_cli_parse_args(self, argv: list[str]) -> None:
+        """Test parsing arguments of the CLI loads no HTTP client nor renderer."""
+        times = _import_times(
+            f"from ghcr_badge.main import parse_args\ntry:\n    parse_args({argv!r})\nexcept SystemExit:\n    pass",
+        )
+        assert "ghcr_badge.main" in times
+        assert [name for name in _HEAVY if name in times] == []
+
+    def test_package(self) -> None:
+        """Test importing the package defers the generator."""
+        times = _import_times("import ghcr_badge")
+        assert [name for name in _HEAVY if name in times] == []
+
+    def test_server(self) -> None:
+        """Test the WSGI app does not load waitress nor renderers of size badges."""
+        times = _import_times("import ghcr_badge.server")
+        assert "flask" in times
+        assert [name for name in ("waitress", "humanfriendly", "anybadge", "asyncio") if name in times] == []
+
+    def test_lazy_attributes(self) -> None:
+        """Test lazy attributes of the package."""
+        import ghcr_badge  # noqa: PLC0415
+        from ghcr_badge.generate import GHCRBadgeGenerator  # noqa: PLC0415
+
+        assert ghcr_badge.GHCRBadgeGenerator is GHCRBadgeGenerator
+        assert isinstance(ghcr_badge.__version__, str)
+        with pytest.raises(AttributeError, match="no attribute 'missing'"):
+            _ = ghcr_badge.missing  # type: ignore[attr-defined]
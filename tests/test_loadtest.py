@@ -0,0 +1,103 @@
+"""Tests for benchmarks.stub_registry and benchmarks.loadtest modules."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from benchmarks.loadtest import badge_paths, parse_args, report, summarize
+from benchmarks.stub_registry import StubRegistry, make_tags
+from ghcr_badge.generate import BaseBadgeGenerator, GHCRBadgeGenerator, tag_cache
+
+
+@pytest.fixture
+def registry_options() -> dict[str, Any]:
+    """Use a stub registry of 350 tags and 3 platforms."""
+    return {"tags": 350, "platforms": 3}
+
+
+class TestStubRegistry:
+    """Test StubRegistry class."""
+
+    def test_make_tags(self) -> None:
+        """Test tags are versions in lexical order, then `latest`."""
+        assert make_tags(3) == ["v0.0.0", "v0.0.1", "v0.0.2", "latest"]
+
+    def test_tags_paginated(self, registry: StubRegistry) -> None:
+        """Test the generator follows `Link` over pages of the tag list."""
+        assert GHCRBadgeGenerator().get_tags("load", "package-0") == registry.tags
+        assert registry.stats()["GET tags/list"] == 2
+
+    def test_tags_truncated(self, registry: StubRegistry, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test a tag list cut by max_tag_pages gives an invalid badge rather than a wrong latest tag."""
+        monkeypatch.setattr(BaseBadgeGenerator, "max_tag_pages", 1)
+        assert "invalid" in GHCRBadgeGenerator().generate_latest_tag("load", "package-0")
+        assert tag_cache.peek(("load", "package-0")) is None
+        monkeypatch.setattr(BaseBadgeGenerator, "max_tag_pages", 2)
+        assert "invalid" not in GHCRBadgeGenerator().generate_latest_tag("load", "package-0")
+        assert tag_cache.peek(("load", "package-0")).tags == tuple(registry.tags)  # type: ignore[union-attr]
+
+    def test_size_all_platforms(self, registry: StubRegistry) -> None:
+        """Test the image index and manifests of its platforms are served by digest."""
+        svg = GHCRBadgeGenerator().generate_size("load", "package-0", platform="all")
+        assert "linux/amd64 24 MiB | linux/arm64/v8 48 MiB | linux/arm/v7 72 MiB" in svg
+        assert registry.stats()["GET manifests"] == 4
+
+    def test_packages_distinct(self, registry: StubRegistry) -> None:
+        """Test packages have their own manifests, so they are not shared by the manifest store."""
+        GHCRBadgeGenerator().generate_size("load", "package-0")
+        GHCRBadgeGenerator().generate_size("load", "package-1")
+        assert registry.stats()["GET manifests"] == 4
+
+    def test_errors(self, registry: StubRegistry) -> None:
+        """Test failed requests are answered with the error status and counted."""
+        registry.error_rate = 1
+        status, headers, _ = registry.respond("GET", "/v2/load/package-0/tags/list", {})
+        assert (status, headers["Retry-After"]) == (503, "1")
+        assert registry.stats() == {"GET tags/list": 1, "errors": 1}
+        registry.reset()
+        assert registry.stats() == {}
+
+    def test_invalid_platforms(self) -> None:
+        """Test the number of platforms is checked."""
+        with pytest.raises(ValueError, match="between 1 and 6"):
+            StubRegistry(platforms=7)
+
+
+class TestLoadTest:
+    """Test helpers of the load test."""
+
+    def test_badge_paths(self) -> None:
+        """Test sizes of all platforms are only requested for multi-arch images."""
+        assert badge_paths(1, 1) == [
+            "/load/package-0/tags",
+            "/load/package-0/latest_tag?sort=semver",
+            "/load/package-0/size",
+        ]
+        assert len(badge_paths(2, 3)) == 8
+
+    def test_summarize(self) -> None:
+        """Test throughput, percentiles, errors and upstream calls."""
+        results = [(i / 1000, 200) for i in range(1, 101)] + [(0.2, 0), (0.2, 304)]
+        summary = summarize(results, 2.0, {"GET tags/list": 3, "GET manifests": 48, "errors": 1})
+        assert summary["requests"] == 102
+        assert summary["errors"] == 1
+        assert summary["rps"] == 51
+        assert summary["p50_ms"] == pytest.approx(51.5)
+        assert summary["p99_ms"] == pytest.approx(199)
+        assert summary["upstream_calls"] == 51
+        assert summary["upstream_per_request"] == 0.5
+        assert "waitress" in list(report([{"server": "waitress", **summary}]))[1]
+
+    def test_parse_args(self) -> None:
+        """Test server settings and registry options are parsed."""
+        args = parse_args(["--server", "gunicorn", "--env", "BADGE_CACHE_TTL=0", "--latency", "0"])
+        assert args.server == ["gunicorn"]
+        assert args.env == [("BADGE_CACHE_TTL", "0")]
+        assert args.latency == 0
+
+    def test_parse_args_invalid_env(self) -> None:
+        """Test `--env` needs `KEY=VALUE`."""
+        with pytest.raises(SystemExit):
+            parse_args(["--env", "BADGE_CACHE_TTL"])
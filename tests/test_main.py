@@ -2,24 +2,41 @@
 
 from __future__ import annotations
 
+import io
 from argparse import ArgumentTypeError, Namespace
 from http.client import CannotSendRequest
+from pathlib import Path
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
+from benchmarks.stub_registry import StubRegistry
+from ghcr_badge.generate import tag_cache
 from ghcr_badge.main import (
+    BadgeJob,
+    BadgeResult,
+    BatchState,
     HttpConnectionNotFountError,
+    TagListState,
+    badge_inputs,
     check_connectivity,
+    check_tag_list,
+    format_summary,
+    generate_badge,
+    generate_bulk,
+    load_state,
     main,
     parse_args,
+    parse_badge_list,
+    save_state,
+    write_if_changed,
 )
 
 
 class TestCheckConnectivity:
     """Test check_connectivity function."""
 
-    @patch("ghcr_badge.main.HTTPConnection")
+    @patch("http.client.HTTPConnection")
     def test_connectivity_success(self, mock_http_connection: MagicMock) -> None:
         """Test check_connectivity with successful connection."""
         mock_conn = Mock()
@@ -32,7 +49,7 @@ class TestCheckConnectivity:
         mock_conn.request.assert_called_once_with("HEAD", "/")
         mock_conn.close.assert_called_once()
 
-    @patch("ghcr_badge.main.HTTPConnection")
+    @patch("http.client.HTTPConnection")
     def test_connectivity_failure(self, mock_http_connection: MagicMock) -> None:
         """Test check_connectivity with failed connection."""
         mock_conn = Mock()
@@ -42,7 +59,7 @@ class TestCheckConnectivity:
         with pytest.raises(ArgumentTypeError, match="No connection"):
             check_connectivity()
 
-    @patch("ghcr_badge.main.HTTPConnection")
+    @patch("http.client.HTTPConnection")
     def test_connectivity_custom_url(self, mock_http_connection: MagicMock) -> None:
         """Test check_connectivity with custom URL."""
         mock_conn = Mock()
@@ -92,6 +109,17 @@ class TestParseArgs:
         assert args.color == "blue"
         assert args.out == "badge.svg"
 
+    def test_parse_args_batch(self) -> None:
+        """Test parse_args in bulk mode needs no user nor name."""
+        args = parse_args(["-b", "-", "-d", "out", "-j", "4"])
+        assert (args.batch, args.out_dir, args.jobs) == ("-", "out", 4)
+        assert args.user is None
+
+    def test_parse_args_invalid_jobs(self) -> None:
+        """Test parse_args with no worker."""
+        with pytest.raises(SystemExit):
+            parse_args(["-b", "-", "-j", "0"])
+
     def test_parse_args_version(self) -> None:
         """Test parse_args with version flag."""
         with pytest.raises(SystemExit) as exc_info:
@@ -104,7 +132,7 @@ class TestMain:
 
     @patch("ghcr_badge.main.check_connectivity")
     @patch("ghcr_badge.main.parse_args")
-    @patch("ghcr_badge.main.GHCRBadgeGenerator")
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
     @patch("builtins.print")
     def test_main_success_no_output_file(
         self,
@@ -115,7 +143,7 @@ class TestMain:
     ) -> None:
         """Test main with successful execution and no output file."""
         mock_check_connectivity.return_value = True
-        mock_args = Namespace(user="testuser", name="testrepo", color="lime", out=None)
+        mock_args = Namespace(user="testuser", name="testrepo", color="lime", out=None, batch=None)
         mock_parse_args.return_value = mock_args
         mock_generator = Mock()
         mock_generator.generate_tags.return_value = "<svg>badge</svg>"
@@ -131,7 +159,7 @@ class TestMain:
 
     @patch("ghcr_badge.main.check_connectivity")
     @patch("ghcr_badge.main.parse_args")
-    @patch("ghcr_badge.main.GHCRBadgeGenerator")
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
     @patch("builtins.print")
     @patch("pathlib.Path.open")
     def test_main_success_with_output_file(
@@ -144,7 +172,7 @@ class TestMain:
     ) -> None:
         """Test main with successful execution and output file."""
         mock_check_connectivity.return_value = True
-        mock_args = Namespace(user="testuser", name="testrepo", color="red", out="output.svg")
+        mock_args = Namespace(user="testuser", name="testrepo", color="red", out="output.svg", batch=None)
         mock_parse_args.return_value = mock_args
         mock_generator = Mock()
         mock_generator.generate_tags.return_value = "<svg>badge</svg>"
@@ -165,8 +193,253 @@ class TestMain:
     def test_main_no_connectivity(self, mock_parse_args: MagicMock, mock_check_connectivity: MagicMock) -> None:
         """Test main with no connectivity."""
         mock_check_connectivity.return_value = False
-        mock_args = Namespace(user="testuser", name="testrepo", color="lime", out=None)
+        mock_args = Namespace(user="testuser", name="testrepo", color="lime", out=None, batch=None)
         mock_parse_args.return_value = mock_args
 
         with pytest.raises(HttpConnectionNotFountError):
             main()
+
+
+class TestBulk:
+    """Test bulk mode."""
+
+    def test_parse_badge_list(self) -> None:
+        """Test kinds, parameters, comments and blank lines."""
+        jobs = parse_badge_list(
+            ["# dashboard", "", "user/repo", "user/nested/repo size latest_tag tag=v1 color=red  # pinned"],
+            color="blue",
+        )
+        assert jobs == [
+            BadgeJob("user", "repo", "tags", {"color": "blue"}),
+            BadgeJob("user", "nested/repo", "size", {"color": "red", "tag": "v1"}),
+            BadgeJob("user", "nested/repo", "latest_tag", {"color": "red", "tag": "v1"}),
+        ]
+        assert jobs[1].path == Path("user/nested/repo/size.svg")
+
+    @pytest.mark.parametrize(
+        ("line", "message"),
+        [("repo tags", "should be OWNER/NAME"), ("user/repo pulls", "not pulls")],
+    )
+    def test_parse_badge_list_invalid(self, line: str, message: str) -> None:
+        """Test malformed lines."""
+        with pytest.raises(ValueError, match=message):
+            parse_badge_list([line])
+
+    def test_parse_badge_list_same_path(self) -> None:
+        """Test badges of a package and kind differing only in parameters are refused, as they share a file."""
+        with pytest.raises(
+            ValueError, match=r"line 3: user/repo size is already saved to user/repo/size\.svg by line 1"
+        ):
+            parse_badge_list(["user/repo size tag=v1", "user/repo tags", "user/repo size tag=v2"])
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_generate_badge(self, mock_generator_class: MagicMock) -> None:
+        """Test parameters are passed to the generator, leaving the others to its defaults."""
+        generate_badge(BadgeJob("user", "repo", "tags", {"color": "red", "n": "5", "sort": "semver"}))
+        mock_generator_class.assert_called_once_with(color="red", ignore_tag="latest", trim_type="", sort="semver")
+        mock_generator_class.return_value.generate_tags.assert_called_once_with("user", "repo", n=5)
+
+        generate_badge(BadgeJob("user", "repo", "size", {"label": "size"}))
+        mock_generator_class.return_value.generate_size.assert_called_once_with(
+            "user",
+            "repo",
+            tag="latest",
+            label="size",
+        )
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_generate_bulk(self, mock_generator_class: MagicMock, tmp_path: Path) -> None:
+        """Test badges are saved and failures are reported without stopping the others."""
+        mock_generator_class.return_value.generate_tags.return_value = "<svg>tags</svg>\n"
+        mock_generator_class.return_value.generate_size.side_effect = ValueError("broken")
+        jobs = [BadgeJob("user", "a", "tags", {}), BadgeJob("user", "b", "size", {})]
+
+        results = generate_bulk(jobs, tmp_path, workers=2)
+        assert [r.job for r in results] == jobs
+        assert results[0].error is None
+        assert isinstance(results[1].error, ValueError)
+        assert (tmp_path / "user/a/tags.svg").read_text() == "<svg>tags</svg>\n"
+        assert not (tmp_path / "user/b").exists()
+
+    def test_format_summary(self) -> None:
+        """Test failures, counts and the slowest badge."""
+        results = [
+            BadgeResult(BadgeJob("user", "a", "tags", {}), 0.5, None, written=True),
+            BadgeResult(BadgeJob("user", "a", "size", {}), 0.1, None),
+            BadgeResult(BadgeJob("user", "b", "size", {}), 1.5, ValueError("broken")),
+        ]
+        assert format_summary(results, 2.0) == (
+            "failed: user/b size: ValueError: broken\n"
+            "3 badges in 2.00s: 1 written, 1 unchanged, 1 failed (slowest 1.50s: user/b size)"
+        )
+
+    @patch("ghcr_badge.main.check_connectivity")
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_main_batch(
+        self,
+        mock_generator_class: MagicMock,
+        mock_check_connectivity: MagicMock,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test main in bulk mode reads stdin and exits with 0 without checking connectivity."""
+        mock_generator_class.return_value.generate_latest_tag.return_value = "<svg/>"
+        with (
+            patch("sys.argv", ["ghcr-badge", "-b", "-", "-d", str(tmp_path)]),
+            patch("sys.stdin", io.StringIO("user/repo latest_tag\n")),
+            pytest.raises(SystemExit) as exc_info,
+        ):
+            main()
+        assert exc_info.value.code == 0
+        assert (tmp_path / "user/repo/latest_tag.svg").read_text() == "<svg/>"
+        assert "1 badges in" in capsys.readouterr().err
+        mock_check_connectivity.assert_not_called()
+
+
+class TestIncremental:
+    """Test regenerating only changed badges."""
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_badge_inputs(self, mock_generator_class: MagicMock) -> None:
+        """Test inputs are the tag list or the manifest digest, with parameters."""
+        mock_generator = mock_generator_class.return_value
+        mock_generator.get_tags.return_value = ["v1"]
+        mock_generator.fetch_digest.return_value = "sha256:a"
+        tags = badge_inputs(BadgeJob("user", "repo", "tags", {}))
+        size = badge_inputs(BadgeJob("user", "repo", "size", {"tag": "v1"}))
+        mock_generator.fetch_digest.assert_called_once_with("user", "repo", tag="v1")
+        assert tags != badge_inputs(BadgeJob("user", "repo", "tags", {"n": "5"}))
+        mock_generator.get_tags.return_value = ["v1", "v2"]
+        assert tags != badge_inputs(BadgeJob("user", "repo", "tags", {}))
+        assert size == badge_inputs(BadgeJob("user", "repo", "size", {"tag": "v1"}))
+        checked = TagListState("digest", {})
+        assert badge_inputs(BadgeJob("user", "repo", "tags", {}), checked) != tags
+        assert mock_generator.get_tags.call_count == 3
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_badge_inputs_unknown(self, mock_generator_class: MagicMock) -> None:
+        """Test inputs are unknown without a digest or on errors."""
+        mock_generator = mock_generator_class.return_value
+        mock_generator.fetch_digest.return_value = None
+        mock_generator.get_tags.side_effect = OSError
+        assert badge_inputs(BadgeJob("user", "repo", "size", {})) is None
+        assert badge_inputs(BadgeJob("user", "repo", "tags", {})) is None
+
+    def test_write_if_changed(self, tmp_path: Path) -> None:
+        """Test files with the same content are not written."""
+        path = tmp_path / "user/repo/tags.svg"
+        assert write_if_changed(path, "<svg/>") is True
+        mtime = path.stat().st_mtime_ns
+        assert write_if_changed(path, "<svg/>") is False
+        assert path.stat().st_mtime_ns == mtime
+        assert write_if_changed(path, "<svg>new</svg>") is True
+
+    def test_state(self, tmp_path: Path) -> None:
+        """Test failed badges keep and removed badges drop their fingerprints."""
+        path = tmp_path / "state.json"
+        assert load_state(path) == BatchState({}, {})
+        tag_list = TagListState("digest", {"If-None-Match": '"etag"'})
+        state = BatchState(
+            {"user/a/tags.svg": "old", "user/b/size.svg": "old", "user/c/size.svg": "old"},
+            {"user/a": TagListState("old", {}), "user/c": TagListState("old", {})},
+        )
+        results = [
+            BadgeResult(BadgeJob("user", "a", "tags", {}), 0, None, inputs="new", tag_list=tag_list),
+            BadgeResult(BadgeJob("user", "b", "size", {}), 0, ValueError()),
+        ]
+        save_state(path, state, results)
+        assert load_state(path) == BatchState(
+            {"user/a/tags.svg": "new", "user/b/size.svg": "old"},
+            {"user/a": tag_list},
+        )
+        path.write_text("[]")
+        assert load_state(path) == BatchState({}, {})
+        path.write_text('{"version": 1, "inputs": {"user/a/tags.svg": "old"}}')
+        assert load_state(path) == BatchState({}, {})
+
+    @patch("ghcr_badge.main.check_tag_list")
+    @patch("ghcr_badge.main.badge_inputs")
+    @patch("ghcr_badge.main.generate_badge")
+    def test_generate_bulk_state(
+        self,
+        mock_generate_badge: MagicMock,
+        mock_badge_inputs: MagicMock,
+        mock_check_tag_list: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test only badges with changed inputs or missing files are generated."""
+        mock_generate_badge.return_value = "<svg/>"
+        mock_badge_inputs.side_effect = lambda job, _: {"a": "same", "b": "changed", "c": "same", "d": None}[job.name]
+        mock_check_tag_list.side_effect = lambda _, name, __: TagListState(name, {})
+        jobs = [BadgeJob("user", name, "tags", {}) for name in "abcd"]
+        for name in "abd":
+            (tmp_path / "user" / name).mkdir(parents=True)
+            (tmp_path / "user" / name / "tags.svg").write_text("<svg/>")
+        state = BatchState({f"user/{name}/tags.svg": "same" for name in "abcd"}, {"user/a": TagListState("a", {})})
+
+        results = generate_bulk(jobs, tmp_path, state=state)
+        assert [r.inputs for r in results] == ["same", "changed", "same", None]
+        assert [r.written for r in results] == [False, False, True, False]
+        assert sorted(call.args[0].name for call in mock_generate_badge.call_args_list) == ["b", "c", "d"]
+        assert [r.tag_list for r in results] == [TagListState(name, {}) for name in "abcd"]
+        assert mock_check_tag_list.call_args_list[0].args == ("user", "a", TagListState("a", {}))
+
+    def test_check_tag_list(self, registry: StubRegistry) -> None:
+        """Test an unchanged one-page tag list costs one `304 Not Modified`."""
+        first = check_tag_list("load", "package-0")
+        assert first.validators["If-None-Match"].startswith('"')
+        assert tag_cache.peek(("load", "package-0")).tags == tuple(registry.tags)  # type: ignore[union-attr]
+        assert check_tag_list("load", "package-0", first) is first
+        registry.tags.append("v1.0.0")
+        changed = check_tag_list("load", "package-0", first)
+        assert changed.digest != first.digest
+        assert changed.validators != first.validators
+        assert registry.stats() == {"GET tags/list": 3}
+
+    def test_check_tag_list_pages(self, registry: StubRegistry) -> None:
+        """Test a tag list of several pages is fetched whole and has no validators."""
+        registry.tags = [f"v{i}" for i in range(301)]
+        state = check_tag_list("load", "package-0")
+        assert state.validators == {}
+        assert state == check_tag_list("load", "package-0", state)
+
+    def test_main_state_tags(
+        self,
+        registry: StubRegistry,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test a second run of unchanged tag badges sends one conditional request per package."""
+        argv = ["ghcr-badge", "-b", "-", "-d", str(tmp_path), "-s", str(tmp_path / "state.json")]
+        for _ in range(2):
+            registry.reset()
+            with (
+                patch("sys.argv", argv),
+                patch("sys.stdin", io.StringIO("load/package-0 tags latest_tag\n")),
+                pytest.raises(SystemExit),
+            ):
+                main()
+        assert registry.stats() == {"GET tags/list": 1}
+        assert "0 written, 2 unchanged" in capsys.readouterr().err.splitlines()[-1]
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator")
+    def test_main_state(
+        self,
+        mock_generator_class: MagicMock,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test a second run with unchanged inputs generates nothing."""
+        mock_generator = mock_generator_class.return_value
+        mock_generator.fetch_digest.return_value = "sha256:a"
+        mock_generator.generate_size.return_value = "<svg/>"
+        argv = ["ghcr-badge", "-b", "-", "-d", str(tmp_path), "-s", str(tmp_path / "state.json")]
+        for _ in range(2):
+            with (
+                patch("sys.argv", argv),
+                patch("sys.stdin", io.StringIO("user/repo size\n")),
+                pytest.raises(SystemExit),
+            ):
+                main()
+        mock_generator.generate_size.assert_called_once()
+        assert "0 written, 1 unchanged" in capsys.readouterr().err
@@ -0,0 +1,159 @@
+"""Tests for ghcr_badge.metrics module."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from ghcr_badge.generate import BaseBadgeGenerator, GHCRBadgeGenerator, TagList, tag_cache
+from ghcr_badge.metrics import CONTENT_TYPE, MetricFamily, Registry, render_seconds
+from ghcr_badge.routes import cache_metrics, upstream_metrics
+from ghcr_badge.server import app
+from ghcr_badge.upstream import configure_client
+
+
+def _values(families: list[MetricFamily]) -> dict[tuple[str, ...], float]:
+    """Get sample values by metric name and label values."""
+    return {(family.name, *sample.labels.values()): sample.value for family in families for sample in family.samples}
+
+
+class TestCounter:
+    """Test Counter class."""
+
+    def test_inc(self) -> None:
+        """Test values are kept per label set."""
+        counter = Registry().counter("requests", "Requests.", ("status",))
+        counter.inc("200")
+        counter.inc("200", amount=2)
+        counter.inc("404")
+        assert [(s.labels, s.value) for s in counter.collect().samples] == [
+            ({"status": "200"}, 3),
+            ({"status": "404"}, 1),
+        ]
+
+    def test_wrong_labels(self) -> None:
+        """Test label values must match label names."""
+        counter = Registry().counter("requests", "Requests.", ("status",))
+        with pytest.raises(ValueError, match="has labels status, got 2 values"):
+            counter.inc("200", "GET")
+
+    def test_threads(self) -> None:
+        """Test values of each thread are summed, including threads which have finished."""
+        counter = Registry().counter("requests", "Requests.")
+        barrier = threading.Barrier(8)
+
+        def work() -> None:
+            barrier.wait()
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc()
+        assert counter.collect().samples[0].value == 8001
+        assert len(counter._shards._shards) == 1  # noqa: SLF001
+        counter.clear()
+        assert counter.collect().samples == []
+
+
+class TestHistogram:
+    """Test Histogram class."""
+
+    def test_observe(self) -> None:
+        """Test buckets are cumulative and end with `+Inf`."""
+        histogram = Registry().histogram("seconds", "Seconds.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        assert [(s.suffix, s.labels, s.value) for s in histogram.collect().samples] == [
+            ("_bucket", {"le": "0.1"}, 2),
+            ("_bucket", {"le": "1"}, 3),
+            ("_bucket", {"le": "+Inf"}, 4),
+            ("_sum", {}, 2.65),
+            ("_count", {}, 4),
+        ]
+
+    def test_time(self) -> None:
+        """Test a block is timed even if it raises."""
+        histogram = Registry().histogram("seconds", "Seconds.", ("kind",))
+        with pytest.raises(KeyError), histogram.time("tags"):
+            raise KeyError
+        assert histogram.collect().samples[-1] == ("_count", {"kind": "tags"}, 1)
+
+    def test_unsorted_buckets(self) -> None:
+        """Test buckets must be sorted."""
+        with pytest.raises(ValueError, match="should be sorted"):
+            Registry().histogram("seconds", "Seconds.", buckets=(1.0, 0.1))
+
+
+class TestRegistry:
+    """Test Registry class."""
+
+    def test_render(self) -> None:
+        """Test the Prometheus text format, with collectors after metrics and escaped labels."""
+        registry = Registry()
+        registry.counter("requests", "Requests.", ("path",)).inc('/a"b\\')
+        registry.add_collector(lambda: [cache_metrics()[2]])
+        text = registry.render()
+        assert text.startswith(
+            '# HELP requests Requests.\n# TYPE requests counter\nrequests_total{path="/a\\"b\\\\"} 1\n'
+        )
+        assert '# TYPE ghcr_badge_cache_entries gauge\nghcr_badge_cache_entries{cache="tags"} 0\n' in text
+        assert text.endswith("\n")
+
+    def test_cache_metrics(self) -> None:
+        """Test cache lookups are read from cache statistics."""
+        tag_list = TagList.of(("v1",), 0)
+        tag_cache.get(("user", "repo"), lambda: tag_list)
+        tag_cache.get(("user", "repo"), lambda: tag_list)
+        lookups, ratios, entries = cache_metrics()
+        assert [s.value for s in lookups.samples if s.labels["cache"] == "tags"] == [1, 1, 0]
+        assert [s.value for s in ratios.samples if s.labels["cache"] == "tags"] == [0.5, 0.5, 0]
+        assert entries.samples[0] == ("", {"cache": "tags"}, 1)
+
+    @pytest.mark.usefixtures("registry")
+    def test_upstream_metrics(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test 304s, reused connections, shared fetches and revalidations are read from their counters."""
+        monkeypatch.setattr(BaseBadgeGenerator, "tag_resync_interval", 0)
+        configure_client()
+        before = _values(upstream_metrics())
+        generator = GHCRBadgeGenerator()
+        tag_cache.set(("load", "package-0"), generator.load_tags("load", "package-0"))
+        generator.load_tags("load", "package-0")
+        generator.generate_size("load", "package-0")
+        generator.generate_size("load", "package-0")
+        after = _values(upstream_metrics())
+        assert after["ghcr_badge_upstream_conditional_requests", "sync"] == 1
+        assert after["ghcr_badge_upstream_not_modified", "sync"] == 1
+        assert after["ghcr_badge_upstream_connections", "sync"] >= 1
+        assert after["ghcr_badge_upstream_reused_requests", "sync"] >= 1
+        assert after["ghcr_badge_single_flight_calls", "sync"] > before["ghcr_badge_single_flight_calls", "sync"]
+        unchanged = ("ghcr_badge_manifest_revalidations", "unchanged")
+        assert after[unchanged] == before[unchanged] + 1
+
+
+class TestEndpoint:
+    """Test `/metrics` of the WSGI server."""
+
+    def test_metrics(self) -> None:
+        """Test requests are recorded per route and status."""
+        with app.test_client() as client:
+            client.get("/health")
+            client.get("/unknown")
+            response = client.get("/metrics")
+        assert response.content_type == CONTENT_TYPE
+        text = response.get_data(as_text=True)
+        assert 'ghcr_badge_request_seconds_count{route="/health",status="200"}' in text
+        assert 'ghcr_badge_request_seconds_count{route="unmatched",status="404"}' in text
+        assert "ghcr_badge_cache_lookup_ratio" in text
+        assert 'ghcr_badge_single_flight_calls_total{flight="sync"}' in text
+        assert "# TYPE ghcr_badge_upstream_not_modified counter" in text
+
+    def test_render_seconds(self) -> None:
+        """Test badge renders are timed per kind."""
+        render_seconds.clear()
+        BaseBadgeGenerator.get_invalid_badge("size")
+        assert [s.labels["kind"] for s in render_seconds.collect().samples if s.suffix == "_count"] == ["invalid"]
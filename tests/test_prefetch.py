@@ -0,0 +1,224 @@
+"""Tests for ghcr_badge.prefetch module."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Generator
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from ghcr_badge.cache import TTLCache
+from ghcr_badge.generate import TagList
+from ghcr_badge.prefetch import PrefetchScheduler
+from ghcr_badge.ratelimit import scheduler as upstream_scheduler
+from ghcr_badge.server import app
+
+if TYPE_CHECKING:
+    from conftest import Clock
+
+
+def _fetching(requests: int, result: object) -> Mock:
+    """Make a loader which sends upstream requests through the scheduler."""
+
+    def load(*_: object) -> object:
+        for _ in range(requests):
+            upstream_scheduler.acquire()
+        return result
+
+    return Mock(side_effect=load)
+
+
+@pytest.fixture
+def badges(clock: Clock) -> TTLCache[tuple[str, ...], tuple[bytes, str]]:
+    """Create a badge cache on the manual clock."""
+    return TTLCache(ttl=300, stale_ttl=0, clock=clock)
+
+
+@pytest.fixture
+def tags(clock: Clock) -> Generator[TTLCache[tuple[str, str], TagList], None, None]:
+    """Replace the tag cache with one on the manual clock."""
+    cache: TTLCache[tuple[str, str], TagList] = TTLCache(ttl=300, clock=clock)
+    with patch("ghcr_badge.prefetch.tag_cache", cache):
+        yield cache
+
+
+@pytest.fixture
+def scheduler(
+    badges: TTLCache[tuple[str, ...], tuple[bytes, str]],
+    clock: Clock,
+) -> Generator[PrefetchScheduler, None, None]:
+    """Create a scheduler whose thread never runs a round by itself."""
+    scheduler = PrefetchScheduler(badges, top_k=2, lead=30, interval=3600, budget=2, clock=clock)
+    yield scheduler
+    scheduler.stop()
+
+
+class TestRecord:
+    """Test counting requests."""
+
+    def test_hot(self, scheduler: PrefetchScheduler) -> None:
+        """Test the most requested packages come first, per endpoint."""
+        for _ in range(3):
+            scheduler.record(("size", "a", "x", "latest"), Mock())
+        scheduler.record(("tags", "b", "y", "3"), Mock())
+        scheduler.record(("tags", "b", "y", "5"), Mock())
+        scheduler.record(("tags", "c", "z", "3"), Mock())
+        assert scheduler.hot() == [("a", "x", "size"), ("b", "y", "tags")]
+
+    def test_decay(self, scheduler: PrefetchScheduler, clock: Clock) -> None:
+        """Test old requests count less than recent ones."""
+        for _ in range(3):
+            scheduler.record(("size", "a", "x", "latest"), Mock())
+        clock.now += 1200  # two half-lives
+        scheduler.record(("size", "b", "y", "latest"), Mock())
+        scheduler.record(("size", "b", "y", "latest"), Mock())
+        assert scheduler.hot()[0] == ("b", "y", "size")
+
+    def test_maxsize(self, scheduler: PrefetchScheduler) -> None:
+        """Test the coldest packages are forgotten beyond maxsize."""
+        scheduler.maxsize = 1
+        scheduler.record(("size", "a", "x", "latest"), Mock())
+        scheduler.record(("size", "a", "x", "latest"), Mock())
+        scheduler.record(("size", "b", "y", "latest"), Mock())
+        scheduler.hot()
+        scheduler.top_k = 10
+        assert scheduler.hot() == [("a", "x", "size")]
+
+    def test_disabled(self, badges: TTLCache[tuple[str, ...], tuple[bytes, str]]) -> None:
+        """Test nothing is counted nor started when top_k is 0."""
+        scheduler = PrefetchScheduler(badges)
+        scheduler.record(("size", "a", "x", "latest"), Mock())
+        assert scheduler.hot() == []
+        assert scheduler._thread is None  # noqa: SLF001
+
+    def test_invalid_bounds(self, badges: TTLCache[tuple[str, ...], tuple[bytes, str]]) -> None:
+        """Test invalid bounds."""
+        with pytest.raises(ValueError, match="bounds should be positive"):
+            PrefetchScheduler(badges, interval=0)
+
+
+class TestRunOnce:
+    """Test refreshing entries."""
+
+    def test_refresh_expiring_badge(
+        self,
+        scheduler: PrefetchScheduler,
+        badges: TTLCache[tuple[str, ...], tuple[bytes, str]],
+        clock: Clock,
+    ) -> None:
+        """Test only badges expiring within lead are rendered again."""
+        key = ("size", "a", "x", "latest")
+        loader = _fetching(1, (b"<svg>new</svg>", "new"))
+        badges.set(key, (b"<svg>old</svg>", "old"))
+        scheduler.record(key, loader)
+        assert scheduler.run_once() == 0
+        loader.assert_not_called()
+
+        clock.now += 280
+        assert scheduler.run_once() == 1
+        assert badges.peek(key) == (b"<svg>new</svg>", "new")
+        assert badges.expires_in(key) == 300
+
+    @pytest.mark.parametrize(
+        ("requests", "sent", "calls"),
+        [(1, 2, [1, 1, 0]), (3, 3, [1, 0, 0]), (0, 0, [1, 1, 1])],
+    )
+    def test_budget(  # noqa: PLR0913
+        self,
+        scheduler: PrefetchScheduler,
+        badges: TTLCache[tuple[str, ...], tuple[bytes, str]],
+        clock: Clock,
+        *,
+        requests: int,
+        sent: int,
+        calls: list[int],
+    ) -> None:
+        """Test a round stops once the upstream requests it sent reach its budget."""
+        loaders = []
+        for tag in ("1", "2", "3"):
+            key = ("size", "a", "x", tag)
+            badges.set(key, (b"", ""))
+            loaders.append(_fetching(requests, (b"", "")))
+            scheduler.record(key, loaders[-1])
+        clock.now += 280
+        assert scheduler.run_once() == sent
+        assert [loader.call_count for loader in loaders] == calls
+
+    @patch("ghcr_badge.prefetch.GHCRBadgeGenerator")
+    def test_refresh_tags(
+        self,
+        mock_generator_class: MagicMock,
+        scheduler: PrefetchScheduler,
+        badges: TTLCache[tuple[str, ...], tuple[bytes, str]],
+        tags: TTLCache[tuple[str, str], TagList],
+        clock: Clock,
+    ) -> None:
+        """Test a tag list is loaded once for both tag endpoints, and their badges render past the budget."""
+        fresh = TagList.of(("v1", "v2"), clock.now)
+        mock_generator_class.return_value.load_tags = _fetching(2, fresh)
+        tags.set(("a", "x"), TagList.of(("v1",), clock.now))
+        keys = [("tags", "a", "x", "3"), ("tags", "a", "x", "5"), ("latest_tag", "a", "x")]
+        for key in keys:
+            badges.set(key, (b"", ""))
+            scheduler.record(key, Mock(return_value=(b"<svg/>", "etag")))
+        clock.now += 280
+        assert scheduler.run_once() == 2
+        mock_generator_class.return_value.load_tags.assert_called_once_with("a", "x")
+        assert tags.peek(("a", "x")) == fresh
+        assert all(badges.peek(key) == (b"<svg/>", "etag") for key in keys)
+
+    @patch("ghcr_badge.prefetch.GHCRBadgeGenerator")
+    def test_failed_refresh(
+        self,
+        mock_generator_class: MagicMock,
+        scheduler: PrefetchScheduler,
+        badges: TTLCache[tuple[str, ...], tuple[bytes, str]],
+        tags: TTLCache[tuple[str, str], TagList],
+        clock: Clock,
+    ) -> None:
+        """Test failures keep cached entries as they are."""
+        mock_generator_class.return_value.load_tags.side_effect = OSError
+        fetched = clock.now
+        tags.set(("a", "x"), TagList.of(("v1",), fetched))
+        badges.set(("tags", "a", "x", "3"), (b"old", "old"))
+        scheduler.record(("tags", "a", "x", "3"), Mock(side_effect=OSError))
+        clock.now += 280
+        scheduler.run_once()
+        assert tags.peek(("a", "x")) == TagList.of(("v1",), fetched)
+        assert badges.peek(("tags", "a", "x", "3")) == (b"old", "old")
+
+    def test_evicted_badge(self, scheduler: PrefetchScheduler) -> None:
+        """Test badges not in cache are left to be loaded on request."""
+        loader = Mock()
+        scheduler.record(("size", "a", "x", "latest"), loader)
+        assert scheduler.run_once() == 0
+        loader.assert_not_called()
+
+
+class TestThread:
+    """Test the background thread."""
+
+    def test_rounds(self, badges: TTLCache[tuple[str, ...], tuple[bytes, str]], clock: Clock) -> None:
+        """Test the thread refreshes entries on its own."""
+        refreshed = threading.Event()
+        scheduler = PrefetchScheduler(badges, top_k=1, lead=400, interval=0.01, clock=clock)
+        badges.set(("size", "a", "x", "latest"), (b"", ""))
+        scheduler.record(("size", "a", "x", "latest"), lambda: (refreshed.set(), (b"", ""))[1])
+        try:
+            assert refreshed.wait(5)
+        finally:
+            scheduler.stop()
+        assert scheduler._thread is None  # noqa: SLF001
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    @patch("ghcr_badge.server.prefetcher")
+    def test_server_records(self, mock_prefetcher: MagicMock, mock_generator_class: MagicMock) -> None:
+        """Test badge requests are counted with a loader rendering them again."""
+        mock_generator_class.return_value.generate_size.return_value = "<svg/>"
+        with app.test_client() as client:
+            client.get("/testuser/testrepo/size")
+        key, loader = mock_prefetcher.record.call_args[0]
+        assert key == ("size", "testuser", "testrepo", "latest", "#44cc11", "image size", "", "")
+        assert loader()[0] == b"<svg/>"
@@ -0,0 +1,173 @@
+"""Tests for ghcr_badge.ratelimit module."""
+
+from __future__ import annotations
+
+import asyncio
+from email.utils import formatdate
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from benchmarks.stub_registry import StubRegistry
+from ghcr_badge.generate import GHCRBadgeGenerator, tag_cache, tag_digests
+from ghcr_badge.ratelimit import (
+    UpstreamScheduler,
+    UpstreamThrottledError,
+    background,
+    count_requests,
+    retry_after,
+    scheduler,
+)
+from ghcr_badge.upstream import UpstreamClient
+
+if TYPE_CHECKING:
+    from conftest import Clock
+
+
+class TestUpstreamScheduler:
+    """Test UpstreamScheduler class."""
+
+    def test_burst_then_paced(self, clock: Clock) -> None:
+        """Test requests over the burst wait for tokens, and are rejected past max_wait."""
+        limiter = UpstreamScheduler(rate=10, burst=2, max_wait=0.25, clock=clock)
+        assert [limiter.schedule() for _ in range(4)] == pytest.approx([0, 0, 0.1, 0.2])
+        with pytest.raises(UpstreamThrottledError, match="caller request rejected"):
+            limiter.schedule()
+        clock.now = 1
+        assert limiter.schedule() == 0
+        assert limiter.stats() == {
+            "sent": 5,
+            "delayed": 2,
+            "dropped": 0,
+            "rejected": 1,
+            "throttled": 0,
+            "paused_for": 0,
+        }
+
+    def test_background_dropped(self, clock: Clock) -> None:
+        """Test background requests leave the reserve of the bucket to callers."""
+        limiter = UpstreamScheduler(rate=10, burst=4, reserve=0.5, clock=clock)
+        with background():
+            assert limiter.schedule() == 0
+            assert limiter.schedule() == 0
+            with pytest.raises(UpstreamThrottledError, match="background request dropped"):
+                limiter.schedule()
+        assert limiter.schedule() == 0
+        assert limiter.stats()["dropped"] == 1
+
+    def test_retry_after_pauses(self, clock: Clock) -> None:
+        """Test `Retry-After` of a 429 pauses requests, rejecting those which cannot wait."""
+        limiter = UpstreamScheduler(max_wait=2, clock=clock)
+        with pytest.raises(UpstreamThrottledError, match="429, retry after 3 seconds"):
+            limiter.check_response(429, {"Retry-After": "3"})
+        with pytest.raises(UpstreamThrottledError):
+            limiter.schedule()
+        with background(), pytest.raises(UpstreamThrottledError):
+            limiter.schedule()
+        clock.now = 2
+        assert limiter.schedule() == 1
+        assert limiter.stats()["throttled"] == 1
+
+    def test_count_requests(self, clock: Clock) -> None:
+        """Test only requests sent within the block are counted."""
+        limiter = UpstreamScheduler(rate=10, burst=4, reserve=0.5, clock=clock)
+        limiter.schedule()
+        with count_requests() as requests, background():
+            limiter.schedule()
+            with pytest.raises(UpstreamThrottledError):
+                limiter.schedule()
+        limiter.schedule()
+        assert requests.sent == 1
+        assert limiter.stats()["sent"] == 3
+
+    @pytest.mark.parametrize(
+        ("status", "headers", "paused_for"),
+        [(429, {}, 5), (503, {"Retry-After": "7"}, 7), (500, {}, 0)],
+    )
+    def test_check_response_error(self, status: int, headers: dict[str, str], paused_for: float, clock: Clock) -> None:
+        """Test 429 without `Retry-After` pauses for the backoff, and 5xx only with it."""
+        limiter = UpstreamScheduler(backoff=5, clock=clock)
+        with pytest.raises(UpstreamThrottledError, match=str(status)):
+            limiter.check_response(status, headers)
+        assert limiter.stats()["paused_for"] == paused_for
+
+    def test_check_response_ok(self) -> None:
+        """Test other responses pass."""
+        limiter = UpstreamScheduler()
+        for status in (200, 304, 404):
+            limiter.check_response(status, {"Retry-After": "10"})
+        assert limiter.stats()["throttled"] == 0
+
+    def test_unpaced(self, clock: Clock) -> None:
+        """Test rate 0 sends without pacing."""
+        limiter = UpstreamScheduler(rate=0, burst=1, clock=clock)
+        assert [limiter.schedule() for _ in range(100)] == [0] * 100
+
+    def test_configure_invalid(self) -> None:
+        """Test limits are checked."""
+        with pytest.raises(ValueError, match="invalid limits"):
+            UpstreamScheduler(burst=0)
+        with pytest.raises(ValueError, match="invalid limits"):
+            UpstreamScheduler(reserve=1)
+
+    def test_aacquire(self) -> None:
+        """Test async callers wait on the event loop."""
+        limiter = UpstreamScheduler(rate=100, burst=1)
+        asyncio.run(limiter.aacquire())
+        asyncio.run(limiter.aacquire())
+        assert limiter.stats()["delayed"] == 1
+
+    def test_retry_after(self) -> None:
+        """Test seconds and HTTP dates are parsed."""
+        assert retry_after({"Retry-After": "120"}, 0) == 120
+        assert retry_after({"Retry-After": formatdate(1030)}, 1000) == 30
+        assert retry_after({"Retry-After": "soon"}, 0) is None
+        assert retry_after({}, 0) is None
+
+
+@pytest.fixture
+def registry_options() -> dict[str, Any]:
+    """Use a stub registry which throttles every request."""
+    return {"tags": 5, "error_status": 429}
+
+
+class TestThrottledUpstream:
+    """Test generators while the registry throttles."""
+
+    def test_client_raises(self, registry: StubRegistry) -> None:
+        """Test a 429 raises and pauses the process-wide scheduler."""
+        scheduler.configure(rate=20, burst=40, max_wait=0.5)
+        registry.error_rate = 1
+        with pytest.raises(UpstreamThrottledError):
+            UpstreamClient().get(f"{registry.url}/v2/load/package-0/tags/list")
+        assert scheduler.stats()["paused_for"] > 0
+        with pytest.raises(UpstreamThrottledError):
+            UpstreamClient().get(f"{registry.url}/v2/load/package-0/tags/list")
+        assert registry.stats()["GET tags/list"] == 1
+
+    def test_tags_fall_back_to_cached(self, registry: StubRegistry) -> None:
+        """Test the last tag list is rendered instead of an invalid badge."""
+        badge = GHCRBadgeGenerator().generate_latest_tag("load", "package-0")
+        tag_cache.configure(maxsize=1024, ttl=0, stale_ttl=0)
+        registry.error_rate = 1
+        try:
+            assert GHCRBadgeGenerator().generate_latest_tag("load", "package-0") == badge
+        finally:
+            tag_cache.configure(maxsize=1024, ttl=300, stale_ttl=86400)
+        assert "v0.0.4" in badge
+        assert registry.stats()["errors"] == 1
+
+    def test_size_falls_back_to_stored(self, registry: StubRegistry) -> None:
+        """Test the stored manifest of a tag is used if its digest cannot be checked."""
+        badge = GHCRBadgeGenerator().generate_size("load", "package-0")
+        registry.error_rate = 1
+        assert tag_digests.peek(("load", "package-0", "latest")) is not None
+        assert GHCRBadgeGenerator().generate_size("load", "package-0") == badge
+        assert registry.stats()["HEAD manifests"] == 1
+
+    def test_no_cached_value(self, registry: StubRegistry) -> None:
+        """Test throttling without a cached value raises rather than caching an invalid badge."""
+        registry.error_rate = 1
+        with pytest.raises(UpstreamThrottledError):
+            GHCRBadgeGenerator().generate_tags("load", "package-0")
+        assert tag_cache.peek(("load", "package-0")) is None
@@ -0,0 +1,59 @@
+"""Tests for ghcr_badge.render module."""
+
+from __future__ import annotations
+
+import re
+
+import pytest
+from anybadge import Badge  # type: ignore[import,unused-ignore]
+
+from ghcr_badge.render import color_code, render_badge, text_width
+
+_MASK_ID = re.compile(r"(anybadge|ghcr_badge)_[0-9a-f]+")
+
+
+class TestRenderBadge:
+    """Test render_badge function."""
+
+    @pytest.mark.parametrize(
+        ("label", "value", "color"),
+        [
+            ("image tags", " v1.0.0 | v1.0.1 | latest", "#44cc11"),
+            ("version", "sha-abc<&>\"'", "green"),
+            ("image size", "12.3 MiB", "#007ec6"),
+            ("image tags", "invalid", "#e05d44"),
+            ("emoji 😀", "日本語 WWW mm", "lightgrey"),
+            ("", "value only", "red"),
+            ("label only", "", "#fff"),
+        ],
+    )
+    def test_same_as_anybadge(self, label: str, value: str, color: str) -> None:
+        """Test output is the same as anybadge except the mask id."""
+        expected = Badge(label=label, value=value, default_color=color).badge_svg_text
+        assert _MASK_ID.sub("", render_badge(label, value, color)) == _MASK_ID.sub("", expected)
+
+    def test_numeric_value_verbatim(self) -> None:
+        """Test numeric-looking values are not reformatted."""
+        assert ">1.10</text>" in render_badge("version", "1.10", "#44cc11")
+
+    def test_deterministic(self) -> None:
+        """Test equal badges are byte-identical and differing ones have their own mask id."""
+        assert render_badge("a", "b", "#fff") == render_badge("a", "b", "#fff")
+        mask_ids = [re.findall(r'<mask id="([^"]+)"', render_badge("a", v, "#fff")) for v in ("b", "c")]
+        assert mask_ids[0] != mask_ids[1]
+
+    def test_empty(self) -> None:
+        """Test badge without label and value."""
+        with pytest.raises(ValueError, match="must be provided"):
+            render_badge("", "", "#fff")
+
+    def test_invalid_color(self) -> None:
+        """Test unknown color name."""
+        with pytest.raises(ValueError, match="Invalid color code"):
+            color_code("no-such-color")
+
+    def test_text_width(self) -> None:
+        """Test text width approximation."""
+        assert text_width("") == 0
+        assert text_width("il") == 8
+        assert text_width("WW") == 20
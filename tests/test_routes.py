@@ -0,0 +1,53 @@
+"""Tests for ghcr_badge.routes module."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from ghcr_badge.routes import badge_request
+
+
+class TestBadgeRequest:
+    """Test badge_request function."""
+
+    @pytest.mark.parametrize(
+        ("kind", "key"),
+        [
+            ("tags", ("tags", "user", "repo", "#44cc11", "latest", "image tags", "3", "", "lexical")),
+            ("latest_tag", ("latest_tag", "user", "repo", "#44cc11", "latest", "version", "", "lexical")),
+            ("size", ("size", "user", "repo", "latest", "#44cc11", "image size", "", "")),
+        ],
+    )
+    def test_defaults(self, kind: str, key: tuple[str, ...]) -> None:
+        """Test missing parameters are filled, so that equal badges share a key."""
+        assert badge_request(kind, "user", "repo", {}).key == key
+        assert badge_request(kind, "user", "repo", {"color": "#44cc11", "unknown": "x"}).key == key
+
+    def test_render_sync(self) -> None:
+        """Test a generator is built with the options and its method called with the parameters."""
+        generator_class = MagicMock()
+        generator_class.return_value.generate_tags.return_value = "<svg/>"
+        badge = badge_request("tags", "user", "repo", {"n": "5", "sort": "semver"})
+        assert badge.render(generator_class) == "<svg/>"
+        generator_class.assert_called_once_with(color="#44cc11", ignore_tag="latest", trim_type="", sort="semver")
+        generator_class.return_value.generate_tags.assert_called_once_with("user", "repo", n=5, label="image tags")
+
+    def test_render_async(self) -> None:
+        """Test the coroutine of an async generator is returned."""
+        generator_class = MagicMock()
+        generator_class.return_value.generate_size = AsyncMock(return_value="<svg/>")
+        badge = badge_request("size", "user", "repo", {"platform": "all"})
+        assert asyncio.run(badge.render(generator_class)) == "<svg/>"
+        generator_class.assert_called_once_with(color="#44cc11", trim_type="")
+        generator_class.return_value.generate_size.assert_awaited_once_with(
+            "user", "repo", tag="latest", label="image size", platform="all"
+        )
+
+    def test_render_invalid_n(self) -> None:
+        """Test an invalid `n` fails when rendering, as other generator errors do."""
+        badge = badge_request("tags", "user", "repo", {"n": "x"})
+        with pytest.raises(ValueError, match="invalid literal"):
+            badge.render(MagicMock())
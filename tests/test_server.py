@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import runpy
 from collections.abc import Generator
 from datetime import datetime, timezone
+from pathlib import Path
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 from flask.testing import FlaskClient
 
+from ghcr_badge.backends import SQLiteBackend
+from ghcr_badge.generate import manifest_store, tag_cache
+from ghcr_badge.routes import badge_cache, configure_from_environ
 from ghcr_badge.server import app, return_svg
 
 
@@ -39,11 +44,72 @@ class TestReturnSvg:
         with app.app_context():
             response = return_svg(svg_content)
 
-            assert "Cache-Control" in response.headers
-            assert "Pragma" in response.headers
+            assert response.headers["Cache-Control"] == "no-cache"
+            assert "no-store" not in response.headers["Cache-Control"]
             assert "Expires" in response.headers
             assert response.headers["Pragma"] == "no-cache"
 
+    def test_return_svg_etag(self) -> None:
+        """Test return_svg sets a strong ETag."""
+        with app.app_context():
+            response = return_svg("<svg/>", "abc")
+
+            assert response.headers["ETag"] == '"abc"'
+
+
+class TestBadgeCache:
+    """Test rendered badge cache."""
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_cached_response(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test the same badge is rendered once and served with the same ETag."""
+        mock_generator = Mock()
+        mock_generator.generate_tags.return_value = "<svg><text>v1.0.0</text></svg>"
+        mock_generator_class.return_value = mock_generator
+
+        first = client.get("/testuser/testrepo/tags")
+        second = client.get("/testuser/testrepo/tags?n=3")
+        assert first.data == second.data
+        assert first.headers["ETag"] == second.headers["ETag"]
+        mock_generator.generate_tags.assert_called_once()
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_not_modified(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test a matching If-None-Match gets 304 without rendering again."""
+        mock_generator = Mock()
+        mock_generator.generate_size.return_value = "<svg><text>10 MB</text></svg>"
+        mock_generator_class.return_value = mock_generator
+
+        etag = client.get("/testuser/testrepo/size").headers["ETag"]
+        response = client.get("/testuser/testrepo/size", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+        assert response.headers["Cache-Control"] == "no-cache"
+        mock_generator.generate_size.assert_called_once()
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_etag_mismatch(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test a stale If-None-Match gets the full badge."""
+        mock_generator = Mock()
+        mock_generator.generate_latest_tag.return_value = "<svg><text>v1.0.2</text></svg>"
+        mock_generator_class.return_value = mock_generator
+
+        response = client.get("/testuser/testrepo/latest_tag", headers={"If-None-Match": '"old"'})
+        assert response.status_code == 200
+        assert response.data == b"<svg><text>v1.0.2</text></svg>"
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_different_params_not_shared(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test badges with different parameters are cached separately."""
+        mock_generator = Mock()
+        mock_generator.generate_tags.return_value = "<svg/>"
+        mock_generator_class.return_value = mock_generator
+
+        client.get("/testuser/testrepo/tags?n=3")
+        client.get("/testuser/testrepo/tags?n=4")
+        assert mock_generator.generate_tags.call_count == 2
+
 
 class TestIndexRoute:
     """Test index route."""
@@ -93,7 +159,7 @@ class TestTagsRoute:
 
         response = client.get("/testuser/testrepo/tags?color=red&n=5&ignore=dev&label=versions&trim=patch")
         assert response.status_code == 200
-        mock_generator_class.assert_called_once_with(color="red", ignore_tag="dev", trim_type="patch")
+        mock_generator_class.assert_called_once_with(color="red", ignore_tag="dev", trim_type="patch", sort="lexical")
         mock_generator.generate_tags.assert_called_once_with("testuser", "testrepo", n=5, label="versions")
 
     @patch("ghcr_badge.server.GHCRBadgeGenerator")
@@ -130,9 +196,11 @@ class TestLatestTagRoute:
         mock_generator.generate_latest_tag.return_value = "<svg><text>v2.0.0</text></svg>"
         mock_generator_class.return_value = mock_generator
 
-        response = client.get("/testuser/testrepo/latest_tag?color=blue&ignore=alpha&label=release&trim=major")
+        response = client.get(
+            "/testuser/testrepo/latest_tag?color=blue&ignore=alpha&label=release&trim=major&sort=semver",
+        )
         assert response.status_code == 200
-        mock_generator_class.assert_called_once_with(color="blue", ignore_tag="alpha", trim_type="major")
+        mock_generator_class.assert_called_once_with(color="blue", ignore_tag="alpha", trim_type="major", sort="semver")
         mock_generator.generate_latest_tag.assert_called_once_with("testuser", "testrepo", label="release")
 
 
@@ -149,7 +217,9 @@ class TestSizeRoute:
         response = client.get("/testuser/testrepo/size")
         assert response.status_code == 200
         assert response.mimetype == "image/svg+xml"
-        mock_generator.generate_size.assert_called_once_with("testuser", "testrepo", tag="latest", label="image size")
+        mock_generator.generate_size.assert_called_once_with(
+            "testuser", "testrepo", tag="latest", label="image size", platform=""
+        )
 
     @patch("ghcr_badge.server.GHCRBadgeGenerator")
     def test_get_size_with_parameters(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
@@ -161,7 +231,9 @@ class TestSizeRoute:
         response = client.get("/testuser/testrepo/size?tag=v1.0.0&color=green&label=size")
         assert response.status_code == 200
         mock_generator_class.assert_called_once_with(color="green", trim_type="")
-        mock_generator.generate_size.assert_called_once_with("testuser", "testrepo", tag="v1.0.0", label="size")
+        mock_generator.generate_size.assert_called_once_with(
+            "testuser", "testrepo", tag="v1.0.0", label="size", platform=""
+        )
 
     @patch("ghcr_badge.server.GHCRBadgeGenerator")
     def test_get_size_nested_path(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
@@ -172,13 +244,123 @@ class TestSizeRoute:
 
         response = client.get("/testuser/org/repo/size")
         assert response.status_code == 200
-        mock_generator.generate_size.assert_called_once_with("testuser", "org/repo", tag="latest", label="image size")
+        mock_generator.generate_size.assert_called_once_with(
+            "testuser", "org/repo", tag="latest", label="image size", platform=""
+        )
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_get_size_platform(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test GET size of platforms is cached per platform."""
+        mock_generator_class.return_value.generate_size.side_effect = lambda *_, platform, **__: (
+            f"<svg>{platform}</svg>"
+        )
+
+        assert client.get("/testuser/testrepo/size?platform=linux/arm64").data == b"<svg>linux/arm64</svg>"
+        assert client.get("/testuser/testrepo/size?platform=max").data == b"<svg>max</svg>"
+        assert client.get("/testuser/testrepo/size?platform=max").data == b"<svg>max</svg>"
+        assert mock_generator_class.return_value.generate_size.call_count == 2
+
+
+class TestBatchRoute:
+    """Test batch route."""
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_post_batch_json(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test badges are returned in order, with the same badge rendered once."""
+        mock_generator = Mock()
+        mock_generator.generate_tags.return_value = "<svg>tags</svg>"
+        mock_generator.generate_size.return_value = "<svg>size</svg>"
+        mock_generator_class.return_value = mock_generator
+
+        response = client.post(
+            "/batch",
+            json=[
+                {"owner": "user", "package": "repo", "kind": "tags", "params": {"n": 5}},
+                {"owner": "user", "package": "repo", "kind": "size"},
+                {"owner": "user", "package": "repo", "kind": "tags", "params": {"n": "5"}},
+            ],
+        )
+        assert response.status_code == 200
+        badges = response.get_json()["badges"]
+        assert [badge["svg"] for badge in badges] == ["<svg>tags</svg>", "<svg>size</svg>", "<svg>tags</svg>"]
+        assert badges[0]["etag"] == client.get("/user/repo/tags?n=5").headers["ETag"].strip('"')
+        mock_generator.generate_tags.assert_called_once_with("user", "repo", n=5, label="image tags")
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_post_batch_error(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test a failed badge does not fail the others."""
+        mock_generator = Mock()
+        mock_generator.generate_latest_tag.side_effect = ValueError("broken")
+        mock_generator.generate_size.return_value = "<svg/>"
+        mock_generator_class.return_value = mock_generator
+
+        response = client.post(
+            "/batch",
+            json=[
+                {"owner": "user", "package": "a", "kind": "latest_tag"},
+                {"owner": "user", "package": "b", "kind": "size"},
+            ],
+        )
+        badges = response.get_json()["badges"]
+        assert badges[0] == {
+            "owner": "user",
+            "package": "a",
+            "kind": "latest_tag",
+            "exception": "ValueError",
+            "message": "broken",
+        }
+        assert badges[1]["svg"] == "<svg/>"
+
+    @patch("ghcr_badge.server.GHCRBadgeGenerator")
+    def test_post_batch_multipart(self, mock_generator_class: MagicMock, client: FlaskClient) -> None:
+        """Test badges as multipart/mixed parts."""
+        mock_generator = Mock()
+        mock_generator.generate_size.return_value = "<svg/>"
+        mock_generator_class.return_value = mock_generator
+
+        response = client.post(
+            "/batch",
+            json=[{"owner": "user", "package": "nested/repo", "kind": "size", "params": {"tag": "v1"}}],
+            headers={"Accept": "multipart/mixed"},
+        )
+        assert response.mimetype == "multipart/mixed"
+        boundary = response.mimetype_params["boundary"]
+        parts = response.data.split(f"--{boundary}".encode())
+        assert parts[0] == b""
+        assert parts[-1] == b"--\r\n"
+        head, _, body = parts[1].partition(b"\r\n\r\n")
+        assert b"Content-Type: image/svg+xml" in head
+        assert b"Content-Location: /user/nested/repo/size?tag=v1" in head
+        assert body == b"<svg/>\r\n"
+
+    @pytest.mark.parametrize(
+        ("body", "message"),
+        [
+            ({"owner": "user"}, "JSON list"),
+            ([1], "should be an object"),
+            ([{"owner": "user", "kind": "tags"}], "owner and package"),
+            ([{"owner": "user", "package": "repo", "kind": "pulls"}], "kind of badge 0"),
+            ([{"owner": "user", "package": "repo", "kind": "tags", "params": {"n": [1]}}], "params of badge 0"),
+        ],
+    )
+    def test_post_batch_invalid(self, body: object, message: str, client: FlaskClient) -> None:
+        """Test malformed bodies are rejected."""
+        response = client.post("/batch", json=body)
+        assert response.status_code == 400
+        assert message in response.get_json()["message"]
+
+    def test_post_batch_too_many(self, client: FlaskClient) -> None:
+        """Test the number of badges is bounded."""
+        with patch("ghcr_badge.routes.BatchLimits.max_items", 1):
+            response = client.post("/batch", json=[{"owner": "a", "package": "b", "kind": "size"}] * 2)
+        assert response.status_code == 400
+        assert "at most 1" in response.get_json()["message"]
 
 
 class TestMain:
     """Test main function."""
 
-    @patch("ghcr_badge.server.serve")
+    @patch("waitress.serve")
     @patch("ghcr_badge.server.environ.get")
     def test_main_default_port(self, mock_environ_get: MagicMock, mock_serve: MagicMock) -> None:
         """Test main function with default port."""
@@ -192,16 +374,35 @@ class TestMain:
         call_kwargs = mock_serve.call_args[1]
         assert call_kwargs["port"] == 5000
 
-    @patch("ghcr_badge.server.serve")
+    @patch("waitress.serve")
     @patch("ghcr_badge.server.environ.get")
     def test_main_custom_port(self, mock_environ_get: MagicMock, mock_serve: MagicMock) -> None:
         """Test main function with custom port from environment."""
         from ghcr_badge.server import main
 
-        mock_environ_get.return_value = "3000"
+        mock_environ_get.side_effect = lambda key, default: "3000" if key == "PORT" else default
 
         main()
 
         mock_serve.assert_called_once()
         call_kwargs = mock_serve.call_args[1]
         assert call_kwargs["port"] == 3000
+
+
+class TestGunicornConfig:
+    """Test gunicorn.conf.py."""
+
+    def test_post_worker_init(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test gunicorn workers are configured from environment, sharing the selected cache backend."""
+        config = runpy.run_path(str(Path(__file__).parents[1] / "gunicorn.conf.py"))
+        assert config["wsgi_app"] == "ghcr_badge.server:app"
+        monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+        monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+        monkeypatch.setenv("BADGE_CACHE_TTL", "60")
+        try:
+            config["post_worker_init"](Mock())
+            assert isinstance(badge_cache._backend, SQLiteBackend)  # noqa: SLF001
+            assert tag_cache._backend is manifest_store._backend is badge_cache._backend  # noqa: SLF001
+            assert badge_cache.ttl == 60
+        finally:
+            configure_from_environ({})
@@ -0,0 +1,112 @@
+"""Tests for ghcr_badge.singleflight module."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ghcr_badge.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def _wait_for_waiters(group: SingleFlight[str, int], n: int) -> None:
+    for _ in range(500):
+        if group.stats()["shared"] >= n:
+            return
+        threading.Event().wait(0.01)
+
+
+class TestSingleFlight:
+    """Test SingleFlight class."""
+
+    def test_do_sequential(self) -> None:
+        """Test sequential calls are not coalesced."""
+        group: SingleFlight[str, int] = SingleFlight()
+        assert group.do("a", lambda: 1) == 1
+        assert group.do("a", lambda: 2) == 2
+        assert group.stats() == {"calls": 2, "shared": 0}
+
+    def test_do_concurrent_shares_result(self) -> None:
+        """Test concurrent callers with the same key share one call."""
+        group: SingleFlight[str, int] = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn() -> int:
+            calls.append(1)
+            release.wait(5)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(group.do, "a", fn) for _ in range(8)]
+            _wait_for_waiters(group, 7)
+            release.set()
+            results = [f.result() for f in futures]
+
+        assert results == [42] * 8
+        assert len(calls) == 1
+        assert group.stats() == {"calls": 8, "shared": 7}
+
+    def test_do_concurrent_shares_error(self) -> None:
+        """Test concurrent callers receive the error of the shared call."""
+        group: SingleFlight[str, int] = SingleFlight()
+        release = threading.Event()
+
+        def fn() -> int:
+            release.wait(5)
+            msg = "upstream down"
+            raise RuntimeError(msg)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(group.do, "a", fn) for _ in range(4)]
+            _wait_for_waiters(group, 3)
+            release.set()
+            for f in futures:
+                with pytest.raises(RuntimeError, match="upstream down"):
+                    f.result()
+
+    def test_do_different_keys(self) -> None:
+        """Test calls with different keys run independently."""
+        group: SingleFlight[str, str] = SingleFlight()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda k: group.do(k, lambda: k), ["a", "b"]))
+        assert results == ["a", "b"]
+        assert group.stats()["shared"] == 0
+
+
+class TestAsyncSingleFlight:
+    """Test AsyncSingleFlight class."""
+
+    def test_do_concurrent_shares_result(self) -> None:
+        """Test concurrent tasks with the same key share one call."""
+        group: AsyncSingleFlight[str, int] = AsyncSingleFlight()
+        calls = []
+
+        async def fn() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def run() -> list[int]:
+            return await asyncio.gather(*(group.do("a", fn) for _ in range(5)))
+
+        assert asyncio.run(run()) == [42] * 5
+        assert len(calls) == 1
+        assert group.stats() == {"calls": 5, "shared": 4}
+
+    def test_do_concurrent_shares_error(self) -> None:
+        """Test concurrent tasks receive the error of the shared call."""
+        group: AsyncSingleFlight[str, int] = AsyncSingleFlight()
+
+        async def fn() -> int:
+            await asyncio.sleep(0.01)
+            msg = "upstream down"
+            raise RuntimeError(msg)
+
+        async def run() -> list[int | BaseException]:
+            return await asyncio.gather(*(group.do("a", fn) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,46 @@
+"""Tests for ghcr_badge.tagfilter module."""
+
+from __future__ import annotations
+
+import fnmatch
+import re
+
+import pytest
+
+from ghcr_badge.tagfilter import TRIM_PATTERNS, TagFilter, get_tag_filter
+
+_TAGS = ["latest", "dev", "v1.0", "v1.0.0", "v1.0.0-rc1", "1.2.3", "nightly-2024", "sha-abc", "v2.0"]
+
+
+class TestTagFilter:
+    """Test TagFilter class."""
+
+    @pytest.mark.parametrize("ignore_tag", ["latest", "latest,dev", "nightly-*,sha-*", "v?.0,*rc*", "[ds]*", ""])
+    @pytest.mark.parametrize("trim_type", ["", "patch", "major"])
+    def test_same_as_fnmatch(self, ignore_tag: str, trim_type: str) -> None:
+        """Test the compiled filter hides the same tags as matching each glob."""
+        ignore_tags = ignore_tag.split(",")
+        trim_pattern = TRIM_PATTERNS.get(trim_type, "^$")
+        expected = [
+            t for t in _TAGS if not re.match(trim_pattern, t) and not any(fnmatch.fnmatch(t, i) for i in ignore_tags)
+        ]
+        assert get_tag_filter(ignore_tag, trim_type).filter(_TAGS) == expected
+
+    def test_filter_last_n(self) -> None:
+        """Test filter keeps the last n tags in order."""
+        tag_filter = TagFilter(["latest"], "^$")
+        assert tag_filter.filter(["a", "latest", "b", "c"], 2) == ["b", "c"]
+        assert tag_filter.filter(["a", "latest"], 5) == ["a"]
+        assert tag_filter.filter(["a"], 0) == []
+
+    def test_excludes(self) -> None:
+        """Test excludes checks a single tag."""
+        tag_filter = TagFilter(["dev*"], TRIM_PATTERNS["patch"])
+        assert tag_filter.excludes("develop")
+        assert tag_filter.excludes("v1.2.3")
+        assert not tag_filter.excludes("v1.2")
+
+    def test_get_tag_filter_memoized(self) -> None:
+        """Test filters are shared by the same options."""
+        assert get_tag_filter("latest,dev", "patch") is get_tag_filter("latest,dev", "patch")
+        assert get_tag_filter("latest", "patch") is not get_tag_filter("latest", "major")
@@ -0,0 +1,95 @@
+"""Tests for ghcr_badge.tracing module."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock, patch
+
+from ghcr_badge.server import app
+from ghcr_badge.tracing import Trace, TraceLog, span, start_trace
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class TestTrace:
+    """Test Trace class and spans."""
+
+    def test_span(self) -> None:
+        """Test spans are recorded only within a trace."""
+        with span("outside"):
+            pass
+        with start_trace() as trace:
+            with span("tags"):
+                pass
+            with start_trace() as inner, span("inner"):
+                pass
+        with span("outside"):
+            pass
+        assert [s.name for s in trace.spans] == ["tags"]
+        assert [s.name for s in inner.spans] == ["inner"]
+
+    def test_server_timing(self) -> None:
+        """Test spans of the same phase are summed up, followed by the total."""
+        trace = Trace()
+        trace.add("manifest", trace.started_at, 0.0123)
+        trace.add("manifest_child", trace.started_at + 0.0123, 0.002)
+        trace.add("manifest_child", trace.started_at + 0.0123, 0.003)
+        header = trace.server_timing()
+        assert header.startswith('manifest;dur=12.3, manifest_child;dur=5.0;desc="2 spans", total;dur=')
+
+    def test_to_dict(self) -> None:
+        """Test spans are ordered by start in milliseconds."""
+        trace = Trace()
+        trace.add("render", trace.started_at + 0.002, 0.001)
+        trace.add("tags", trace.started_at, 0.002)
+        assert trace.to_dict()["spans"] == [
+            {"name": "tags", "start_ms": 0, "duration_ms": 2},
+            {"name": "render", "start_ms": 2, "duration_ms": 1},
+        ]
+
+
+class TestTraceLog:
+    """Test TraceLog class."""
+
+    def test_write(self, tmp_path: Path) -> None:
+        """Test traces are appended as JSON lines."""
+        path = tmp_path / "trace.jsonl"
+        sink = TraceLog()
+        sink.write(Trace(), path="/disabled")
+        sink.configure(path=str(path))
+        sink.write(Trace(), path="/a/b/size", status=200)
+        sink.write(Trace(), path="/a/b/tags", status=200)
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["path"] for line in lines] == ["/a/b/size", "/a/b/tags"]
+        assert lines[0]["spans"] == []
+
+    def test_threshold(self, tmp_path: Path) -> None:
+        """Test only slow requests are written."""
+        path = tmp_path / "trace.jsonl"
+        sink = TraceLog()
+        sink.configure(path=str(path), threshold=60)
+        sink.write(Trace(), path="/a/b/size")
+        assert not path.exists()
+
+
+class TestServerTiming:
+    """Test `Server-Timing` of the WSGI server."""
+
+    @patch("ghcr_badge.generate.GHCRBadgeGenerator.get_tags")
+    def test_badge(self, mock_get_tags: MagicMock) -> None:
+        """Test phases of a badge request are reported."""
+        mock_get_tags.return_value = ["v1", "v2"]
+        with app.test_client() as client:
+            response = client.get("/user/repo/tags")
+        phases = [metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")]
+        assert phases == ["auth", "filter", "render", "total"]
+
+    @patch("ghcr_badge.server.trace_log")
+    def test_log(self, mock_trace_log: MagicMock) -> None:
+        """Test requests are passed to the log sink."""
+        with app.test_client() as client:
+            client.get("/health?x=1")
+        _, fields = mock_trace_log.write.call_args
+        assert fields == {"method": "GET", "path": "/health?x=1", "status": 200}
@@ -0,0 +1,167 @@
+"""Tests for ghcr_badge.upstream module."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ghcr_badge import upstream
+from ghcr_badge.generate import GHCRBadgeGenerator
+from ghcr_badge.metrics import upstream_responses
+from ghcr_badge.upstream import UpstreamClient, Validators, configure_client, endpoint_of, get_client
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        body = b'{"tags": ["v1.0.0"]}'
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Docker-Content-Digest", "sha256:a")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Generator[str, None, None]:
+    """Run a local keep-alive HTTP server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestUpstreamClient:
+    """Test UpstreamClient class."""
+
+    def test_init_invalid_pool_maxsize(self) -> None:
+        """Test initialization with non-positive pool size."""
+        with pytest.raises(ValueError, match="should be positive"):
+            UpstreamClient(pool_maxsize=0)
+
+    def test_stats_empty(self) -> None:
+        """Test stats before sending any request."""
+        client = UpstreamClient()
+        assert client.stats() == {"pools": 0, "connections": 0, "requests": 0, "reused": 0}
+
+    def test_get_reuses_connection(self, server_url: str) -> None:
+        """Test sequential requests share one keep-alive connection."""
+        client = UpstreamClient(pool_maxsize=2)
+        for _ in range(5):
+            assert client.get(f"{server_url}/v2/user/repo/tags/list").json() == {"tags": ["v1.0.0"]}
+        stats = client.stats()
+        assert stats["pools"] == 1
+        assert stats["connections"] == 1
+        assert stats["requests"] == 5
+        assert stats["reused"] == 4
+        client.close()
+
+    def test_get_conditional(self, server_url: str) -> None:
+        """Test validators of a URL are sent again only by conditional requests of the same URL."""
+        client = UpstreamClient()
+        url = f"{server_url}/v2/user/repo/tags/list"
+        assert client.get(url, params={"n": 300}, conditional=True).status_code == 200
+        assert client.get(url, params={"n": 300}, conditional=True).status_code == 304
+        assert client.get(url, params={"n": 300}).status_code == 200
+        assert client.get(url, params={"n": 300, "last": "v1.0.0"}, conditional=True).status_code == 200
+        assert client.validators.stats() == {"validators": 2, "conditional": 1, "not_modified": 1}
+
+    def test_validators_bounded(self) -> None:
+        """Test the least recently used validators are forgotten, and ones without validators are dropped."""
+        validators = Validators(maxsize=1)
+        validators.update(("a", ""), 200, {"ETag": '"a"'})
+        validators.update(("b", ""), 200, {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert validators.headers(("a", "")) == {}
+        assert validators.headers(("b", "")) == {"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        validators.update(("b", ""), 200, {})
+        assert validators.stats() == {"validators": 0, "conditional": 1, "not_modified": 0}
+
+    def test_head_shares_connection(self, server_url: str) -> None:
+        """Test HEAD requests are sent over the pooled connection."""
+        client = UpstreamClient()
+        assert client.head(f"{server_url}/v2/user/repo/manifests/latest").headers["Docker-Content-Digest"] == "sha256:a"
+        client.get(f"{server_url}/v2/user/repo/tags/list")
+        assert client.stats()["reused"] == 1
+
+    def test_metrics(self, server_url: str) -> None:
+        """Test responses are counted per registry endpoint and status, and failures as errors."""
+        upstream_responses.clear()
+        client = UpstreamClient(timeout=1)
+        client.get(f"{server_url}/v2/user/repo/tags/list")
+        client.head(f"{server_url}/v2/user/repo/manifests/latest")
+        with pytest.raises(requests.ConnectionError):
+            client.get("http://127.0.0.1:1/token")
+        assert [(s.labels["endpoint"], s.labels["status"]) for s in upstream_responses.collect().samples] == [
+            ("manifests", "200"),
+            ("other", "error"),
+            ("tags/list", "200"),
+        ]
+
+    def test_endpoint_of(self) -> None:
+        """Test registry endpoints of URLs, including next pages of tag lists."""
+        assert endpoint_of("https://ghcr.io/v2/user/repo/tags/list?n=300&last=v1") == "tags/list"
+        assert endpoint_of("https://ghcr.io/v2/user/repo/manifests/sha256:a") == "manifests"
+        assert endpoint_of("https://ghcr.io/token") == "other"
+
+
+class TestSharedClient:
+    """Test process-wide client helpers."""
+
+    def test_get_client_is_shared(self) -> None:
+        """Test get_client returns the same instance."""
+        assert get_client() is get_client()
+
+    def test_generator_borrows_shared_client(self) -> None:
+        """Test generators use the shared client by default."""
+        assert GHCRBadgeGenerator().client is get_client()
+        assert GHCRBadgeGenerator().client is GHCRBadgeGenerator().client
+
+    def test_generator_custom_client(self) -> None:
+        """Test generators accept an explicit client."""
+        client = UpstreamClient()
+        assert GHCRBadgeGenerator(client=client).client is client
+
+    def test_configure_client(self) -> None:
+        """Test configure_client replaces the shared client."""
+        old = get_client()
+        new = configure_client(pool_maxsize=4, timeout=5)
+        try:
+            assert new is not old
+            assert get_client() is new
+            assert new.pool_maxsize == 4
+            assert new.timeout == 5
+        finally:
+            configure_client()
+
+    def test_forget_client_after_fork(self) -> None:
+        """Test the child process recreates the client with the same options."""
+        configure_client(pool_maxsize=3)
+        try:
+            old = get_client()
+            upstream._forget_client_after_fork()  # noqa: SLF001
+            new = get_client()
+            assert new is not old
+            assert new.pool_maxsize == 3
+        finally:
+            configure_client()
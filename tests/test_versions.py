@@ -0,0 +1,32 @@
+"""Tests for ghcr_badge.versions module."""
+
+from __future__ import annotations
+
+from ghcr_badge.versions import sort_by_version, version_key
+
+
+class TestVersions:
+    """Test version ordering."""
+
+    def test_sort_by_version(self) -> None:
+        """Test tags are ordered by semver precedence."""
+        tags = ["v1.10.0", "v1.9.0", "1.2", "v2.0.0", "v2.0.0-rc.1", "v2.0.0-beta.11", "v2.0.0-beta.2", "v2.0.0-alpha"]
+        assert sort_by_version(tags) == (
+            "1.2",
+            "v1.9.0",
+            "v1.10.0",
+            "v2.0.0-alpha",
+            "v2.0.0-beta.2",
+            "v2.0.0-beta.11",
+            "v2.0.0-rc.1",
+            "v2.0.0",
+        )
+
+    def test_sort_by_version_not_versions_first(self) -> None:
+        """Test tags which are not versions keep their order before versions."""
+        assert sort_by_version(["v1.0.0", "latest", "sha-abc", "edge"]) == ("latest", "sha-abc", "edge", "v1.0.0")
+
+    def test_version_key_build_metadata(self) -> None:
+        """Test build metadata does not affect precedence."""
+        assert version_key("1.0.0+build.5") == version_key("v1.0.0")
+        assert version_key("1.0.0-1") < version_key("1.0.0-alpha")